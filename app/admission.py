@@ -0,0 +1,229 @@
+from __future__ import annotations
+from contextlib import asynccontextmanager
+from functools import lru_cache
+from typing import Any, AsyncIterator, Dict, List, NamedTuple, Optional, Tuple
+import asyncio, bisect, itertools, math, threading, time
+
+from .config import get_settings
+from .metrics import ADMISSION_WAIT_SECONDS
+from .ratelimit import MemoryBuckets, _parse_limits
+
+# Inbound admission control in front of the orchestrations of one API process:
+# - per-client rate quota (requests per minute), checked when the request arrives -> 429
+# - a global cap on orchestrations in flight plus a per-client concurrency quota; requests over
+#   either wait in a priority queue (interactive before batch, FIFO within a class)
+# - load shedding: an interactive request whose estimated queue wait is over the threshold, or
+#   that finds the queue full, is rejected up front -> 503
+# Both rejections carry Retry-After. Limits are per process, like the result cache.
+
+PRIORITIES: Dict[str, int] = {"interactive": 0, "batch": 1}
+
+
+class Rejected(RuntimeError):
+    def __init__(self, status_code: int, detail: str, retry_after: float):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+        self.retry_after = retry_after
+
+    def headers(self) -> Dict[str, str]:
+        return {"Retry-After": str(max(1, math.ceil(self.retry_after)))}
+
+
+class Caller(NamedTuple):
+    client: str     # X-API-Key, else the peer address
+    priority: str   # interactive | batch
+
+
+class Ticket:
+    __slots__ = ("client", "priority", "started", "released")
+
+    def __init__(self, client: str, priority: str):
+        self.client = client
+        self.priority = priority
+        self.started = time.monotonic()
+        self.released = False
+
+
+class _Waiter:
+    __slots__ = ("rank", "client", "priority", "future", "ticket")
+
+    def __init__(self, rank: Tuple[int, int], client: str, priority: str, future: "asyncio.Future[None]"):
+        self.rank = rank
+        self.client = client
+        self.priority = priority
+        self.future = future
+        self.ticket: Optional[Ticket] = None  # set once admitted
+
+    def __lt__(self, other: "_Waiter") -> bool:
+        return self.rank < other.rank
+
+
+def _wake(fut: "asyncio.Future[None]") -> None:
+    if not fut.done():
+        fut.set_result(None)
+
+
+class AdmissionController:
+    def __init__(
+        self,
+        max_inflight: int = 128,
+        max_queue: int = 1000,
+        max_queue_wait_s: float = 15.0,
+        key_concurrency: int = 32,
+        key_rpm: int = 0,
+        key_limits: Optional[Dict[str, Tuple[int, int]]] = None,
+    ):
+        self.max_inflight = max(1, max_inflight)
+        self.max_queue = max(0, max_queue)
+        self.max_queue_wait_s = max_queue_wait_s
+        self.key_concurrency = key_concurrency  # 0 = unlimited
+        self.key_rpm = key_rpm
+        self.key_limits = key_limits or {}      # client -> (concurrency, rpm)
+        self.service_s = 2.0  # EWMA of how long an admitted request holds its slot; seeds the estimate
+        self.counters: Dict[str, int] = {"admitted": 0, "queued": 0, "shed": 0, "rate_limited": 0, "cancelled": 0}
+        self._inflight: Dict[str, int] = {p: 0 for p in PRIORITIES}
+        self._by_client: Dict[str, int] = {}
+        self._queue: List[_Waiter] = []  # kept sorted by (priority, arrival)
+        self._seq = itertools.count()
+        self._buckets = MemoryBuckets()
+        self._lock = threading.Lock()
+
+    def _limits(self, client: str) -> Tuple[int, int]:
+        return self.key_limits.get(client) or (self.key_concurrency, self.key_rpm)
+
+    def _has_room(self, client: str) -> bool:
+        limit = self._limits(client)[0]
+        return limit <= 0 or self._by_client.get(client, 0) < limit
+
+    def _total(self) -> int:
+        return sum(self._inflight.values())
+
+    # ---- quotas ----
+
+    def check_rate(self, client: str) -> None:
+        rpm = self._limits(client)[1]
+        if rpm <= 0:
+            return
+        wait = self._buckets.take(f"client:{client}", max(1.0, rpm / 6.0), rpm / 60.0, 1)  # ~10s burst
+        if wait > 0:
+            with self._lock:
+                self.counters["rate_limited"] += 1
+            raise Rejected(429, f"rate quota of {rpm} requests/min exceeded", wait)
+
+    def estimated_wait(self, priority: str) -> float:
+        # Waiters that would be served first, drained by every slot at the observed service time
+        with self._lock:
+            if self._total() < self.max_inflight and not self._queue:
+                return 0.0
+            rank = PRIORITIES.get(priority, 0)
+            ahead = sum(1 for w in self._queue if w.rank[0] <= rank)
+            return (ahead + 1) / self.max_inflight * self.service_s
+
+    # ---- slots ----
+
+    async def acquire(self, client: str, priority: str = "interactive", shed: bool = True) -> Ticket:
+        rank = PRIORITIES.get(priority, 0)
+        with self._lock:
+            ahead = any(w.rank[0] <= rank and self._has_room(w.client) for w in self._queue)
+            if not ahead and self._total() < self.max_inflight and self._has_room(client):
+                return self._admit(client, priority)
+        if shed:
+            if len(self._queue) >= self.max_queue:
+                self._shed(f"admission queue full ({self.max_queue})", self.service_s)
+            wait = self.estimated_wait(priority)
+            if wait > self.max_queue_wait_s:
+                self._shed(f"estimated queue wait {wait:.1f}s over {self.max_queue_wait_s:g}s", wait)
+
+        waiter = _Waiter((rank, next(self._seq)), client, priority, asyncio.get_running_loop().create_future())
+        with self._lock:
+            bisect.insort(self._queue, waiter)
+            self.counters["queued"] += 1
+        queued_at = time.monotonic()
+        try:
+            await waiter.future
+        except asyncio.CancelledError:
+            # Client went away while queued, or right after being admitted
+            with self._lock:
+                if waiter.ticket is None:
+                    self._queue.remove(waiter)
+                    self.counters["cancelled"] += 1
+            if waiter.ticket is not None:
+                self.release(waiter.ticket)
+            raise
+        ADMISSION_WAIT_SECONDS.observe(time.monotonic() - queued_at, priority=priority)
+        return waiter.ticket  # type: ignore[return-value]
+
+    def release(self, ticket: Ticket) -> None:
+        with self._lock:
+            if ticket.released:
+                return
+            ticket.released = True
+            self._inflight[ticket.priority] -= 1
+            left = self._by_client[ticket.client] - 1
+            if left:
+                self._by_client[ticket.client] = left
+            else:
+                del self._by_client[ticket.client]
+            self.service_s += 0.2 * (time.monotonic() - ticket.started - self.service_s)
+            self._dispatch()
+
+    @asynccontextmanager
+    async def slot(self, caller: Caller, shed: bool = True) -> AsyncIterator[Ticket]:
+        ticket = await self.acquire(caller.client, caller.priority, shed)
+        try:
+            yield ticket
+        finally:
+            self.release(ticket)
+
+    def _admit(self, client: str, priority: str) -> Ticket:
+        self._inflight[priority] += 1
+        self._by_client[client] = self._by_client.get(client, 0) + 1
+        self.counters["admitted"] += 1
+        return Ticket(client, priority)
+
+    def _dispatch(self) -> None:
+        # Called with the lock held: hand freed slots to the best-ranked waiters whose client is
+        # under its concurrency quota (a client at its quota does not block the others)
+        i = 0
+        while i < len(self._queue) and self._total() < self.max_inflight:
+            w = self._queue[i]
+            if not self._has_room(w.client):
+                i += 1
+                continue
+            del self._queue[i]
+            w.ticket = self._admit(w.client, w.priority)
+            w.future.get_loop().call_soon_threadsafe(_wake, w.future)
+
+    def _shed(self, detail: str, retry_after: float) -> None:
+        with self._lock:
+            self.counters["shed"] += 1
+        raise Rejected(503, f"overloaded: {detail}", retry_after)
+
+    # ---- introspection ----
+
+    def limits(self) -> Dict[str, float]:
+        return {
+            "max_inflight": self.max_inflight, "max_queue": self.max_queue, "max_queue_wait_s": self.max_queue_wait_s,
+            "key_concurrency": self.key_concurrency, "key_rpm": self.key_rpm,
+        }
+
+    def snapshot(self) -> Dict[str, Any]:
+        # Client keys may be secrets: only counted, never listed or used as metric labels
+        with self._lock:
+            waiting = {p: sum(1 for w in self._queue if w.priority == p) for p in PRIORITIES}
+            out = {
+                "inflight": dict(self._inflight), "waiting": waiting, "clients_inflight": len(self._by_client),
+                "service_s": round(self.service_s, 3), **self.counters, "limits": self.limits(),
+            }
+        out["estimated_wait_s"] = round(self.estimated_wait("interactive"), 3)
+        return out
+
+
+@lru_cache
+def get_admission() -> AdmissionController:
+    s = get_settings()
+    return AdmissionController(
+        s.admission_max_inflight, s.admission_max_queue, s.admission_max_queue_wait_s,
+        s.admission_key_concurrency, s.admission_key_rpm, _parse_limits(s.admission_key_limits),
+    )
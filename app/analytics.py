@@ -0,0 +1,248 @@
+from __future__ import annotations
+from collections import Counter, defaultdict
+from statistics import median
+from typing import Any, Dict, List, Optional, Tuple
+import re
+
+from .conversations import parse_ts
+
+# Exact numbers for ConversationAnalyzer and ExpenseTracker, computed from the message list.
+# The narrative fields ("insight", "notes") get a plain template here; an LLM may rewrite them.
+
+# ---------------- conversation analytics ----------------
+
+def _fmt_gap(seconds: float) -> str:
+    if seconds < 90:
+        return f"{round(seconds)}s"
+    if seconds < 5400:
+        return f"{round(seconds / 60)} min"
+    return f"{seconds / 3600:.1f} h"
+
+
+def response_gaps(messages: List[dict]) -> Dict[str, Any]:
+    # Time from the previous message to a reply by someone else, attributed to the replier
+    per_user: Dict[str, List[float]] = defaultdict(list)
+    prev_sender, prev_ts = None, None
+    for m in messages:
+        sender, ts = m.get("sender", "user"), parse_ts(m.get("timestamp"))
+        if ts is not None and prev_ts is not None and sender != prev_sender and ts >= prev_ts:
+            per_user[sender].append(ts - prev_ts)
+        if ts is not None:
+            prev_sender, prev_ts = sender, ts
+    gaps = [g for v in per_user.values() for g in v]
+    return {
+        "replies": len(gaps),
+        "median_s": round(median(gaps), 1) if gaps else None,
+        "longest_s": round(max(gaps), 1) if gaps else None,
+        "median_s_per_user": {u: round(median(v), 1) for u, v in per_user.items()},
+    }
+
+
+def conversation_stats(messages: List[dict], locale: Optional[str] = None) -> Dict[str, Any]:
+    counts = Counter(m.get("sender", "user") for m in messages)
+    per_user = dict(counts.most_common())
+    most_active = next(iter(per_user), "unknown")
+    gaps = response_gaps(messages)
+    return {
+        "messages_per_user": per_user,
+        "most_active_user": most_active,
+        "response_gaps": gaps,
+        "insight": _participation_insight(per_user, gaps),
+    }
+
+
+def _participation_insight(per_user: Dict[str, int], gaps: Dict[str, Any]) -> str:
+    total = sum(per_user.values())
+    if not total:
+        return "No messages to analyze."
+    top, top_n = next(iter(per_user.items()))
+    share = top_n / total
+    if len(per_user) == 1:
+        text = f"Only {top} is writing ({total} messages)."
+    elif share > max(0.5, 1.5 / len(per_user)):
+        text = f"{top} carries the conversation with {round(share * 100)}% of {total} messages."
+    else:
+        text = f"Participation is fairly balanced across {len(per_user)} people ({total} messages)."
+    if gaps["median_s"] is not None:
+        text += f" Replies typically come within {_fmt_gap(gaps['median_s'])}."
+    return text
+
+# ---------------- expenses ----------------
+
+CURRENCIES: Dict[str, str] = {
+    "€": "EUR", "eur": "EUR", "euro": "EUR", "euros": "EUR",
+    "$": "USD", "usd": "USD", "dollar": "USD", "dollars": "USD", "bucks": "USD",
+    "£": "GBP", "gbp": "GBP", "pound": "GBP", "pounds": "GBP",
+    "¥": "JPY", "jpy": "JPY", "yen": "JPY",
+    "chf": "CHF", "cad": "CAD", "aud": "AUD", "inr": "INR", "₹": "INR",
+    "dirham": "MAD", "dirhams": "MAD", "mad": "MAD", "dh": "MAD", "dhs": "MAD",
+}
+# Also plain words ("so mad 3 people"): only money when glued to the number ("120dh") in a chat
+# whose locale is Moroccan or that talks about dirhams
+_AMBIGUOUS_CODES = {"mad", "dh", "dhs"}
+
+_NUM = r"\d{1,3}(?:[ ,.]\d{3})+(?:[.,]\d{1,2})?|\d+(?:[.,]\d{1,2})?"
+_SYM = r"[€$£¥₹]"
+_CODE = r"eur|euros?|usd|dollars?|bucks|gbp|pounds?|jpy|yen|chf|cad|aud|inr|dirhams?|mad|dhs?"
+_AMOUNT = re.compile(
+    rf"(?P<pre>{_SYM}|\b(?:{_CODE})\b)\s?(?P<n1>{_NUM})"
+    rf"|(?<![\w.,])(?P<n2>{_NUM})(?:\s?(?P<post>{_SYM}|(?:{_CODE})\b))?",
+    re.I,
+)
+# a bare number only counts as money right after a spending verb ("I paid 12.5"); "was"/"were"
+# need a unit ("the taxi was 12€"), or "we were 5" would be money
+_VERB_BEFORE = re.compile(r"\b(?:paid|spent|costs?|came to|owes?|total(?: is)?)\s+(?:(?:about|around|like)\s+)?$", re.I)
+_DIRHAM_CHAT = re.compile(r"\bdirhams?\b|\bmaroc\b|\bmorocc", re.I)
+_FOR = re.compile(r"^\s*(?:for|on)\s+(?:the\s+|a\s+|an\s+|our\s+|my\s+)?([\w'&-]+(?:\s+[\w'&-]+){0,2}?)(?=\s*(?:[,.;:!?)]|$|\s(?:and|but|so|which|yesterday|today|tonight|each|per)\b))", re.I)
+_BEFORE = re.compile(r"(?:the\s+|our\s+|my\s+)?([\w'&-]+(?:\s+[\w'&-]+)?)\s+(?:was|is|costs?|came to|were|are)\s*(?:about|around|like)?\s*$", re.I)
+_SELF_PAID = re.compile(r"\bI\s+(?:paid|covered|spent|bought|booked|put down|got)\b|\bI'll\s+pay\b|\bon me\b", re.I)
+_OTHER_PAID = re.compile(r"\b([A-Z][\w-]*)\s+(?:paid|covered|bought|booked)\b")
+_EACH = re.compile(r"\b(?:each|per (?:person|head)|apiece|a head)\b", re.I)
+_SHARED = re.compile(r"\b(?:split|shared?|together|between us|kitty|pool)\b", re.I)
+_STOP_LABELS = {"it", "that", "this", "which", "total", "everything", "all", "me", "you", "us", "them"}
+
+
+def parse_amount(s: str) -> Optional[float]:
+    s = s.replace(" ", "")
+    if "," in s and "." in s:
+        dec = max(s.rfind(","), s.rfind("."))
+        s = s[:dec].replace(",", "").replace(".", "") + "." + s[dec + 1:]
+    elif "," in s or "." in s:
+        sep = "," if "," in s else "."
+        head, _, tail = s.rpartition(sep)
+        # "1,200" / "1.200" are thousands, "12,50" / "12.5" are decimals
+        s = head.replace(sep, "") + tail if len(tail) == 3 else head.replace(sep, "") + "." + tail
+    try:
+        return float(s)
+    except ValueError:
+        return None
+
+
+def _label(text: str, start: int, end: int) -> str:
+    m = _FOR.match(text[end:])
+    if m and m.group(1).lower() not in _STOP_LABELS:
+        return m.group(1)
+    m = _BEFORE.search(text[:start])
+    if m and m.group(1).lower() not in _STOP_LABELS:
+        return m.group(1)
+    return "unspecified"
+
+
+def _payer(text: str, sender: str) -> str:
+    if _EACH.search(text):
+        return "each"
+    if _SELF_PAID.search(text):
+        return sender
+    m = _OTHER_PAID.search(text)
+    if m and m.group(1) not in {"I", "We", "They"}:
+        return m.group(1)
+    if _SHARED.search(text):
+        return "shared"
+    return "unknown"
+
+
+def _dirham_chat(messages: List[dict], locale: Optional[str]) -> bool:
+    region = re.split(r"[-_]", locale or "")[1:2]
+    if region and region[0].upper() == "MA":
+        return True
+    return any(_DIRHAM_CHAT.search(m.get("text", "") or "") for m in messages)
+
+
+def _unit_glued(hit: "re.Match[str]") -> bool:
+    if hit.group("pre"):
+        return hit.end("pre") == hit.start("n1")
+    return hit.end("n2") == hit.start("post")
+
+
+def extract_expenses(messages: List[dict], locale: Optional[str] = None) -> List[Dict[str, Any]]:
+    items: List[Dict[str, Any]] = []
+    dirhams: Optional[bool] = None  # looked up on the first "dh"/"mad"
+    for m in messages:
+        text = m.get("text", "") or ""
+        if not any(ch.isdigit() for ch in text):
+            continue
+        sender = m.get("sender", "user")
+        for hit in _AMOUNT.finditer(text):
+            unit = (hit.group("pre") or hit.group("post") or "").lower()
+            if not unit and not _VERB_BEFORE.search(text[:hit.start()]):
+                continue
+            if unit in _AMBIGUOUS_CODES:
+                if dirhams is None:
+                    dirhams = _dirham_chat(messages, locale)
+                if not (dirhams and _unit_glued(hit)):
+                    continue
+            amount = parse_amount(hit.group("n1") or hit.group("n2"))
+            if amount is None or amount <= 0:
+                continue
+            items.append({
+                "label": _label(text, hit.start(), hit.end()),
+                "amount": round(amount, 2),
+                "currency": CURRENCIES.get(unit, "unknown"),
+                "payer": _payer(text, sender),
+                "sender": sender,
+            })
+    return items
+
+
+def expense_report(messages: List[dict], locale: Optional[str] = None) -> Dict[str, Any]:
+    items = extract_expenses(messages, locale)
+    by_currency = Counter(i["currency"] for i in items if i["currency"] != "unknown")
+    currency = by_currency.most_common(1)[0][0] if by_currency else "unknown"
+    # Per-person prices ("30€ each") are listed, not totalled: the group size is not known here
+    counted = [i for i in items if i["currency"] in (currency, "unknown") and i["payer"] != "each"]
+    total = round(sum(i["amount"] for i in counted), 2)
+    per_payer: Dict[str, float] = defaultdict(float)
+    for i in counted:
+        per_payer[i["payer"]] += i["amount"]
+    participants = sorted({m.get("sender", "user") for m in messages})
+    return {
+        "total_estimated": total,
+        "currency": currency,
+        "items": [{k: i[k] for k in ("label", "amount", "payer")} for i in items],
+        "per_payer": {p: round(v, 2) for p, v in per_payer.items()},
+        "notes": _expense_notes(items, by_currency, currency, total, participants),
+    }
+
+
+def _expense_notes(
+    items: List[Dict[str, Any]], by_currency: Counter, currency: str, total: float, participants: List[str],
+) -> List[str]:
+    if not items:
+        return ["No amounts mentioned yet; share prices to get a budget split."]
+    notes: List[str] = []
+    if len(by_currency) > 1:
+        others = ", ".join(c for c in by_currency if c != currency)
+        notes.append(f"Amounts in {others} are listed but not included in the {currency} total.")
+    if currency == "unknown":
+        notes.append("No currency given; totals assume a single currency.")
+    each = sum(1 for i in items if i["payer"] == "each")
+    if each:
+        notes.append(f"{each} per-person amount(s) are listed but not included in the total.")
+    unknown = sum(1 for i in items if i["payer"] == "unknown")
+    if unknown:
+        notes.append(f"{unknown} item(s) have no clear payer.")
+    if len(participants) > 1 and total:
+        notes.append(f"An even split is {round(total / len(participants), 2)} each across {len(participants)} people.")
+    return notes
+
+# ---------------- narrative merge ----------------
+
+# Fields an LLM may rewrite; everything else stays as computed
+NARRATIVE_FIELDS: Dict[str, Tuple[str, type]] = {
+    "ConversationAnalyzer": ("insight", str),
+    "ExpenseTracker": ("notes", list),
+}
+
+LOCAL_ENGINES = {
+    "ConversationAnalyzer": conversation_stats,
+    "ExpenseTracker": expense_report,
+}
+
+
+def merge_narrative(role: str, computed: Dict[str, Any], parsed: Any) -> Dict[str, Any]:
+    field, kind = NARRATIVE_FIELDS[role]
+    out = dict(computed)
+    value = parsed.get(field) if isinstance(parsed, dict) else None
+    if isinstance(value, kind) and value:
+        out[field] = [str(x) for x in value if str(x).strip()] if kind is list else value.strip()
+    return out
@@ -0,0 +1,70 @@
+from __future__ import annotations
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Any, Dict, Optional, Tuple
+import json, os, sqlite3, threading, time
+
+from .config import get_settings
+
+
+# Bounded in-process LRU with TTL, optionally backed by a SQLite file that survives restarts
+class ResultCache:
+    def __init__(self, max_entries: int = 1024, ttl_s: float = 3600.0, sqlite_path: Optional[str] = None):
+        self.max_entries = max(1, max_entries)
+        self.ttl_s = ttl_s
+        self._mem: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        self.counters: Dict[str, int] = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "sets": 0, "evictions": 0}
+        if sqlite_path:
+            os.makedirs(os.path.dirname(os.path.abspath(sqlite_path)), exist_ok=True)
+            self._db = sqlite3.connect(sqlite_path, check_same_thread=False, isolation_level=None)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)")
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        now = time.time()
+        with self._lock:
+            hit = self._mem.get(key)
+            if hit and hit[0] > now:
+                self._mem.move_to_end(key)
+                self.counters["memory_hits"] += 1
+                return json.loads(hit[1])
+            if hit:
+                del self._mem[key]
+            if self._db is not None:
+                row = self._db.execute("SELECT value, expires_at FROM results WHERE key = ?", (key,)).fetchone()
+                if row and row[1] > now:
+                    self._put_mem(key, row[0], row[1])
+                    self.counters["disk_hits"] += 1
+                    return json.loads(row[0])
+                if row:
+                    self._db.execute("DELETE FROM results WHERE key = ?", (key,))
+            self.counters["misses"] += 1
+            return None
+
+    def set(self, key: str, value: Dict[str, Any]) -> None:
+        data = json.dumps(value, ensure_ascii=False)
+        expires_at = time.time() + self.ttl_s
+        with self._lock:
+            self._put_mem(key, data, expires_at)
+            if self._db is not None:
+                self._db.execute("INSERT OR REPLACE INTO results (key, value, expires_at) VALUES (?, ?, ?)", (key, data, expires_at))
+            self.counters["sets"] += 1
+
+    def _put_mem(self, key: str, data: str, expires_at: float) -> None:
+        self._mem[key] = (expires_at, data)
+        self._mem.move_to_end(key)
+        while len(self._mem) > self.max_entries:
+            self._mem.popitem(last=False)
+            self.counters["evictions"] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {**self.counters, "entries": len(self._mem), "persistent": self._db is not None}
+
+
+@lru_cache
+def get_cache() -> ResultCache:
+    s = get_settings()
+    return ResultCache(s.cache_max_entries, s.cache_ttl_s, s.cache_sqlite_path or None)
@@ -0,0 +1,273 @@
+from __future__ import annotations
+from collections import Counter, OrderedDict
+from functools import lru_cache
+from itertools import islice
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+import json, re, threading, unicodedata
+
+from .config import get_settings
+from .conversations import fingerprint
+
+# Context classifier: one tokenizing pass per message, each token looked up once in a
+# locale lexicon that covers every context; the few multi-word terms are matched as phrases.
+# Scores are additive per message, so a conversation's totals can be extended with only
+# the messages that arrived since the last call.
+
+CONTEXTS: Tuple[str, ...] = ("travel", "project", "social")
+PRIORS: Dict[str, float] = {"travel": 0.4, "project": 0.3, "social": 0.3}  # travel wins ties, as before
+SMOOTHING = 3.0  # pseudo-weight of the priors; a few hits are enough to move the result
+SCORE_CHUNK = 512  # messages scored per joined string; bounds the text copy for very long chats
+
+# term -> weight per context; "en" is always merged under the requested locale
+LEXICONS: Dict[str, Dict[str, Dict[str, float]]] = {
+    "en": {
+        "travel": {
+            "trip": 2, "travel": 2, "itinerary": 3, "itineraries": 3, "hotel": 2, "hostel": 2, "airbnb": 2,
+            "flight": 2, "flights": 2, "train": 1, "visa": 2, "beach": 1, "resort": 2, "tour": 1, "hike": 1,
+            "mountain": 1, "village": 1, "island": 1, "weekend": 0.5, "louvre": 2, "montmartre": 2,
+            "paris": 1.5, "rome": 1.5, "chamonix": 2, "passport": 2, "luggage": 2, "airport": 2,
+            "check in": 1.5, "road trip": 3, "booking": 1, "vacation": 2, "holiday": 1.5, "sightseeing": 2,
+        },
+        "project": {
+            "task": 2, "tasks": 2, "todo": 2, "to do": 1, "deadline": 3, "deliverable": 3, "budget": 1.5,
+            "cost": 1, "split": 1, "share": 0.5, "pay": 1, "invoice": 2.5, "assign": 2, "assigned": 2,
+            "status": 1, "milestone": 3, "sprint": 3, "ticket": 2, "story": 0.5, "owner": 1, "due": 1.5,
+            "standup": 2.5, "backlog": 2.5, "release": 1.5, "action item": 2.5, "expense": 2, "expenses": 2,
+        },
+        "social": {
+            "feel": 1.5, "feeling": 1.5, "angry": 2.5, "tension": 2.5, "vibe": 2, "tone": 1.5, "argue": 2.5,
+            "confused": 1.5, "happy": 1, "sad": 2, "frustrated": 2.5, "toxic": 3, "mood": 2.5,
+            "engagement": 1.5, "distant": 2, "reset": 1, "upset": 2.5, "annoyed": 2, "hurt": 2,
+            "ignored": 2, "sorry": 1, "fight": 2, "drama": 2.5, "calm down": 2.5,
+        },
+    },
+    "fr": {
+        "travel": {
+            "voyage": 2, "voyager": 2, "itineraire": 3, "hotel": 2, "vol": 1.5, "avion": 2, "train": 1,
+            "plage": 1, "randonnee": 1.5, "montagne": 1, "village": 1, "ile": 1, "week end": 0.5,
+            "vacances": 2, "billet": 1.5, "passeport": 2, "valise": 2, "aeroport": 2, "gare": 1,
+        },
+        "project": {
+            "tache": 2, "taches": 2, "echeance": 3, "livrable": 3, "budget": 1.5, "cout": 1, "facture": 2.5,
+            "payer": 1, "rembourser": 2, "partager": 0.5, "jalon": 3, "statut": 1, "responsable": 1,
+            "depenses": 2, "reunion": 1.5,
+        },
+        "social": {
+            "ressens": 1.5, "colere": 2.5, "fache": 2.5, "tension": 2.5, "ambiance": 2, "ton": 1,
+            "dispute": 2.5, "triste": 2, "content": 1, "frustre": 2.5, "toxique": 3, "humeur": 2.5,
+            "distant": 2, "blesse": 2, "desole": 1, "enerve": 2,
+        },
+    },
+    "es": {
+        "travel": {
+            "viaje": 2, "viajar": 2, "itinerario": 3, "hotel": 2, "vuelo": 2, "avion": 2, "tren": 1,
+            "playa": 1, "montana": 1, "isla": 1, "vacaciones": 2, "pasaporte": 2, "maleta": 2,
+            "aeropuerto": 2, "excursion": 1.5, "fin de semana": 0.5,
+        },
+        "project": {
+            "tarea": 2, "tareas": 2, "plazo": 2.5, "fecha limite": 3, "entregable": 3, "presupuesto": 1.5,
+            "costo": 1, "coste": 1, "factura": 2.5, "pagar": 1, "dividir": 1, "asignar": 2, "estado": 0.5,
+            "hito": 3, "gastos": 2, "reunion": 1.5,
+        },
+        "social": {
+            "siento": 1.5, "enojado": 2.5, "enfadado": 2.5, "tension": 2.5, "ambiente": 1.5, "tono": 1.5,
+            "discutir": 2.5, "triste": 2, "feliz": 1, "frustrado": 2.5, "toxico": 3, "animo": 2,
+            "distante": 2, "dolido": 2, "perdon": 1, "pelea": 2,
+        },
+    },
+    "de": {
+        "travel": {
+            "reise": 2, "reisen": 2, "urlaub": 2, "reiseplan": 3, "hotel": 2, "flug": 2, "zug": 1,
+            "strand": 1, "wandern": 1.5, "berg": 1, "berge": 1, "insel": 1, "reisepass": 2, "koffer": 2,
+            "flughafen": 2, "bahnhof": 1, "wochenende": 0.5,
+        },
+        "project": {
+            "aufgabe": 2, "aufgaben": 2, "frist": 3, "deadline": 3, "budget": 1.5, "kosten": 1,
+            "rechnung": 2.5, "bezahlen": 1, "teilen": 0.5, "zuweisen": 2, "meilenstein": 3, "status": 1,
+            "ausgaben": 2, "besprechung": 1.5,
+        },
+        "social": {
+            "fuhle": 1.5, "wutend": 2.5, "sauer": 2, "spannung": 2, "stimmung": 2.5, "ton": 1,
+            "streit": 2.5, "streiten": 2.5, "traurig": 2, "glucklich": 1, "frustriert": 2.5, "toxisch": 3,
+            "distanziert": 2, "verletzt": 2, "entschuldigung": 1,
+        },
+    },
+}
+
+_WORD = re.compile(r"\w+")
+_MARKS = re.compile(r"[\u0300-\u036f]")
+_is_word = re.compile(r"\w").match
+
+
+def fold(text: str) -> str:
+    # casefold and drop accents so "Hôtel" and "hotel" hit the same entry
+    text = text.casefold()
+    if text.isascii():
+        return text
+    return _MARKS.sub("", unicodedata.normalize("NFKD", text))
+
+
+class Scores(NamedTuple):
+    label: str
+    scores: Dict[str, float]    # calibrated, sums to 1
+    evidence: Dict[str, float]  # raw weighted hits
+    messages: int
+
+
+class Lexicon(NamedTuple):
+    words: Dict[str, List[Tuple[int, float]]]                       # token -> [(context index, weight)]
+    phrases: Optional["re.Pattern[str]"]                            # every phrase in one alternation
+    phrase_entries: Dict[Tuple[str, ...], List[Tuple[int, float]]]  # phrase tokens -> [(context index, weight)]
+
+
+def compile_lexicon(tables: Iterable[Dict[str, Dict[str, float]]]) -> Lexicon:
+    merged: Dict[Tuple[Tuple[str, ...], int], float] = {}
+    for table in tables:
+        for ctx, terms in table.items():
+            if ctx not in CONTEXTS:
+                continue
+            ci = CONTEXTS.index(ctx)
+            for term, weight in terms.items():
+                tokens = tuple(_WORD.findall(fold(term)))
+                if tokens:
+                    merged[(tokens, ci)] = float(weight)
+    words: Dict[str, List[Tuple[int, float]]] = {}
+    grouped: Dict[Tuple[str, ...], List[Tuple[int, float]]] = {}
+    for (tokens, ci), weight in merged.items():
+        target = words.setdefault(tokens[0], []) if len(tokens) == 1 else grouped.setdefault(tokens, [])
+        target.append((ci, weight))
+    if not grouped:
+        return Lexicon(words, None, {})
+    # Longest first, so "new york city" wins over "new york" at the same offset. No capture groups and
+    # no leading \b: every branch starts with a literal, which lets re skip ahead on the first
+    # character; a hit is mapped back to its phrase by its tokens, the left boundary checked per match.
+    alternation = "|".join(r"\W+".join(map(re.escape, t)) for t in sorted(grouped, key=len, reverse=True))
+    return Lexicon(words, re.compile("(?:" + alternation + r")\b"), grouped)
+
+
+def score_text(lex: Lexicon, text: str) -> List[float]:
+    # One tokenizing pass counted in C, then one lookup per distinct token; one more pass finds every
+    # phrase, tallied by its tokens
+    out = [0.0] * len(CONTEXTS)
+    text = fold(text)
+    words = lex.words
+    for tok, count in Counter(_WORD.findall(text)).items():
+        for ci, weight in words.get(tok, ()):
+            out[ci] += weight * count
+    if lex.phrases is None:
+        return out
+    hits: Counter = Counter()
+    search, pos = lex.phrases.search, 0
+    while True:
+        m = search(text, pos)
+        if m is None:
+            break
+        start = m.start()
+        if start and _is_word(text[start - 1]):
+            pos = start + 1  # mid-word hit: a phrase may still start right after it
+            continue
+        hits[tuple(_WORD.findall(m.group()))] += 1
+        pos = m.end()
+    for tokens, count in hits.items():
+        for ci, weight in lex.phrase_entries[tokens]:
+            out[ci] += weight * count
+    return out
+
+
+def calibrate(evidence: List[float]) -> Dict[str, float]:
+    # Share of the weighted evidence, smoothed towards the priors: no hits returns the priors,
+    # a long chat converges to the evidence split instead of saturating at 1.0
+    total = sum(evidence)
+    return {
+        ctx: round((evidence[i] + SMOOTHING * PRIORS[ctx]) / (total + SMOOTHING), 4)
+        for i, ctx in enumerate(CONTEXTS)
+    }
+
+
+class _Running(NamedTuple):
+    tail: str
+    count: int
+    evidence: List[float]
+
+
+class ContextClassifier:
+    def __init__(self, lexicons: Dict[str, Dict[str, Dict[str, float]]], max_conversations: int = 10_000):
+        self.lexicons = lexicons
+        self.max_conversations = max(1, max_conversations)
+        self._compiled: Dict[str, Lexicon] = {}
+        self._running: "OrderedDict[Tuple[str, str], _Running]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def lexicon(self, locale: Optional[str]) -> Lexicon:
+        lang = (locale or "en").split("-")[0].split("_")[0].lower()
+        lex = self._compiled.get(lang)
+        if lex is None:
+            tables = [self.lexicons["en"]]
+            if lang != "en" and lang in self.lexicons:
+                tables.append(self.lexicons[lang])
+            lex = self._compiled[lang] = compile_lexicon(tables)
+        return lex
+
+    def evidence(self, messages: Iterable[dict], locale: Optional[str] = None) -> List[float]:
+        # "_" is a word token no term starts with, so phrases never match across messages; scores
+        # are additive, so scoring a few hundred messages at a time gives the same totals
+        lex = self.lexicon(locale)
+        out = [0.0] * len(CONTEXTS)
+        it = iter(messages)
+        while True:
+            chunk = " _ ".join(m.get("text", "") for m in islice(it, SCORE_CHUNK))
+            if not chunk:
+                return out
+            for i, v in enumerate(score_text(lex, chunk)):
+                out[i] += v
+
+    def classify(
+        self, messages: List[dict], locale: Optional[str] = None, conversation_id: Optional[str] = None,
+    ) -> Scores:
+        if not conversation_id or not messages:
+            ev = self.evidence(messages, locale)
+        else:
+            ev = self._incremental(conversation_id, messages, locale)
+        scores = calibrate(ev)
+        label = max(CONTEXTS, key=lambda c: scores[c])
+        return Scores(label, scores, {c: round(ev[i], 3) for i, c in enumerate(CONTEXTS)}, len(messages))
+
+    def _incremental(self, conversation_id: str, messages: List[dict], locale: Optional[str]) -> List[float]:
+        # Reuse the running totals when the history up to the last seen message is unchanged
+        key = (conversation_id, (locale or "en").lower())
+        with self._lock:
+            prev = self._running.get(key)
+        start, ev = 0, [0.0] * len(CONTEXTS)
+        if prev is not None and prev.count <= len(messages) and fingerprint(messages[prev.count - 1]) == prev.tail:
+            start, ev = prev.count, list(prev.evidence)
+        for i, v in enumerate(self.evidence(islice(messages, start, None), locale)):
+            ev[i] += v
+        with self._lock:
+            self._running[key] = _Running(fingerprint(messages[-1]), len(messages), ev)
+            self._running.move_to_end(key)
+            while len(self._running) > self.max_conversations:
+                self._running.popitem(last=False)
+        return ev
+
+    def clear(self) -> None:
+        with self._lock:
+            self._running.clear()
+
+
+def load_lexicons(path: str) -> Dict[str, Dict[str, Dict[str, float]]]:
+    # Extra/override terms from JSON: {"<locale>": {"<context>": {"<term>": weight}}}
+    merged = {lang: {ctx: dict(terms) for ctx, terms in table.items()} for lang, table in LEXICONS.items()}
+    if not path:
+        return merged
+    with open(path, "r", encoding="utf-8") as f:
+        extra = json.load(f)
+    for lang, table in extra.items():
+        for ctx, terms in table.items():
+            merged.setdefault(lang.lower(), {}).setdefault(ctx, {}).update(terms)
+    return merged
+
+
+@lru_cache
+def get_classifier() -> ContextClassifier:
+    s = get_settings()
+    return ContextClassifier(load_lexicons(s.classifier_lexicon_path), s.digest_max_entries)
@@ -0,0 +1,141 @@
+from __future__ import annotations
+from typing import Dict, List, NamedTuple, Optional, Pattern
+import re
+
+from .config import get_settings, parse_int_map
+
+# Rough token estimate (~4 chars/token) used for budgeting; good enough to compare before/after.
+def estimate_tokens(text: str) -> int:
+    return (len(text) + 3) // 4
+
+def _line_tokens(m: dict) -> int:
+    return estimate_tokens(f"{m.get('sender', 'user')}: {m.get('text', '')}") + 1
+
+_WORD = re.compile(r"\w", re.U)
+# Acknowledgements that carry nothing for any agent; compared lowercased, without punctuation.
+# Length is no signal: "好" or "是" is a full reply.
+_FILLER = frozenset({"ok", "okay", "k", "kk", "okk", "lol", "haha", "hahaha", "hmm", "np", "ty", "thx"})
+_NON_WORD = re.compile(r"[\W_]+", re.U)
+
+_DATES = r"\d{1,2}[/.-]\d{1,2}|jan\w*|feb\w*|mar\w*|apr\w*|may|jun\w*|jul\w*|aug\w*|sep\w*|oct\w*|nov\w*|dec\w*|monday|tuesday|wednesday|thursday|friday|saturday|sunday|weekend|tomorrow|tonight|next week|\d+\s*(?:days?|nights?)"
+_PLACES = r"trip|travel|visit|going to|fly|flight|train|hotel|airbnb|stay|destination|city|village|island|beach|mountain|paris|rome|london|lisbon|barcelona|chamonix"
+_ACTIVITIES = r"hike|hiking|ski|swim|walk|museum|tour|camp|bike|surf|snorkel|concert|festival"
+_WEATHER = r"weather|rain|sun|snow|cold|hot|warm|wind|forecast|season|summer|winter|spring|autumn|fall"
+_AMOUNTS = r"[€$£¥]\s?\d|\d+(?:[.,]\d+)?\s?(?:€|\$|£|eur|euros?|usd|dollars?|gbp|pounds?|k\b)|\b(?:paid|pay|owe|cost|split|price|budget|refund|deposit|invoice)\b"
+_FOOD = r"food|eat|dinner|lunch|breakfast|brunch|restaurant|cafe|café|bistro|vegan|vegetarian|allerg\w*|cuisine|dish|snack|cheap|budget|wine|beer|coffee"
+_TASKS = r"todo|to do|task|deadline|due|assign\w*|@\w+|book|buy|send|check|confirm|remind|will do|i'll|can you|need to|by (?:mon|tue|wed|thu|fri|sat|sun|tomorrow|tonight)"
+
+def _rx(*parts: str) -> Pattern[str]:
+    return re.compile(r"(?:" + "|".join(parts) + r")", re.I)
+
+
+class Policy(NamedTuple):
+    budget: int                         # estimated tokens for the conversation part; 0 = unlimited
+    pattern: Optional[Pattern[str]] = None
+    strict: bool = False                # drop lines without a match (unless nothing matches at all)
+    collapse: bool = True               # merge consecutive messages from the same sender
+
+
+POLICIES: Dict[str, Policy] = {
+    "TripPlanner": Policy(1500, _rx(_PLACES, _DATES, _ACTIVITIES, _WEATHER)),
+    "CultureGuide": Policy(600, _rx(_PLACES)),
+    "FoodieFriend": Policy(800, _rx(_FOOD, _PLACES)),
+    "WeatherAdvisor": Policy(500, _rx(_PLACES, _DATES, _ACTIVITIES, _WEATHER), strict=True),
+    "PackSmart": Policy(500, _rx(_PLACES, _DATES, _ACTIVITIES, _WEATHER), strict=True),
+    "TravelConcierge": Policy(1500, _rx(_PLACES, _DATES, _ACTIVITIES, _WEATHER, _FOOD)),  # fused travel pack
+    "TaskOrganizer": Policy(1500, _rx(_TASKS, _DATES)),
+    "ExpenseTracker": Policy(800, _rx(_AMOUNTS), strict=True),
+    "UnreadSummarizer": Policy(2500),
+    "MoodDetector": Policy(1200),
+    # Counts messages per sender, so runs must not be merged
+    "ConversationAnalyzer": Policy(0, collapse=False),
+}
+
+_STRICT_FALLBACK_LINES = 5
+
+
+def clean(messages: List[dict]) -> List[dict]:
+    # Drop lines without any word character ("", "👍", "!!"), bare acknowledgements ("ok", "lol")
+    # and exact repeats of an earlier message. Kept messages are the caller's objects unless their
+    # text needed stripping, and repeats are remembered by hash, so a long chat is not copied a
+    # second time.
+    seen, out = set(), []
+    for m in messages:
+        raw = m.get("text")
+        text = str(raw or "").strip()
+        if not _WORD.search(text) or (len(text) <= 8 and _NON_WORD.sub("", text).lower() in _FILLER):
+            continue
+        key = hash((m.get("sender", "user"), " ".join(text.lower().split())))
+        if key in seen:
+            continue
+        seen.add(key)
+        out.append(m if text == raw else {**m, "text": text})
+    return out
+
+
+def collapse_runs(messages: List[dict]) -> List[dict]:
+    out: List[dict] = []
+    for m in messages:
+        if out and out[-1].get("sender", "user") == m.get("sender", "user"):
+            out[-1] = {**out[-1], "text": f"{out[-1]['text']} / {m['text']}"}
+        else:
+            out.append(m)  # never mutated; merges above build a new dict
+    return out
+
+
+def select(messages: List[dict], policy: Policy, budget: int) -> List[dict]:
+    if not messages:
+        return []
+    n = len(messages)
+    hits = [len(policy.pattern.findall(m["text"])) if policy.pattern else 0 for m in messages]
+    idx = list(range(n))
+    if policy.strict and any(hits):
+        idx = [i for i in idx if hits[i]]
+    elif policy.strict:
+        idx = idx[-_STRICT_FALLBACK_LINES:]
+    if budget <= 0:
+        return [messages[i] for i in idx]
+    # Relevance first, recency breaks ties; then restore chat order
+    ranked = sorted(idx, key=lambda i: (hits[i], i), reverse=True)
+    chosen, used = [], 0
+    for i in ranked:
+        cost = _line_tokens(messages[i])
+        if used + cost > budget:
+            continue
+        chosen.append(i)
+        used += cost
+    chosen.sort()
+    return [messages[i] for i in chosen]
+
+
+class Compactor:
+    # Shared cleanup is done once per request; per-role selection reuses it
+    def __init__(self, messages: List[dict]):
+        self.original = messages
+        self.cleaned = clean(messages)
+        self._collapsed: Optional[List[dict]] = None
+        self.budgets = parse_int_map(get_settings().compaction_budgets)  # "WeatherAdvisor=300,..."
+
+    @property
+    def collapsed(self) -> List[dict]:
+        if self._collapsed is None:
+            self._collapsed = collapse_runs(self.cleaned)
+        return self._collapsed
+
+    def for_role(self, role: str) -> List[dict]:
+        policy = POLICIES.get(role, Policy(get_settings().compaction_default_budget))
+        base = self.collapsed if policy.collapse else self.cleaned
+        return select(base, policy, self.budgets.get(role, policy.budget))
+
+
+def transcript_tokens(messages: List[dict]) -> int:
+    return sum(_line_tokens(m) for m in messages)
+
+
+def compaction_stats(original: List[dict], sent: List[dict]) -> Dict[str, int]:
+    return {
+        "messages_in": len(original),
+        "messages_sent": len(sent),
+        "tokens_full": transcript_tokens(original),
+        "tokens_sent": transcript_tokens(sent),
+    }
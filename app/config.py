@@ -1,5 +1,5 @@
 from functools import lru_cache
-from typing import Any
+from typing import Any, Dict
 
 # Prefer pydantic-settings if available (Pydantic v2 best practice)
 try:
@@ -30,8 +30,112 @@ class Settings(BaseSettings):
     # App
     debug: bool = Field(default=True, env="DEBUG")
 
+    # Execution
+    execution_mode: str = Field(default="async", env="EXECUTION_MODE")  # async|concurrent|sequential
+    agent_timeout_s: float = Field(default=90.0, env="AGENT_TIMEOUT_S")
+    travel_mode: str = Field(default="agents", env="TRAVEL_MODE")  # agents | fused (one call for the travel pack)
+    late_results: str = Field(default="cache", env="LATE_RESULTS")  # past ?deadline_ms: cache (keep running) | cancel
+    agent_max_workers: int = Field(default=16, env="AGENT_MAX_WORKERS")
+    max_inflight: int = Field(default=256, env="MAX_INFLIGHT")  # async orchestrations per process
+    llm_stream_json: bool = Field(default=False, env="LLM_STREAM_JSON")  # stream and stop once the JSON closes
+
+    # Agent output contract (app/schemas.py)
+    structured_output: str = Field(default="auto", env="STRUCTURED_OUTPUT")  # auto: send the JSON Schema where supported | off
+    output_repair: bool = Field(default=True, env="OUTPUT_REPAIR")  # one repair round-trip for outputs failing validation
+    max_output_tokens: str = Field(default="", env="MAX_OUTPUT_TOKENS")  # "prompt=N,..." over the built-in caps
+
+    # Outbound concurrency per provider (async path), "provider=N,..."
+    provider_max_concurrency: str = Field(default="gemini=32,groq=16", env="PROVIDER_MAX_CONCURRENCY")
+
+    # Outbound rate limits, "provider_or_model=RPM/TPM,..." (0 or absent = unlimited)
+    rate_limits: str = Field(default="", env="RATE_LIMITS")
+    ratelimit_sqlite_path: str = Field(default="", env="RATELIMIT_SQLITE_PATH")  # share buckets across processes
+    ratelimit_burst_s: float = Field(default=10.0, env="RATELIMIT_BURST_S")  # bucket depth in seconds of quota
+    retry_budget_ratio: float = Field(default=0.2, env="RETRY_BUDGET_RATIO")
+    retry_max_attempts: int = Field(default=3, env="RETRY_MAX_ATTEMPTS")
+
+    # Provider router: rolling health window, circuit breaker, optional hedged requests
+    router_window: int = Field(default=100, env="ROUTER_WINDOW")
+    router_error_threshold: float = Field(default=0.5, env="ROUTER_ERROR_THRESHOLD")
+    router_min_samples: int = Field(default=10, env="ROUTER_MIN_SAMPLES")
+    router_cooldown_s: float = Field(default=30.0, env="ROUTER_COOLDOWN_S")
+    hedge_enabled: bool = Field(default=False, env="HEDGE_ENABLED")
+    hedge_default_s: float = Field(default=8.0, env="HEDGE_DEFAULT_S")  # until enough samples for a p95
+    hedge_min_samples: int = Field(default=20, env="HEDGE_MIN_SAMPLES")
+
+    # Batch
+    batch_max_items: int = Field(default=5000, env="BATCH_MAX_ITEMS")
+    batch_item_concurrency: int = Field(default=64, env="BATCH_ITEM_CONCURRENCY")
+
+    # Per-agent conversation compaction
+    compaction_enabled: bool = Field(default=True, env="COMPACTION_ENABLED")
+    compaction_default_budget: int = Field(default=1500, env="COMPACTION_DEFAULT_BUDGET")  # est. tokens
+    compaction_budgets: str = Field(default="", env="COMPACTION_BUDGETS")  # "Role=N,Role=N"
+
+    # ConversationAnalyzer/ExpenseTracker: local = computed, no LLM call; narrative = computed
+    # numbers + LLM for insight/notes only; llm = previous full-LLM behaviour
+    local_analytics: str = Field(default="local", env="LOCAL_ANALYTICS")
+
+    # Observability
+    llm_prices: str = Field(
+        default="gemini/gemini-2.5-flash=0.30/2.50,groq/llama-3.3-70b-versatile=0.59/0.79,groq/llama-3.1-70b-versatile=0.59/0.79",
+        env="LLM_PRICES",
+    )  # "model=input/output" USD per 1M tokens, for llm_cost_usd_total
+    allow_profiling: bool = Field(default=False, env="ALLOW_PROFILING")  # enables ?profile=1
+    profile_interval_ms: float = Field(default=5.0, env="PROFILE_INTERVAL_MS")
+
+    # Server (python -m app.server)
+    host: str = Field(default="0.0.0.0", env="HOST")
+    port: int = Field(default=8000, env="PORT")
+    web_concurrency: int = Field(default=0, env="WEB_CONCURRENCY")  # workers; 0 = one per CPU, capped at 8
+    warmup: str = Field(default="blocking", env="WARMUP")  # blocking|background|off
+
+    # Context classifier
+    classifier_lexicon_path: str = Field(default="", env="CLASSIFIER_LEXICON_PATH")  # JSON terms merged over the built-ins
+    multi_min_score: float = Field(default=0.25, env="MULTI_MIN_SCORE")  # context=multi: share a pack needs to run
+
+    # Prompts
+    prompt_hot_reload: bool = Field(default=False, env="PROMPT_HOT_RELOAD")
+
+    # Per-conversation unread digests
+    digest_max_entries: int = Field(default=10000, env="DIGEST_MAX_ENTRIES")
+    digest_sqlite_path: str = Field(default="", env="DIGEST_SQLITE_PATH")  # empty = memory only
+
+    # Inbound admission control (app/admission.py), per process; clients are X-API-Key or the peer address
+    admission_enabled: bool = Field(default=True, env="ADMISSION_ENABLED")
+    admission_max_inflight: int = Field(default=128, env="ADMISSION_MAX_INFLIGHT")  # orchestrations running at once
+    admission_max_queue: int = Field(default=1000, env="ADMISSION_MAX_QUEUE")
+    admission_max_queue_wait_s: float = Field(default=15.0, env="ADMISSION_MAX_QUEUE_WAIT_S")  # shed (503) above this estimate
+    admission_key_concurrency: int = Field(default=32, env="ADMISSION_KEY_CONCURRENCY")  # per client; 0 = unlimited
+    admission_key_rpm: int = Field(default=0, env="ADMISSION_KEY_RPM")  # per client; 0 = unlimited
+    admission_key_limits: str = Field(default="", env="ADMISSION_KEY_LIMITS")  # "key=concurrency/rpm,..." overrides
+
+    # Message ingestion limits (app/messages.py): JSON bodies and NDJSON uploads
+    ingest_max_messages: int = Field(default=200_000, env="INGEST_MAX_MESSAGES")
+    ingest_max_bytes: int = Field(default=64 * 1024 * 1024, env="INGEST_MAX_BYTES")  # NDJSON upload size
+    ingest_max_line_bytes: int = Field(default=64 * 1024, env="INGEST_MAX_LINE_BYTES")  # one NDJSON message
+    ingest_max_text_chars: int = Field(default=8000, env="INGEST_MAX_TEXT_CHARS")  # longer texts are truncated
+
+    # Identical concurrent /orchestrate requests share one execution
+    coalesce_enabled: bool = Field(default=True, env="COALESCE_ENABLED")
+
+    # Job queue (POST /api/v1/jobs, python -m app.worker)
+    job_sqlite_path: str = Field(default="var/jobs.sqlite3", env="JOB_SQLITE_PATH")  # shared by API and workers
+    job_workers: int = Field(default=2, env="JOB_WORKERS")
+    job_visibility_s: float = Field(default=120.0, env="JOB_VISIBILITY_S")  # lease; extended while the job runs
+    job_max_attempts: int = Field(default=3, env="JOB_MAX_ATTEMPTS")
+    job_retention_s: float = Field(default=86400.0, env="JOB_RETENTION_S")  # finished jobs are purged after this
+    job_poll_interval_s: float = Field(default=0.5, env="JOB_POLL_INTERVAL_S")
+    job_max_wait_s: float = Field(default=30.0, env="JOB_MAX_WAIT_S")  # cap for GET ?wait_s long-polls
+
+    # Result cache
+    cache_enabled: bool = Field(default=True, env="CACHE_ENABLED")
+    cache_max_entries: int = Field(default=1024, env="CACHE_MAX_ENTRIES")
+    cache_ttl_s: float = Field(default=3600.0, env="CACHE_TTL_S")
+    cache_sqlite_path: str = Field(default="", env="CACHE_SQLITE_PATH")  # empty = memory only
+
     # ---- tolerant boolean parsing ----
-    @field_validator("debug", mode="before")
+    @field_validator("debug", "cache_enabled", "prompt_hot_reload", "compaction_enabled", "hedge_enabled", "llm_stream_json", "allow_profiling", "coalesce_enabled", "output_repair", "admission_enabled", mode="before")
     @classmethod
     def _parse_bool(cls, v: Any) -> Any:
         if isinstance(v, bool):
@@ -53,6 +157,16 @@ class Settings(BaseSettings):
         case_sensitive = False
 
 
+def parse_int_map(spec: str) -> Dict[str, int]:
+    # "a=1, b=2" -> {"a": 1, "b": 2}; malformed parts are ignored
+    out: Dict[str, int] = {}
+    for part in (spec or "").split(","):
+        key, _, n = part.partition("=")
+        if key.strip() and n.strip().isdigit():
+            out[key.strip()] = int(n)
+    return out
+
+
 @lru_cache
 def get_settings() -> Settings:
     return Settings()
\ No newline at end of file
@@ -0,0 +1,122 @@
+from __future__ import annotations
+from collections import OrderedDict
+from datetime import datetime
+from functools import lru_cache
+from typing import Any, Dict, List, NamedTuple, Optional
+import hashlib, json, os, sqlite3, threading
+
+from .config import get_settings
+
+
+class Digest(NamedTuple):
+    summary: str
+    action_items: List[str]
+    tail: str                 # fingerprint of the last message covered by the digest
+    last_ts: Optional[float]  # newest timestamp covered, fallback when the tail was edited away
+    count: int
+
+    def as_output(self) -> Dict[str, Any]:
+        return {"summary": self.summary, "action_items": self.action_items}
+
+
+class UnreadState(NamedTuple):
+    conversation_id: str
+    digest: Optional[Digest]
+    unread: List[dict]        # messages the summarizer still has to see, in chat order
+
+
+def fingerprint(m: dict) -> str:
+    key = f"{m.get('sender', 'user')}\x00{m.get('text', '')}\x00{m.get('timestamp') or ''}"
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()
+
+
+def parse_ts(v: Any) -> Optional[float]:
+    if v is None:
+        return None
+    if isinstance(v, (int, float)):
+        return float(v)
+    if isinstance(v, datetime):
+        return v.timestamp()
+    try:
+        return datetime.fromisoformat(str(v).replace("Z", "+00:00")).timestamp()
+    except ValueError:
+        return None
+
+
+def unread_since(messages: List[dict], digest: Optional[Digest]) -> List[dict]:
+    if digest is None:
+        return list(messages)
+    start = None
+    for i in range(len(messages) - 1, -1, -1):
+        if fingerprint(messages[i]) == digest.tail:
+            start = i + 1
+            break
+    if start is not None:
+        new = set(range(start, len(messages)))
+    elif digest.last_ts is not None:
+        new = {i for i, m in enumerate(messages) if (parse_ts(m.get("timestamp")) or 0.0) > digest.last_ts}
+    else:
+        new = set(range(len(messages)))
+    # Explicitly unread messages are always re-sent, even if they predate the digest
+    return [m for i, m in enumerate(messages) if i in new or m.get("read") is False]
+
+
+def digest_from_output(messages: List[dict], parsed: Any) -> Optional[Digest]:
+    if not isinstance(parsed, dict) or not messages:
+        return None
+    summary = str(parsed.get("summary") or "").strip()
+    if not summary:
+        return None
+    items = [str(x).strip() for x in parsed.get("action_items") or [] if str(x).strip()]
+    stamps = [t for t in (parse_ts(m.get("timestamp")) for m in messages) if t is not None]
+    return Digest(summary, items, fingerprint(messages[-1]), max(stamps) if stamps else None, len(messages))
+
+
+# Rolling per-conversation digests; in memory (bounded LRU) or SQLite when a path is configured
+class DigestStore:
+    def __init__(self, max_entries: int = 10_000, sqlite_path: Optional[str] = None):
+        self.max_entries = max(1, max_entries)
+        self._mem: "OrderedDict[str, Digest]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        if sqlite_path:
+            os.makedirs(os.path.dirname(os.path.abspath(sqlite_path)), exist_ok=True)
+            self._db = sqlite3.connect(sqlite_path, check_same_thread=False, isolation_level=None)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("CREATE TABLE IF NOT EXISTS digests (conversation_id TEXT PRIMARY KEY, digest TEXT NOT NULL)")
+
+    def get(self, conversation_id: str) -> Optional[Digest]:
+        with self._lock:
+            if self._db is not None:
+                row = self._db.execute("SELECT digest FROM digests WHERE conversation_id = ?", (conversation_id,)).fetchone()
+                return Digest(*json.loads(row[0])) if row else None
+            d = self._mem.get(conversation_id)
+            if d is not None:
+                self._mem.move_to_end(conversation_id)
+            return d
+
+    def put(self, conversation_id: str, digest: Digest) -> None:
+        with self._lock:
+            if self._db is not None:
+                self._db.execute("INSERT OR REPLACE INTO digests (conversation_id, digest) VALUES (?, ?)",
+                                 (conversation_id, json.dumps(list(digest), ensure_ascii=False)))
+                return
+            self._mem[conversation_id] = digest
+            self._mem.move_to_end(conversation_id)
+            while len(self._mem) > self.max_entries:
+                self._mem.popitem(last=False)
+
+    def prepare(self, conversation_id: str, messages: List[dict]) -> UnreadState:
+        digest = self.get(conversation_id)
+        return UnreadState(conversation_id, digest, unread_since(messages, digest))
+
+    def record(self, state: UnreadState, messages: List[dict], parsed: Any) -> None:
+        digest = digest_from_output(messages, parsed)
+        if digest is not None:
+            self.put(state.conversation_id, digest)
+
+
+@lru_cache
+def get_digests() -> DigestStore:
+    s = get_settings()
+    return DigestStore(s.digest_max_entries, s.digest_sqlite_path or None)
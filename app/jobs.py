@@ -0,0 +1,216 @@
+from __future__ import annotations
+from functools import lru_cache
+from typing import Any, Dict, NamedTuple, Optional
+import asyncio, json, logging, os, sqlite3, threading, time, uuid
+
+from .config import get_settings
+from .messages import to_jsonable
+from .orchestrator import arun_orchestrator, run_orchestrator
+
+log = logging.getLogger(__name__)
+
+# Durable job queue in one SQLite file (WAL), shared by the API processes that enqueue and poll and
+# the worker processes (python -m app.worker) that run jobs. A claimed job is leased for
+# `visibility_s`; the worker extends the lease while it runs, so a job whose worker crashed becomes
+# visible again and is retried, up to max_attempts.
+
+STATUSES = ("queued", "running", "done", "failed")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    request TEXT NOT NULL,
+    result TEXT,
+    error TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    worker TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    visible_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_ready ON jobs (status, visible_at);
+"""
+
+
+class Job(NamedTuple):
+    id: str
+    status: str
+    request: Dict[str, Any]
+    result: Optional[Dict[str, Any]]
+    error: Optional[str]
+    attempts: int
+    created_at: float
+    updated_at: float
+
+    def as_output(self) -> Dict[str, Any]:
+        out: Dict[str, Any] = {
+            "id": self.id, "status": self.status, "attempts": self.attempts,
+            "created_at": self.created_at, "updated_at": self.updated_at,
+        }
+        if self.status == "done":
+            out["result"] = self.result
+        if self.error:
+            out["error"] = self.error
+        return out
+
+
+_COLUMNS = "id, status, request, result, error, attempts, created_at, updated_at"
+
+
+def _job(row: Any) -> Job:
+    return Job(row[0], row[1], json.loads(row[2]), json.loads(row[3]) if row[3] else None, row[4], row[5], row[6], row[7])
+
+
+class JobQueue:
+    def __init__(self, path: str, visibility_s: float = 120.0, max_attempts: int = 3, retention_s: float = 86400.0):
+        self.visibility_s = max(1.0, visibility_s)
+        self.max_attempts = max(1, max_attempts)
+        self.retention_s = retention_s
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        # Autocommit; claims take the write lock up front with BEGIN IMMEDIATE
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(_SCHEMA)
+        self._lock = threading.Lock()
+
+    def submit(self, request: Dict[str, Any]) -> str:
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO jobs (id, status, request, created_at, updated_at, visible_at) VALUES (?, 'queued', ?, ?, ?, ?)",
+                (job_id, json.dumps(request, ensure_ascii=False, default=to_jsonable), now, now, now),
+            )
+        return job_id
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            row = self._db.execute(f"SELECT {_COLUMNS} FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return _job(row) if row else None
+
+    def claim(self, worker: str) -> Optional[Job]:
+        # Oldest queued job, or a running one whose lease expired (its worker died)
+        now = time.time()
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                while True:
+                    row = self._db.execute(
+                        f"SELECT {_COLUMNS} FROM jobs WHERE status IN ('queued', 'running') AND visible_at <= ? "
+                        "ORDER BY created_at LIMIT 1", (now,),
+                    ).fetchone()
+                    if row is None:
+                        self._db.execute("COMMIT")
+                        return None
+                    job = _job(row)
+                    if job.attempts >= self.max_attempts:
+                        self._db.execute(
+                            "UPDATE jobs SET status = 'failed', error = ?, worker = NULL, updated_at = ? WHERE id = ?",
+                            (job.error or f"abandoned after {job.attempts} attempts", now, job.id),
+                        )
+                        continue
+                    self._db.execute(
+                        "UPDATE jobs SET status = 'running', attempts = attempts + 1, worker = ?, updated_at = ?, visible_at = ? WHERE id = ?",
+                        (worker, now, now + self.visibility_s, job.id),
+                    )
+                    self._db.execute("COMMIT")
+                    return job._replace(status="running", attempts=job.attempts + 1, updated_at=now)
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+
+    def extend(self, job_id: str, worker: str) -> bool:
+        # Heartbeat; False means the lease was lost and another worker may own the job now
+        now = time.time()
+        with self._lock:
+            cur = self._db.execute(
+                "UPDATE jobs SET visible_at = ?, updated_at = ? WHERE id = ? AND worker = ? AND status = 'running'",
+                (now + self.visibility_s, now, job_id, worker),
+            )
+        return cur.rowcount == 1
+
+    def complete(self, job_id: str, worker: str, result: Dict[str, Any]) -> bool:
+        with self._lock:
+            cur = self._db.execute(
+                "UPDATE jobs SET status = 'done', result = ?, error = NULL, worker = NULL, updated_at = ? "
+                "WHERE id = ? AND worker = ? AND status = 'running'",
+                (json.dumps(result, ensure_ascii=False), time.time(), job_id, worker),
+            )
+        return cur.rowcount == 1
+
+    def fail(self, job_id: str, worker: str, error: str, attempts: int) -> None:
+        # Retried with a short backoff until max_attempts, then failed for good
+        now = time.time()
+        final = attempts >= self.max_attempts
+        with self._lock:
+            self._db.execute(
+                "UPDATE jobs SET status = ?, error = ?, worker = NULL, updated_at = ?, visible_at = ? "
+                "WHERE id = ? AND worker = ? AND status = 'running'",
+                ("failed" if final else "queued", error, now, now + min(60.0, 2.0 ** attempts), job_id, worker),
+            )
+
+    def purge(self) -> int:
+        with self._lock:
+            cur = self._db.execute(
+                "DELETE FROM jobs WHERE status IN ('done', 'failed') AND updated_at < ?", (time.time() - self.retention_s,),
+            )
+        return cur.rowcount
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            rows = self._db.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        return {**{s: 0 for s in STATUSES}, **dict(rows)}
+
+
+@lru_cache
+def get_jobs() -> JobQueue:
+    s = get_settings()
+    return JobQueue(s.job_sqlite_path, s.job_visibility_s, s.job_max_attempts, s.job_retention_s)
+
+# ---------------- worker ----------------
+
+def run_job(request: Dict[str, Any]) -> Dict[str, Any]:
+    # request: {"kwargs": orchestrator kwargs, "execution": mode or None, "fused": bool}
+    kwargs = request["kwargs"]
+    mode = request.get("execution") or get_settings().execution_mode
+    if mode == "async" or request.get("fused"):
+        return asyncio.run(arun_orchestrator(**kwargs, fused=bool(request.get("fused"))))
+    return run_orchestrator(execution=mode, **kwargs)
+
+
+def work(stop: threading.Event, worker: Optional[str] = None) -> None:
+    # Claim, run, record; the lease is extended from a side thread while the job runs
+    queue = get_jobs()
+    worker = worker or f"{os.uname().nodename if hasattr(os, 'uname') else 'local'}:{os.getpid()}"
+    poll_s = get_settings().job_poll_interval_s
+    next_purge = 0.0
+    while not stop.is_set():
+        if time.monotonic() >= next_purge:
+            queue.purge()
+            next_purge = time.monotonic() + 600
+        job = queue.claim(worker)
+        if job is None:
+            stop.wait(poll_s)
+            continue
+        done = threading.Event()
+
+        def heartbeat(job_id: str = job.id) -> None:
+            while not done.wait(queue.visibility_s / 3):
+                if not queue.extend(job_id, worker):  # type: ignore[arg-type]
+                    log.warning("job %s: lease lost", job_id)
+                    return
+
+        beat = threading.Thread(target=heartbeat, name="job-heartbeat", daemon=True)
+        beat.start()
+        try:
+            result = run_job(job.request)
+        except Exception as e:
+            log.warning("job %s attempt %d failed: %s", job.id, job.attempts, e)
+            queue.fail(job.id, worker, f"{type(e).__name__}: {e}", job.attempts)
+        else:
+            if not queue.complete(job.id, worker, result):
+                log.warning("job %s finished after its lease was lost; result dropped", job.id)
+        finally:
+            done.set()
+            beat.join()
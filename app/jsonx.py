@@ -0,0 +1,140 @@
+from __future__ import annotations
+from typing import Any, List, Optional
+import json, re
+
+# Single-pass extractor for the first top-level JSON value in LLM output. It tracks string and
+# bracket state, so braces inside strings or in trailing prose do not confuse it, and it can be
+# fed chunk by chunk while a response is still streaming.
+
+_CLOSERS = {"{": "}", "[": "]"}
+_SPECIAL = re.compile(r'["\\{}\[\]]')
+_REPAIR_SPECIAL = re.compile(r'["\\,“”]')
+_CLOSES_NEXT = re.compile(r"\s*[}\]]")
+
+
+class JsonExtractor:
+    def __init__(self, allow_array: bool = False):
+        self.allow_array = allow_array
+        self.buf: List[str] = []
+        self.size = 0                 # characters fed so far
+        self.start: Optional[int] = None
+        self.stack: List[str] = []
+        self.in_string = False
+        self.skip = -1                # absolute offset of an escaped character
+        self.done = False
+        self.result: Optional[str] = None
+
+    @property
+    def started(self) -> bool:
+        return self.start is not None
+
+    def feed(self, chunk: str) -> Optional[str]:
+        # Returns the raw text of the first complete top-level value once it closes.
+        # Only structural characters are visited; the regex skips everything else in C.
+        if self.done:
+            return self.result
+        base = self.size
+        self.buf.append(chunk)
+        self.size += len(chunk)
+        for m in _SPECIAL.finditer(chunk):
+            pos = base + m.start()
+            ch = m.group()
+            if self.start is None:
+                if ch == "{" or (ch == "[" and self.allow_array):
+                    self.start = pos
+                    self.stack.append(_CLOSERS[ch])
+                continue
+            if self.in_string:
+                if pos == self.skip:
+                    continue
+                if ch == "\\":
+                    self.skip = pos + 1
+                elif ch == '"':
+                    self.in_string = False
+            elif ch == '"':
+                self.in_string = True
+            elif ch in _CLOSERS:
+                self.stack.append(_CLOSERS[ch])
+            elif ch in "}]":
+                if self.stack and ch == self.stack[-1]:
+                    self.stack.pop()
+                if not self.stack:
+                    self.done = True
+                    self.result = "".join(self.buf)[self.start:pos + 1]
+                    return self.result
+        return None
+
+    def partial(self) -> Optional[str]:
+        # Best-effort completion of a truncated value: close the open string and brackets
+        if self.start is None:
+            return None
+        text = "".join(self.buf)[self.start:]
+        if self.in_string:
+            text += '"'
+        text = text.rstrip().rstrip(",")
+        return text + "".join(reversed(self.stack))
+
+
+def repair(text: str) -> str:
+    # Common LLM slips: trailing commas, smart quotes around keys/values. Only rewrites outside
+    # strings, so "a, ]" or a quoted “title” inside a value survive as written.
+    out: List[str] = []
+    last = 0
+    closer: Optional[str] = None  # what ends the current string; None outside strings
+    skip = -1
+    for m in _REPAIR_SPECIAL.finditer(text):
+        pos, ch = m.start(), m.group()
+        if closer is not None:
+            if pos == skip:
+                continue
+            if ch == "\\":
+                skip = pos + 1
+            elif ch == closer or (closer == "”" and ch == "“"):
+                out += (text[last:pos], '"')
+                last, closer = pos + 1, None
+            elif ch == '"' and closer == "”":
+                out += (text[last:pos], '\\"')  # straight quote inside a smart-quoted string
+                last = pos + 1
+            continue
+        if ch == '"':
+            closer = '"'
+        elif ch in "“”":
+            out += (text[last:pos], '"')
+            last, closer = pos + 1, "”"
+        elif ch == "," and _CLOSES_NEXT.match(text, pos + 1):
+            out.append(text[last:pos])
+            last = pos + 1
+    out.append(text[last:])
+    return "".join(out)
+
+
+def _loads(text: str) -> Any:
+    try:
+        return json.loads(text)
+    except ValueError:
+        return json.loads(repair(text))
+
+
+def extract_json(text: str) -> Any:
+    # Raises ValueError when no JSON value can be recovered. A closed candidate that does not parse
+    # ("use {name} here") is skipped and the scan resumes after it.
+    stripped = text.lstrip()
+    if stripped.startswith("```"):
+        stripped = stripped.split("\n", 1)[1] if "\n" in stripped else ""
+    pos, error = 0, None
+    while True:
+        ex = JsonExtractor(allow_array=pos == 0 and stripped[:1] == "[")
+        found = ex.feed(stripped[pos:])
+        if found is None:
+            break
+        try:
+            return _loads(found)
+        except ValueError as e:
+            error = e
+        pos += ex.start + len(found)  # type: ignore[operator]
+    part = ex.partial()
+    if part is None:
+        if error is not None:
+            raise error
+        raise ValueError("no JSON object found")
+    return _loads(part)
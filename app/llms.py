@@ -1,7 +1,16 @@
-import os
-from typing import Literal, Optional
-from crewai import LLM
+from __future__ import annotations
+import os, time
+from functools import lru_cache
+from typing import TYPE_CHECKING, Any, Awaitable, Callable, Dict, List, Literal, Optional, TypeVar
 from .config import get_settings
+from .ratelimit import limiter_for, request_tokens
+from .compaction import estimate_tokens
+from .metrics import record_llm
+
+if TYPE_CHECKING:
+    from crewai import LLM
+
+T = TypeVar("T")
 
 
 def _ensure_env(var: str, value: Optional[str]):
@@ -28,29 +37,193 @@ def _norm_groq_model(name: str) -> str:
     return name
 
 
-def make_gemini(model: Optional[str] = None) -> LLM:
+@lru_cache(maxsize=1)
+def limited_llm_class() -> type:
+    # crewai (and litellm under it) take seconds to import, so the import waits for the first
+    # client; the server warm-up calls this before traffic arrives
+    from crewai import LLM
+
+    class LimitedLLM(LLM):
+        # Blocking CrewAI calls go through the same per-provider/model limiter and retry budget
+        def call(self, messages, callbacks=[]) -> str:  # type: ignore[override]
+            provider = self.model.split("/", 1)[0]
+            call = super().call
+
+            def timed() -> str:
+                start = time.perf_counter()
+                try:
+                    out = call(messages, callbacks)
+                except Exception:
+                    record_llm(self.model, 0, 0, time.perf_counter() - start, False)
+                    raise
+                record_llm(self.model, _prompt_tokens(messages), estimate_tokens(str(out or "")), time.perf_counter() - start, True)
+                return out
+
+            return limiter_for(provider, self.model).run_sync(timed, request_tokens(messages, self.max_tokens))
+
+    return LimitedLLM
+
+
+def _prompt_tokens(messages: Any) -> int:
+    if isinstance(messages, list):
+        return estimate_tokens("".join(str(m.get("content", "")) for m in messages))
+    return estimate_tokens(str(messages))
+
+
+def model_name(provider: str, model: Optional[str] = None) -> str:
+    s = get_settings()
+    if provider == "groq":
+        return _norm_groq_model(model or s.groq_model)
+    return _norm_gemini_model(model or s.gemini_model)
+
+
+DEFAULT_TEMPERATURE = 0.25
+
+
+def make_gemini(model: Optional[str] = None, temperature: float = DEFAULT_TEMPERATURE, max_tokens: Optional[int] = None) -> LLM:
     s = get_settings()
     _ensure_env("GOOGLE_API_KEY", s.google_api_key)
     model_name = _norm_gemini_model(model or s.gemini_model)
-    return LLM(
+    return limited_llm_class()(
         model=model_name,
-        temperature=0.25,
+        temperature=temperature,
+        max_tokens=max_tokens,
         api_key=s.google_api_key or os.environ.get("GOOGLE_API_KEY", ""),
     )
 
 
-def make_groq(model: Optional[str] = None) -> LLM:
+def make_groq(model: Optional[str] = None, temperature: float = DEFAULT_TEMPERATURE, max_tokens: Optional[int] = None) -> LLM:
     s = get_settings()
     _ensure_env("GROQ_API_KEY", s.groq_api_key)
     model_name = _norm_groq_model(model or s.groq_model)
-    return LLM(
+    return limited_llm_class()(
         model=model_name,
-        temperature=0.25,
+        temperature=temperature,
+        max_tokens=max_tokens,
         api_key=s.groq_api_key or os.environ.get("GROQ_API_KEY", ""),
     )
 
 
-def get_llm(provider: Literal["gemini", "groq"] = "gemini", model: Optional[str] = None) -> LLM:
+# Long-lived clients keyed by (provider, model, temperature, max_tokens); LLM.call is stateless per request
+@lru_cache(maxsize=64)
+def _pooled_llm(provider: str, model: str, temperature: float, max_tokens: Optional[int] = None) -> LLM:
     if provider == "groq":
-        return make_groq(model)
-    return make_gemini(model)
\ No newline at end of file
+        return make_groq(model, temperature, max_tokens)
+    return make_gemini(model, temperature, max_tokens)
+
+
+def get_llm(
+    provider: Literal["gemini", "groq"] = "gemini",
+    model: Optional[str] = None,
+    temperature: float = DEFAULT_TEMPERATURE,
+    max_tokens: Optional[int] = None,
+) -> LLM:
+    return _pooled_llm(provider, model_name(provider, model), temperature, max_tokens)
+
+
+# Models whose provider rejected a response schema; they get plain JSON prompting from then on
+_SCHEMA_REJECTED: set = set()
+
+
+@lru_cache(maxsize=64)
+def supports_structured_output(model: str) -> bool:
+    if get_settings().structured_output == "off" or model in _SCHEMA_REJECTED:
+        return False
+    try:
+        import litellm
+        return bool(litellm.supports_response_schema(model=model))
+    except Exception:
+        return False
+
+
+def clear_llm_pool() -> None:
+    _pooled_llm.cache_clear()
+
+
+async def acomplete(
+    llm: Any,
+    messages: List[Dict[str, str]],
+    stop_at_json: bool = False,
+    max_tokens: Optional[int] = None,
+    response_format: Optional[Dict[str, Any]] = None,
+) -> str:
+    # Every async call is metered: latency, tokens (provider usage when reported) and cost.
+    # max_tokens/response_format apply per call on top of the pooled client's settings.
+    model = str(getattr(llm, "model", "unknown"))
+    extra = {k: v for k, v in (("max_tokens", max_tokens), ("response_format", response_format)) if v is not None}
+    start = time.perf_counter()
+    try:
+        text, usage = await _acomplete(llm, messages, stop_at_json, extra)
+    except Exception:
+        record_llm(model, 0, 0, time.perf_counter() - start, False)
+        raise
+    prompt_tokens = getattr(usage, "prompt_tokens", None) or _prompt_tokens(messages)
+    completion_tokens = getattr(usage, "completion_tokens", None) or estimate_tokens(text or "")
+    record_llm(model, prompt_tokens, completion_tokens, time.perf_counter() - start, True)
+    return text
+
+
+async def _acomplete(llm: Any, messages: List[Dict[str, str]], stop_at_json: bool, extra: Dict[str, Any]) -> tuple[str, Any]:
+    # Prefer a native async hook (newer CrewAI LLMs, test fakes), which gets max_tokens/response_format
+    # as keyword arguments; else go straight to litellm
+    if stop_at_json:
+        return await _schema_fallback(llm, extra, lambda ex: _acomplete_until_json(llm, messages, ex)), None
+    acall = getattr(llm, "acall", None)
+    if acall is not None:
+        return await _schema_fallback(llm, extra, lambda ex: acall(messages, **ex)), None
+    import litellm
+    resp = await _schema_fallback(llm, extra, lambda ex: litellm.acompletion(**_completion_params(llm, messages, ex)))
+    return resp["choices"][0]["message"]["content"], getattr(resp, "usage", None)
+
+
+async def _schema_fallback(llm: Any, extra: Dict[str, Any], call: Callable[[Dict[str, Any]], Awaitable[T]]) -> T:
+    try:
+        return await call(extra)
+    except Exception as e:
+        # litellm.BadRequestError and hook errors alike carry status_code 400
+        if "response_format" not in extra or getattr(e, "status_code", None) != 400:
+            raise
+    # Schema keywords the provider does not accept: remember, and retry with JSON prompting only
+    _SCHEMA_REJECTED.add(str(getattr(llm, "model", "unknown")))
+    supports_structured_output.cache_clear()
+    return await call({k: v for k, v in extra.items() if k != "response_format"})
+
+
+def _completion_params(llm: Any, messages: List[Dict[str, str]], extra: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    params = {
+        "model": llm.model,
+        "messages": messages,
+        "temperature": getattr(llm, "temperature", None),
+        "max_tokens": getattr(llm, "max_tokens", None),
+        "api_key": getattr(llm, "api_key", None),
+        "api_base": getattr(llm, "base_url", None),
+        **(extra or {}),
+    }
+    return {k: v for k, v in params.items() if v is not None}
+
+
+async def _acomplete_until_json(llm: Any, messages: List[Dict[str, str]], extra: Optional[Dict[str, Any]] = None) -> str:
+    # Stream the answer and hang up as soon as the first JSON object closes,
+    # so trailing prose is neither waited for nor streamed
+    from .jsonx import JsonExtractor
+    astream = getattr(llm, "astream", None)
+    if astream is not None:
+        stream = astream(messages, **(extra or {}))
+    else:
+        import litellm
+        stream = await litellm.acompletion(**_completion_params(llm, messages, extra), stream=True)
+    ex, parts = JsonExtractor(), []
+    try:
+        async for chunk in stream:
+            delta = chunk if isinstance(chunk, str) else (chunk.choices[0].delta.content or "")
+            parts.append(delta)
+            if ex.feed(delta) is not None:
+                return ex.result  # type: ignore[return-value]
+    finally:
+        close = getattr(stream, "aclose", None)
+        if close is not None:
+            try:
+                await close()
+            except Exception:
+                pass
+    return "".join(parts)
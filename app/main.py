@@ -1,10 +1,48 @@
-from fastapi import FastAPI, HTTPException, Query
+import asyncio, json, time
+from contextlib import asynccontextmanager, nullcontext
+from functools import partial
+from fastapi import Depends, FastAPI, Header, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-from typing import List, Literal, Optional, Dict, Any
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from starlette.background import BackgroundTask
+from typing import Any, Awaitable, Callable, Dict, List, Literal, Optional
 
-from .orchestrator import run_orchestrator, ContextType
+from .admission import Caller, Rejected, get_admission
+from .cache import get_cache
+from .classifier import get_classifier
+from .config import get_settings
+from .prompt_registry import get_prompts
+from .router import get_router
+from .singleflight import get_flights
+from .jobs import get_jobs
+from .messages import IngestError, Message, from_dicts, read_ndjson
+from .ratelimit import limiter_snapshot
+from .metrics import REGISTRY, collect, record_orchestration, span
+from .profiling import SamplingProfiler
+from .warmup import status as warmup_status, warm_up
+from .orchestrator import (
+    run_orchestrator, arun_orchestrator, astream_orchestrator, classify_context, classify_packs, cache_key, is_complete,
+    assemble, result_sections, DEFAULT_PROVIDERS,
+)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Load and validate all prompts before serving; a broken prompt fails startup, not a request
+    get_prompts()
+    # Import crewai/litellm and build clients now rather than on the first request
+    mode = get_settings().warmup
+    task = None
+    if mode == "background":
+        task = asyncio.ensure_future(run_in_threadpool(warm_up))  # /health reports warm=false until done
+    elif mode != "off":
+        await run_in_threadpool(warm_up)
+    yield
+    if task is not None and not task.done():
+        task.cancel()
 
 app = FastAPI(
+    lifespan=lifespan,
     title="CrewAI Orchestrator API",
     version="1.3.0",
     description="Super-Agent orchestrator for Travel / Project / Social packs (Gemini + Groq)."
@@ -15,30 +53,66 @@ app.add_middleware(
     allow_origins=["*"],
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Retry-After"],
 )
 
+@app.exception_handler(Rejected)
+async def rejected(request: Request, e: Rejected):
+    # 429 (client over its quota) or 503 (shed); either way the client is told when to come back
+    return JSONResponse({"detail": e.detail, "retry_after_s": round(e.retry_after, 3)}, e.status_code, headers=e.headers())
+
 @app.get("/health")
 def health():
-    return {"status": "ok"}
+    # Cheap on purpose: no provider calls and no heavy imports
+    return {"status": "ok", **warmup_status()}
 
-@app.post("/api/v1/orchestrate")
-def orchestrate(
-    body: Dict[str, Any],
-    context: Literal["auto", "travel", "project", "social"] = Query("auto"),
-    trip_provider: Optional[Literal["gemini", "groq"]] = Query(None),
-    culture_provider: Optional[Literal["gemini", "groq"]] = Query(None),
-    food_provider: Optional[Literal["gemini", "groq"]] = Query(None),
-    weather_provider: Optional[Literal["gemini", "groq"]] = Query(None),
-    packsmart_provider: Optional[Literal["gemini", "groq"]] = Query(None),
-):
-    msgs = body.get("messages") or []
-    if not isinstance(msgs, list) or not msgs:
-        raise HTTPException(400, "messages must be a non-empty list")
+@REGISTRY.collector
+def _state_metrics():
+    cache = get_cache().stats()
+    router = get_router().snapshot()
+    flights = get_flights().stats()
+    admission = get_admission().snapshot()
+    states = ("closed", "half_open", "open")
+    # Only once this process has touched the queue; /metrics alone must not create the file
+    jobs = get_jobs().stats() if get_jobs.cache_info().currsize else {}
+    return [
+        ("jobs", "gauge", "Jobs in the queue by status", [({"status": k}, v) for k, v in jobs.items()]),
+        ("result_cache_events_total", "counter", "Result cache hits/misses/sets/evictions",
+         [({"event": k}, v) for k, v in cache.items() if k not in {"entries", "persistent"}]),
+        ("result_cache_entries", "gauge", "Entries in the in-memory result cache", [({}, cache["entries"])]),
+        ("singleflight_events_total", "counter", "Orchestrations started vs requests coalesced onto one in flight",
+         [({"event": k}, v) for k, v in flights.items() if k != "inflight"]),
+        ("singleflight_inflight", "gauge", "Distinct orchestrations currently in flight", [({}, flights["inflight"])]),
+        ("admission_inflight", "gauge", "Admitted orchestrations running, by priority",
+         [({"priority": p}, n) for p, n in admission["inflight"].items()]),
+        ("admission_queued", "gauge", "Requests waiting for admission, by priority",
+         [({"priority": p}, n) for p, n in admission["waiting"].items()]),
+        ("admission_events_total", "counter", "Admission decisions: admitted, queued, shed (503), rate_limited (429), cancelled",
+         [({"event": k}, admission[k]) for k in ("admitted", "queued", "shed", "rate_limited", "cancelled")]),
+        ("admission_estimated_wait_seconds", "gauge", "Estimated queue wait for a new interactive request",
+         [({}, admission["estimated_wait_s"])]),
+        ("admission_limit", "gauge", "Configured admission limits (0 = unlimited)",
+         [({"limit": k}, v) for k, v in admission["limits"].items()]),
+        ("router_events_total", "counter", "Provider failovers and hedges",
+         [({"event": k}, v) for k, v in router.items() if k != "providers"]),
+        ("router_breaker_state", "gauge", "1 for the current breaker state of each provider",
+         [({"provider": p, "state": st}, 1 if h["state"] == st else 0) for p, h in router["providers"].items() for st in states]),
+    ]
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
 
-    locale = body.get("locale") or "en"
-    destination_hint = body.get("destination_hint")
+Provider = Literal["gemini", "groq"]
 
-    overrides = {
+def provider_overrides(
+    trip_provider: Optional[Provider] = Query(None),
+    culture_provider: Optional[Provider] = Query(None),
+    food_provider: Optional[Provider] = Query(None),
+    weather_provider: Optional[Provider] = Query(None),
+    packsmart_provider: Optional[Provider] = Query(None),
+) -> Dict[str, Optional[str]]:
+    return {
         "TripPlanner": trip_provider,
         "CultureGuide": culture_provider,
         "FoodieFriend": food_provider,
@@ -46,11 +120,382 @@ def orchestrate(
         "PackSmart": packsmart_provider,
     }
 
-    ctx: Optional[ContextType] = None if context == "auto" else context  # type: ignore
-    return run_orchestrator(
-        messages=[{"sender": m.get("sender","user"), "text": m.get("text","")} for m in msgs],
+def _orchestrator_kwargs(body: Dict[str, Any], context: str, overrides: Dict[str, Optional[str]]) -> Dict[str, Any]:
+    # Parsing and classifying a large chat takes a while: endpoints call this in the threadpool
+    msgs = body.get("messages") or []
+    if not isinstance(msgs, list) or not msgs:
+        raise HTTPException(400, "messages must be a non-empty list")
+    try:
+        messages = from_dicts(msgs)
+    except IngestError as e:
+        raise HTTPException(e.status_code, e.detail)
+    return _kwargs_for(messages, body.get("locale") or "en", body.get("destination_hint"), body.get("conversation_id"), context, overrides)
+
+def _kwargs_for(
+    messages: List[Message],
+    locale: str,
+    destination_hint: Optional[str],
+    conversation_id: Optional[str],
+    context: str,
+    overrides: Dict[str, Optional[str]],
+) -> Dict[str, Any]:
+    if context == "auto":
+        ctx = classify_context(messages, locale, conversation_id)
+    elif context == "multi":
+        ctx = classify_packs(messages, locale, conversation_id)
+    else:
+        ctx = context
+    return dict(
+        messages=messages,
         locale=locale,
         destination_hint=destination_hint,
         context=ctx,
-        provider_overrides=overrides
-    )
\ No newline at end of file
+        provider_overrides=overrides,
+        conversation_id=conversation_id,
+    )
+
+CacheMode = Literal["default", "bypass", "refresh"]
+TravelMode = Literal["agents", "fused"]
+Priority = Literal["interactive", "batch"]
+
+def _client(request: Request, api_key: Optional[str]) -> str:
+    return f"key:{api_key}" if api_key else f"addr:{request.client.host if request.client else 'unknown'}"
+
+def caller(
+    request: Request,
+    x_api_key: Optional[str] = Header(None),
+    x_priority: Priority = Header("interactive", description="batch traffic yields to interactive traffic"),
+) -> Caller:
+    # Per-client rate quota is charged once per HTTP request, before any work
+    c = Caller(_client(request, x_api_key), x_priority)
+    if get_settings().admission_enabled:
+        get_admission().check_rate(c.client)
+    return c
+
+def batch_caller(request: Request, x_api_key: Optional[str] = Header(None)) -> Caller:
+    c = Caller(_client(request, x_api_key), "batch")
+    if get_settings().admission_enabled:
+        get_admission().check_rate(c.client)
+    return c
+
+async def _admitted(who: Caller, shed: bool, run: Callable[[], Any]) -> Any:
+    async with get_admission().slot(who, shed):
+        return await run()
+
+def _request_key(kwargs: Dict[str, Any], fused: bool = False) -> str:
+    return cache_key(kwargs["messages"], kwargs["locale"], kwargs["destination_hint"], kwargs["context"], kwargs["provider_overrides"], kwargs["conversation_id"], fused)
+
+def _cache_key_for(kwargs: Dict[str, Any], cache: str, fused: bool = False) -> Optional[str]:
+    # bypass: neither read nor write; refresh: skip the read, overwrite the entry
+    if cache == "bypass" or not get_settings().cache_enabled:
+        return None
+    return _request_key(kwargs, fused)
+
+@app.get("/api/v1/cache")
+def cache_stats():
+    return {**get_cache().stats(), "singleflight": get_flights().stats()}
+
+@app.post("/api/v1/classify")
+def classify(body: Dict[str, Any]):
+    msgs = body.get("messages") or []
+    if not isinstance(msgs, list):
+        raise HTTPException(400, "messages must be a list")
+    try:
+        messages = from_dicts(msgs)
+    except IngestError as e:
+        raise HTTPException(e.status_code, e.detail)
+    res = get_classifier().classify(messages, body.get("locale") or "en", body.get("conversation_id"))
+    return res._asdict()
+
+@app.get("/api/v1/admission")
+def admission_stats():
+    return get_admission().snapshot()
+
+@app.get("/api/v1/providers")
+def provider_stats():
+    return {**get_router().snapshot(), "limits": limiter_snapshot()}
+
+@app.post("/api/v1/orchestrate")
+async def orchestrate(
+    body: Dict[str, Any],
+    context: Literal["auto", "travel", "project", "social", "multi"] = Query("auto", description="multi: every pack the chat scores for, keyed by pack, shared agents run once"),
+    overrides: Dict[str, Optional[str]] = Depends(provider_overrides),
+    execution: Optional[Literal["async", "concurrent", "sequential"]] = Query(None),
+    mode: Optional[TravelMode] = Query(None, description="travel pack: one agent per section, or one fused call"),
+    cache: CacheMode = Query("default"),
+    deadline_ms: Optional[int] = Query(None, ge=1, description="answer by then; unfinished sections are guard defaults with partial=true"),
+    timings: bool = Query(False),
+    profile: bool = Query(False),
+    who: Caller = Depends(caller),
+):
+    async def load() -> Dict[str, Any]:
+        return await run_in_threadpool(_orchestrator_kwargs, body, context, overrides)
+    return await _orchestrate(load, cache, execution, deadline_ms, mode, timings, profile, who)
+
+@app.post("/api/v1/orchestrate/ndjson")
+async def orchestrate_ndjson(
+    request: Request,
+    locale: str = Query("en"),
+    destination_hint: Optional[str] = Query(None),
+    conversation_id: Optional[str] = Query(None),
+    context: Literal["auto", "travel", "project", "social", "multi"] = Query("auto"),
+    overrides: Dict[str, Optional[str]] = Depends(provider_overrides),
+    execution: Optional[Literal["async", "concurrent", "sequential"]] = Query(None),
+    mode: Optional[TravelMode] = Query(None),
+    cache: CacheMode = Query("default"),
+    deadline_ms: Optional[int] = Query(None, ge=1),
+    timings: bool = Query(False),
+    profile: bool = Query(False),
+    who: Caller = Depends(caller),
+):
+    # Large exports: one message object per line (plain or chunked upload), parsed as it streams
+    # in; the request fields that a JSON body would carry are query parameters here
+    async def load() -> Dict[str, Any]:
+        try:
+            with span("ingest"):
+                messages = await read_ndjson(request.stream())
+        except IngestError as e:
+            raise HTTPException(e.status_code, e.detail)
+        if not messages:
+            raise HTTPException(400, "no messages in the upload")
+        # Classifying 100k+ messages takes a while; keep it off the event loop
+        return await run_in_threadpool(_kwargs_for, messages, locale, destination_hint, conversation_id, context, overrides)
+    return await _orchestrate(load, cache, execution, deadline_ms, mode, timings, profile, who)
+
+async def _orchestrate(
+    load: Callable[[], Awaitable[Dict[str, Any]]],
+    cache: str,
+    execution: Optional[str],
+    deadline_ms: Optional[int],
+    mode: Optional[str],
+    timings: bool,
+    profile: bool,
+    who: Caller,
+) -> Dict[str, Any]:
+    settings = get_settings()
+    # deadline_ms is end to end: parsing, classification and admission queueing spend it too
+    deadline_at = time.monotonic() + deadline_ms / 1000 if deadline_ms else None
+    if profile and not settings.allow_profiling:
+        raise HTTPException(403, "profiling is disabled (set ALLOW_PROFILING=true)")
+    profiler = SamplingProfiler(settings.profile_interval_ms / 1000) if profile else None
+    with collect() as spans, (profiler or nullcontext()):
+        kwargs = await load()
+        result = await _run_cached(kwargs, cache, execution, deadline_ms, mode, who, deadline_at=deadline_at)
+    if timings or profiler:
+        result = {**result, "timings": spans.as_output()}  # never mutate a cached result
+    if profiler:
+        result["profile"] = profiler.as_output()
+    return result
+
+async def _run_cached(
+    kwargs: Dict[str, Any],
+    cache: str,
+    execution: Optional[str] = None,
+    deadline_ms: Optional[int] = None,
+    travel_mode: Optional[str] = None,
+    who: Optional[Caller] = None,
+    shed: bool = True,
+    deadline_at: Optional[float] = None,
+) -> Dict[str, Any]:
+    settings = get_settings()
+    if deadline_ms and deadline_at is None:
+        deadline_at = time.monotonic() + deadline_ms / 1000
+    fused = _fused(kwargs, travel_mode)
+    key = _cache_key_for(kwargs, cache, fused)
+    if key and cache == "default":
+        with span("cache_lookup"):
+            hit = get_cache().get(key)
+        if hit is not None:
+            return hit
+
+    mode = execution or settings.execution_mode
+    run = partial(_execute, kwargs, mode, key, deadline_at, fused)
+    if who is not None and settings.admission_enabled:
+        # Only executions take a slot: cache hits and requests coalesced onto one in flight do not
+        run = partial(_admitted, who, shed, run)
+    if not settings.coalesce_enabled:
+        return await run()
+    # Identical requests that arrive while this one runs share its execution (and its result dict);
+    # a different deadline is a different request (the travel mode is part of the key)
+    flight = f"{key or _request_key(kwargs, fused)}:{deadline_ms or ''}"
+    return await get_flights().do(flight, run)
+
+def _fused(kwargs: Dict[str, Any], travel_mode: Optional[str]) -> bool:
+    return kwargs["context"] == "travel" and (travel_mode or get_settings().travel_mode) == "fused"
+
+def _late_writer(key: Optional[str]) -> Optional[Callable[[Dict[str, Any]], None]]:
+    # Agents that missed the deadline keep running and fill the cache for the next call
+    if not key or get_settings().late_results != "cache":
+        return None
+    def write(result: Dict[str, Any]) -> None:
+        if is_complete(result):
+            get_cache().set(key, result)
+    return write
+
+async def _execute(kwargs: Dict[str, Any], mode: str, key: Optional[str], deadline_at: Optional[float] = None, fused: bool = False) -> Dict[str, Any]:
+    # deadline_at: absolute (time.monotonic()), fixed when the request arrived
+    start = time.perf_counter()
+    if mode == "async" or fused:  # the fused call needs no CrewAI objects, whatever the execution mode
+        result = await arun_orchestrator(**kwargs, deadline_at=deadline_at, on_late=_late_writer(key) if deadline_at else None, fused=fused)
+    else:
+        # CrewAI kickoff is blocking; keep it off the event loop
+        result = await run_in_threadpool(run_orchestrator, execution=mode, deadline_at=deadline_at, **kwargs)
+    record_orchestration(result, "fused" if fused else "agents", time.perf_counter() - start)
+
+    if key and is_complete(result):
+        get_cache().set(key, result)
+    return result
+
+@app.post("/api/v1/orchestrate/stream")
+async def orchestrate_stream(
+    body: Dict[str, Any],
+    context: Literal["auto", "travel", "project", "social", "multi"] = Query("auto"),
+    overrides: Dict[str, Optional[str]] = Depends(provider_overrides),
+    format: Literal["ndjson", "sse"] = Query("ndjson"),
+    cache: CacheMode = Query("default"),
+    deadline_ms: Optional[int] = Query(None, ge=1),
+    mode: Optional[TravelMode] = Query(None),
+    who: Caller = Depends(caller),
+):
+    deadline_at = time.monotonic() + deadline_ms / 1000 if deadline_ms else None  # end to end, as in _orchestrate
+    kwargs = await run_in_threadpool(_orchestrator_kwargs, body, context, overrides)
+    fused = _fused(kwargs, mode)
+    key = _cache_key_for(kwargs, cache, fused)
+    hit = get_cache().get(key) if key and cache == "default" else None
+    # Admitted before the response starts, so a shed request still gets a plain 503
+    admission = get_admission()
+    ticket = await admission.acquire(who.client, who.priority) if hit is None and get_settings().admission_enabled else None
+    release = (lambda: admission.release(ticket)) if ticket is not None else (lambda: None)
+
+    def encode(ev: Dict[str, Any]) -> str:
+        data = json.dumps(ev, ensure_ascii=False)
+        return f"data: {data}\n\n" if format == "sse" else data + "\n"
+
+    async def events():
+        if hit is not None:
+            yield encode({"context": hit["context"], "compaction": hit.get("compaction", {})})
+            for label, section in result_sections(hit).items():
+                yield encode({"label": label, **section})
+            return
+
+        head: Dict[str, Any] = {}
+        sections: Dict[str, Any] = {}
+        try:
+            async for ev in astream_orchestrator(**kwargs, deadline_at=deadline_at, on_late=_late_writer(key) if deadline_at else None, fused=fused):
+                if "label" in ev:
+                    sections[ev["label"]] = {k: v for k, v in ev.items() if k != "label"}
+                else:
+                    head = ev
+                yield encode(ev)
+        finally:
+            release()
+        result = assemble(head["context"], sections, head.get("compaction", {})) if head else {}
+        if "fused" in head:
+            result["fused"] = head["fused"]  # same shape as the non-streamed fused result
+        if key and result and is_complete(result):
+            get_cache().set(key, result)
+
+    media_type = "text/event-stream" if format == "sse" else "application/x-ndjson"
+    # release() is idempotent; the background task covers a client gone before the body started
+    return StreamingResponse(events(), media_type=media_type, headers={"Cache-Control": "no-cache"}, background=BackgroundTask(release))
+
+# ---------------- jobs ----------------
+
+@app.post("/api/v1/jobs", status_code=202, dependencies=[Depends(caller)])
+def submit_job(
+    body: Dict[str, Any],
+    context: Literal["auto", "travel", "project", "social", "multi"] = Query("auto"),
+    overrides: Dict[str, Optional[str]] = Depends(provider_overrides),
+    execution: Optional[Literal["async", "concurrent", "sequential"]] = Query(None),
+    mode: Optional[TravelMode] = Query(None),
+):
+    # Queued in JOB_SQLITE_PATH and run by `python -m app.worker`; poll GET /api/v1/jobs/{id}
+    kwargs = _orchestrator_kwargs(body, context, overrides)
+    job_id = get_jobs().submit({"kwargs": kwargs, "execution": execution, "fused": _fused(kwargs, mode)})
+    return {"id": job_id, "status": "queued", "url": f"/api/v1/jobs/{job_id}"}
+
+@app.get("/api/v1/jobs")
+def job_stats():
+    return get_jobs().stats()
+
+@app.get("/api/v1/jobs/{job_id}")
+async def get_job(job_id: str, wait_s: float = Query(0.0, ge=0, description="long-poll until done/failed, capped at JOB_MAX_WAIT_S")):
+    settings = get_settings()
+    jobs = get_jobs()
+    deadline = time.monotonic() + min(wait_s, settings.job_max_wait_s)
+    while True:
+        job = await run_in_threadpool(jobs.get, job_id)
+        if job is None:
+            raise HTTPException(404, "unknown job")
+        if job.status in {"done", "failed"} or time.monotonic() >= deadline:
+            return job.as_output()
+        # Workers are other processes; the shared file is the only signal, so poll it
+        await asyncio.sleep(min(settings.job_poll_interval_s, max(0.0, deadline - time.monotonic())))
+
+# ---------------- batch ----------------
+
+_ROLE_PROVIDERS = {"gemini", "groq"}
+_ITEM_CONTEXTS = ("auto", "travel", "project", "social", "multi")  # same choices as ?context=
+
+def _item_overrides(providers: Any) -> Dict[str, Optional[str]]:
+    if not isinstance(providers, dict):
+        raise HTTPException(400, "providers must be an object of role -> provider")
+    for role, p in providers.items():
+        if role not in DEFAULT_PROVIDERS:
+            raise HTTPException(400, f"providers: unknown role {role!r}")
+        if p is not None and p not in _ROLE_PROVIDERS:
+            raise HTTPException(400, f"providers.{role}: must be one of {sorted(_ROLE_PROVIDERS)}")
+    return {role: p for role, p in providers.items() if p is not None}
+
+async def _run_batch_item(i: int, item: Any, context: str, cache: str, slots: asyncio.Semaphore, who: Caller) -> Dict[str, Any]:
+    item_id = item.get("id", i) if isinstance(item, dict) else i
+    try:
+        if not isinstance(item, dict):
+            raise HTTPException(400, "item must be an object")
+        item_context = item.get("context") or context
+        if item_context not in _ITEM_CONTEXTS:
+            raise HTTPException(400, f"context must be one of {', '.join(_ITEM_CONTEXTS)}")
+        overrides = _item_overrides(item.get("providers") or {})
+        kwargs = await run_in_threadpool(_orchestrator_kwargs, item, item_context, overrides)
+        async with slots:
+            # Batch items queue behind interactive traffic instead of being shed
+            result = await _run_cached(kwargs, cache, "async", who=who, shed=False)
+        return {"id": item_id, "ok": True, "result": result}
+    except (HTTPException, Rejected) as e:
+        return {"id": item_id, "ok": False, "error": e.detail}
+    except Exception as e:
+        return {"id": item_id, "ok": False, "error": f"{type(e).__name__}: {e}"}
+
+@app.post("/api/v1/orchestrate/batch")
+async def orchestrate_batch(
+    body: Dict[str, Any],
+    context: Literal["auto", "travel", "project", "social", "multi"] = Query("auto"),
+    cache: CacheMode = Query("default"),
+    stream: bool = Query(False),
+    who: Caller = Depends(batch_caller),
+):
+    items = body.get("items") or []
+    settings = get_settings()
+    if not isinstance(items, list) or not items:
+        raise HTTPException(400, "items must be a non-empty list")
+    if len(items) > settings.batch_max_items:
+        raise HTTPException(413, f"at most {settings.batch_max_items} items per batch")
+
+    # Items are admitted a few dozen at a time; agent calls are further capped per provider
+    slots = asyncio.Semaphore(max(1, settings.batch_item_concurrency))
+    jobs = [_run_batch_item(i, item, context, cache, slots, who) for i, item in enumerate(items)]
+
+    if not stream:
+        results = await asyncio.gather(*jobs)
+        return {"count": len(results), "errors": sum(not r["ok"] for r in results), "items": results}
+
+    async def events():
+        pending = [asyncio.ensure_future(j) for j in jobs]
+        try:
+            for fut in asyncio.as_completed(pending):
+                yield json.dumps(await fut, ensure_ascii=False) + "\n"
+        finally:
+            for p in pending:
+                p.cancel()
+
+    return StreamingResponse(events(), media_type="application/x-ndjson", headers={"Cache-Control": "no-cache"})
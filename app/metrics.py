@@ -0,0 +1,220 @@
+from __future__ import annotations
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import lru_cache
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+import bisect, threading, time
+
+from .config import get_settings
+
+# In-process metrics rendered in the Prometheus text format, plus optional per-request span
+# collection for the `timings` block of a response.
+
+# ---------------- registry ----------------
+
+LabelValues = Tuple[str, ...]
+
+
+def _fmt_labels(names: Tuple[str, ...], values: LabelValues, extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _escape(v: str) -> str:
+    return str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = ()):
+        self.name, self.help, self.labels = name, help, labels
+        self._values: Dict[LabelValues, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = tuple(str(labels.get(n, "")) for n in self.labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(tuple(str(labels.get(n, "")) for n in self.labels), 0.0)
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_fmt_labels(self.labels, k)} {v:g}" for k, v in items]
+
+
+class Histogram:
+    kind = "histogram"
+    BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = (), buckets: Tuple[float, ...] = BUCKETS):
+        self.name, self.help, self.labels, self.buckets = name, help, labels, buckets
+        self._values: Dict[LabelValues, List[float]] = {}  # per-bucket counts, then +Inf count, then sum
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = tuple(str(labels.get(n, "")) for n in self.labels)
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            row = self._values.get(key)
+            if row is None:
+                row = self._values[key] = [0.0] * (len(self.buckets) + 2)
+            row[i] += 1
+            row[-1] += value
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = sorted((k, list(v)) for k, v in self._values.items())
+        out = []
+        for key, row in items:
+            cumulative = 0.0
+            for bound, count in zip(self.buckets + (float("inf"),), row[:-1]):
+                cumulative += count
+                le = 'le="+Inf"' if bound == float("inf") else f'le="{bound:g}"'
+                out.append(f"{self.name}_bucket{_fmt_labels(self.labels, key, le)} {cumulative:g}")
+            out.append(f"{self.name}_sum{_fmt_labels(self.labels, key)} {row[-1]:g}")
+            out.append(f"{self.name}_count{_fmt_labels(self.labels, key)} {cumulative:g}")
+        return out
+
+
+# A collector returns (name, type, help, [(labels dict, value)]) for values owned elsewhere
+Collector = Callable[[], List[Tuple[str, str, str, List[Tuple[Dict[str, str], float]]]]]
+
+
+class Registry:
+    def __init__(self):
+        self.metrics: List[Any] = []
+        self.collectors: List[Collector] = []
+
+    def counter(self, name: str, help: str, labels: Tuple[str, ...] = ()) -> Counter:
+        m = Counter(name, help, labels)
+        self.metrics.append(m)
+        return m
+
+    def histogram(self, name: str, help: str, labels: Tuple[str, ...] = ()) -> Histogram:
+        m = Histogram(name, help, labels)
+        self.metrics.append(m)
+        return m
+
+    def collector(self, fn: Collector) -> Collector:
+        self.collectors.append(fn)
+        return fn
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for m in self.metrics:
+            lines += [f"# HELP {m.name} {m.help}", f"# TYPE {m.name} {m.kind}", *m.samples()]
+        for fn in self.collectors:
+            try:
+                families = fn()
+            except Exception:
+                continue  # a broken collector must not take /metrics down
+            for name, kind, help, values in families:
+                lines += [f"# HELP {name} {help}", f"# TYPE {name} {kind}"]
+                for labels, v in values:
+                    names = tuple(labels)
+                    lines.append(f"{name}{_fmt_labels(names, tuple(labels[n] for n in names))} {float(v):g}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+SPAN_SECONDS = REGISTRY.histogram("orchestrator_span_seconds", "Time spent per orchestration step", ("span", "target"))
+LLM_CALLS = REGISTRY.counter("llm_calls_total", "LLM calls by outcome", ("provider", "model", "outcome"))
+LLM_SECONDS = REGISTRY.histogram("llm_call_seconds", "LLM call latency", ("provider", "model"))
+LLM_TOKENS = REGISTRY.counter("llm_tokens_total", "Prompt/completion tokens (usage when reported, else estimated)", ("provider", "model", "kind"))
+LLM_COST = REGISTRY.counter("llm_cost_usd_total", "Estimated spend from LLM_PRICES", ("provider", "model"))
+PARSE_FAILURES = REGISTRY.counter("parse_failures_total", "Agent outputs that did not parse as JSON", ("label",))
+GUARD_FALLBACKS = REGISTRY.counter("guard_fallbacks_total", "Guard fields replaced by defaults", ("guard", "field"))
+SCHEMA_REPAIRS = REGISTRY.counter("schema_repairs_total", "Repair round-trips for outputs failing their schema", ("prompt", "outcome"))
+ORCH_SECONDS = REGISTRY.histogram("orchestration_seconds", "End-to-end orchestration latency", ("context", "mode"))
+ADMISSION_WAIT_SECONDS = REGISTRY.histogram("admission_wait_seconds", "Time requests spent queued for admission", ("priority",))
+ORCH_PROMPT_TOKENS = REGISTRY.counter("orchestration_prompt_tokens_total", "Estimated prompt tokens per orchestration", ("context", "mode"))
+
+# ---------------- per-request timings ----------------
+
+class Timings:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.spans: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+
+    def add(self, name: str, target: str, start: float, seconds: float) -> None:
+        entry = {"span": name, "start_ms": round((start - self.started) * 1000, 2), "ms": round(seconds * 1000, 2)}
+        if target:
+            entry["target"] = target
+        with self._lock:
+            self.spans.append(entry)
+
+    def as_output(self) -> Dict[str, Any]:
+        with self._lock:
+            spans = sorted(self.spans, key=lambda s: s["start_ms"])
+        return {"total_ms": round((time.perf_counter() - self.started) * 1000, 2), "spans": spans}
+
+
+_CURRENT: ContextVar[Optional[Timings]] = ContextVar("timings", default=None)
+
+
+@contextmanager
+def collect() -> Iterator[Timings]:
+    # Spans recorded in this context (and tasks/threads that copy it) also land in the returned Timings
+    t = Timings()
+    token = _CURRENT.set(t)
+    try:
+        yield t
+    finally:
+        _CURRENT.reset(token)
+
+
+@contextmanager
+def span(name: str, target: str = "") -> Iterator[None]:
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        SPAN_SECONDS.observe(elapsed, span=name, target=target)
+        current = _CURRENT.get()
+        if current is not None:
+            current.add(name, target, start, elapsed)
+
+# ---------------- LLM usage ----------------
+
+@lru_cache
+def _prices() -> Dict[str, Tuple[float, float]]:
+    # "model=in/out,..." in USD per 1M tokens
+    out: Dict[str, Tuple[float, float]] = {}
+    for part in get_settings().llm_prices.split(","):
+        model, _, price = part.partition("=")
+        pin, _, pout = price.partition("/")
+        try:
+            out[model.strip()] = (float(pin), float(pout or pin))
+        except ValueError:
+            continue
+    return out
+
+
+def record_llm(model: str, prompt_tokens: int, completion_tokens: int, seconds: float, ok: bool) -> None:
+    provider = model.split("/", 1)[0] if "/" in model else "unknown"
+    LLM_CALLS.inc(provider=provider, model=model, outcome="ok" if ok else "error")
+    LLM_SECONDS.observe(seconds, provider=provider, model=model)
+    if not ok:
+        return
+    LLM_TOKENS.inc(prompt_tokens, provider=provider, model=model, kind="prompt")
+    LLM_TOKENS.inc(completion_tokens, provider=provider, model=model, kind="completion")
+    price = _prices().get(model)
+    if price:
+        LLM_COST.inc((prompt_tokens * price[0] + completion_tokens * price[1]) / 1e6, provider=provider, model=model)
+
+
+def record_orchestration(result: Dict[str, Any], mode: str, seconds: float) -> None:
+    # Per travel mode (agents|fused), so deployments can compare input tokens against latency
+    ctx = str(result.get("context"))
+    ORCH_SECONDS.observe(seconds, context=ctx, mode=mode)
+    tokens = sum(v.get("prompt_tokens", 0) for v in (result.get("compaction") or {}).values() if isinstance(v, dict))
+    ORCH_PROMPT_TOKENS.inc(tokens, context=ctx, mode=mode)
@@ -1,6 +1,7 @@
 from __future__ import annotations
-from pydantic import BaseModel, Field
-from typing import List, Optional
+from pydantic import BaseModel, BeforeValidator, ConfigDict, Field, model_validator
+from pydantic.json_schema import SkipJsonSchema
+from typing import Any, Annotated, Dict, List, Optional
 from datetime import datetime
 
 
@@ -17,26 +18,142 @@ class AnalyzeRequest(BaseModel):
     destination_hint: Optional[str] = Field(default=None, description="If users talk about a place, you may pass it here")
 
 
-class TripPlan(BaseModel):
-    destination: str
-    days: int
-    suggested_itinerary: List[str]
+# ---------------- agent outputs ----------------
+# One model per agent prompt. They double as the JSON Schema sent to providers with structured
+# output and as the validator that decides whether an answer needs a repair round-trip. Lists are
+# cleaned (non-empty strings only) and cut to the same caps the guards apply, so an over-long list
+# is not worth a repair; a missing key or a wrong type is.
 
+def _text(v: Any) -> Any:
+    return v.strip() if isinstance(v, str) else v
 
-class CultureInfo(BaseModel):
-    overview: str
-    do_and_dont: List[str]
-    key_phrases: List[str]
 
+def _str_items(v: Any) -> Any:
+    if not isinstance(v, list):
+        return v  # left for the type check to reject
+    return [x.strip() for x in v if isinstance(x, str) and x.strip()]
 
-class FoodSuggestions(BaseModel):
-    theme: str
-    suggestions: List[str]
 
+def _capped(n: int) -> Any:
+    return BeforeValidator(lambda v: v[:n] if isinstance(v, list) else v)
 
-class UnreadSummary(BaseModel):
-    summary: str
-    action_items: List[str]
+
+Text = Annotated[str, BeforeValidator(_text)]
+
+
+def StrList(cap: int) -> Any:
+    return Annotated[List[str], _capped(cap), BeforeValidator(_str_items), Field(max_length=cap)]  # before-validators run last-first
+
+
+class AgentOutput(BaseModel):
+    model_config = ConfigDict(extra="ignore")  # extra keys are dropped, not worth a repair
+
+
+class TripDay(AgentOutput):
+    day: int
+    theme: Text
+    morning: Text
+    afternoon: Text
+    evening: Text
+    indoor_rain_plan: StrList(3)
+    dining_ideas: StrList(3)
+    local_tips: StrList(3)
+
+
+class WeatherAssumptions(AgentOutput):
+    season: Text
+    typical_conditions: StrList(4)
+    packing_highlights: StrList(4)
+
+
+class TripPlan(AgentOutput):
+    model_config = ConfigDict(extra="ignore", json_schema_extra={"required": ["destination", "days", "day_by_day", "weather_assumptions"]})
+    destination: Text
+    days: int = Field(ge=1)
+    # Required in the schema providers get; optional here so a legacy answer is not sent to repair
+    day_by_day: Annotated[List[TripDay], _capped(5), Field(max_length=5)] | SkipJsonSchema[None] = None
+    weather_assumptions: WeatherAssumptions | SkipJsonSchema[None] = None
+    # Legacy shape the prompt and guard_trip still accept: kept in the dump for the guard to convert
+    suggested_itinerary: SkipJsonSchema[Optional[List[str]]] = None
+
+    @model_validator(mode="after")
+    def _has_days(self) -> "TripPlan":
+        if self.day_by_day is None and not self.suggested_itinerary:
+            raise ValueError("day_by_day is required")
+        return self
+
+
+class CultureInfo(AgentOutput):
+    overview: Text
+    do_and_dont: StrList(8)
+    key_phrases: StrList(8)
+    safety_basics: StrList(6)
+
+
+class FoodSuggestions(AgentOutput):
+    theme: Text
+    suggestions: StrList(5)
+    dish_ideas: StrList(6)
+
+
+class WeatherAdvice(AgentOutput):
+    season: Text
+    typical_conditions: StrList(5)
+    day_adjustments: StrList(8)
+
+
+class PackingList(AgentOutput):
+    packing_list: StrList(15)
+
+
+class TaskItem(AgentOutput):
+    task: Text
+    assignee: Text = "unknown"
+    due_hint: Optional[str] = None
+    status: Text = "pending"
+
+
+class TaskList(AgentOutput):
+    tasks: Annotated[List[TaskItem], _capped(20), Field(max_length=20)]
+
+
+class ExpenseItem(AgentOutput):
+    label: Text
+    amount: float
+    payer: Text = "unknown"
+
+
+class ExpenseReport(AgentOutput):
+    total_estimated: float
+    currency: Text
+    items: Annotated[List[ExpenseItem], _capped(30), Field(max_length=30)]
+    notes: StrList(6)
+
+
+class UnreadSummary(AgentOutput):
+    summary: Text
+    action_items: StrList(10)
+
+
+class MoodReport(AgentOutput):
+    tone: Text
+    signals: StrList(6)
+    recommendation: Text = ""
+
+
+class ConversationStats(AgentOutput):
+    messages_per_user: Dict[str, int]
+    most_active_user: Text
+    insight: Text
+
+
+class TravelPack(AgentOutput):
+    # mode=fused: the five travel sections in one answer
+    trip_plan: TripPlan
+    culture: CultureInfo
+    food: FoodSuggestions
+    weather: WeatherAdvice
+    packsmart: PackingList
 
 
 class AnalyzeResponse(BaseModel):
@@ -1,18 +1,31 @@
 from __future__ import annotations
-from typing import Dict, Any, List, Literal, Optional
-import json, re
-from crewai import Agent, Task, Crew, Process
-from .llms import get_llm
+from typing import TYPE_CHECKING, Callable, Dict, Any, AsyncIterator, List, Literal, NamedTuple, Optional, Tuple
+from functools import lru_cache
+import asyncio, contextvars, hashlib, json, re, time, logging, threading, weakref
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from .config import get_settings, parse_int_map
+from .llms import get_llm, acomplete, model_name, supports_structured_output
+from .jsonx import JsonExtractor, extract_json
+from .classifier import get_classifier
+from .prompt_registry import prompt
+from .conversations import UnreadState, get_digests
+from .analytics import LOCAL_ENGINES, merge_narrative
+from .compaction import Compactor, compaction_stats, estimate_tokens
+from .router import get_router
+from .ratelimit import limiter_for, request_tokens
+from .metrics import GUARD_FALLBACKS, PARSE_FAILURES, SCHEMA_REPAIRS, span
+from .schemas import check_output, json_schema, max_output_tokens, repair_messages
+
+if TYPE_CHECKING:
+    from crewai import Crew
+
+log = logging.getLogger(__name__)
 
 # ---------------- helpers ----------------
 
 def _concat_messages(messages: List[dict]) -> str:
     return "\n".join(f"{m.get('sender','user')}: {m.get('text','')}" for m in messages)
 
-def _read_prompt(path: str) -> str:
-    with open(path, "r", encoding="utf-8") as f:
-        return f.read()
-
 _MD_OPEN = re.compile(r"^\s*```[a-zA-Z0-9_-]*", re.M)
 _MD_CLOSE = re.compile(r"```\s*$", re.M)
 
@@ -22,10 +35,6 @@ def _strip_md_fences(s: str) -> str:
     s = _MD_CLOSE.sub("", s)
     return s.strip()
 
-def _first_json_obj(text: str) -> Optional[str]:
-    m = re.search(r"\{.*\}", text, re.S)
-    return m.group(0) if m else None
-
 def parse_jsonish(raw: Any) -> Any:
     if raw is None:
         return None
@@ -36,54 +45,55 @@ def parse_jsonish(raw: Any) -> Any:
             return raw
     if not isinstance(raw, str):
         return raw
-    cleaned = _strip_md_fences(raw)
     try:
-        return json.loads(cleaned)
-    except Exception:
-        pass
-    first = _first_json_obj(cleaned)
-    if first:
-        try:
-            return json.loads(first)
-        except Exception:
-            return cleaned
-    return cleaned
+        return extract_json(raw)
+    except ValueError:
+        return _strip_md_fences(raw)
 
 # ---------------- context detection ----------------
 
 ContextType = Literal["travel", "project", "social"]
 
-TRAVEL_HINTS  = re.compile(r"\b(trip|travel|itinerary|hotel|flight|train|visa|beach|resort|tour|hike|mountain|village|island|weekend|louvre|montmartre|paris|rome|chamonix|itinerar)\b", re.I)
-PROJECT_HINTS = re.compile(r"\b(task|todo|deadline|deliverable|budget|cost|split|share|pay|invoice|assign|status|milestone|sprint|ticket|story)\b", re.I)
-SOCIAL_HINTS  = re.compile(r"\b(feel|angry|tension|vibe|tone|argue|confused|happy|sad|frustrated|toxic|mood|engagement|distant|reset)\b", re.I)
+def classify_context(messages: List[dict], locale: Optional[str] = None, conversation_id: Optional[str] = None) -> ContextType:
+    with span("classify"):
+        return get_classifier().classify(messages, locale, conversation_id).label  # type: ignore[return-value]
 
-def classify_context(messages: List[dict]) -> ContextType:
-    text = " ".join(m.get("text", "") for m in messages)
-    scores = {
-        "travel": len(TRAVEL_HINTS.findall(text)),
-        "project": len(PROJECT_HINTS.findall(text)),
-        "social": len(SOCIAL_HINTS.findall(text)),
-    }
-    return max(scores, key=scores.get) if any(scores.values()) else "travel"
+# context=multi runs several packs in one orchestration, named "multi:travel+project"
+MULTI_PREFIX = "multi:"
+
+def classify_packs(messages: List[dict], locale: Optional[str] = None, conversation_id: Optional[str] = None) -> str:
+    # Every pack whose calibrated share reaches MULTI_MIN_SCORE, the top one always; a chat
+    # without any evidence gets the top (prior) pack only
+    with span("classify"):
+        res = get_classifier().classify(messages, locale, conversation_id)
+    if not any(res.evidence.values()):
+        return MULTI_PREFIX + res.label
+    threshold = get_settings().multi_min_score
+    return MULTI_PREFIX + "+".join(c for c in res.scores if c == res.label or res.scores[c] >= threshold)
 
 # ---------------- providers ----------------
 
-def llm_for(role: str, forced: Optional[str]) -> Any:
+DEFAULT_PROVIDERS: Dict[str, str] = {
+    "TripPlanner": "gemini",
+    "CultureGuide": "gemini",
+    "FoodieFriend": "groq",
+    "WeatherAdvisor": "groq",
+    "PackSmart": "gemini",
+    "TaskOrganizer": "groq",
+    "ExpenseTracker": "groq",
+    "UnreadSummarizer": "gemini",
+    "MoodDetector": "gemini",
+    "ConversationAnalyzer": "groq",
+    "TravelConcierge": "gemini",
+}
+
+def resolve_provider(role: str, forced: Optional[str]) -> str:
     if forced in {"gemini", "groq"}:
-        return get_llm(forced)
-    default_map = {
-        "TripPlanner": "gemini",
-        "CultureGuide": "gemini",
-        "FoodieFriend": "groq",
-        "WeatherAdvisor": "groq",
-        "PackSmart": "gemini",
-        "TaskOrganizer": "groq",
-        "ExpenseTracker": "groq",
-        "UnreadSummarizer": "gemini",
-        "MoodDetector": "gemini",
-        "ConversationAnalyzer": "groq",
-    }
-    return get_llm(default_map.get(role, "gemini"))
+        return forced  # type: ignore[return-value]
+    return DEFAULT_PROVIDERS.get(role, "gemini")
+
+def llm_for(role: str, forced: Optional[str], max_tokens: Optional[int] = None) -> Any:
+    return get_llm(resolve_provider(role, forced), max_tokens=max_tokens)  # type: ignore[arg-type]
 
 # ---------------- validators (keep models in line) ----------------
 
@@ -99,6 +109,13 @@ def _ensure_list_str(x: Any, max_len: int | None = None) -> List[str]:
         out = out[:max_len]
     return out
 
+def _fb(guard: str, field: str, value: Any, default: Any) -> Any:
+    # The model's value when present, else the default (counted in guard_fallbacks_total)
+    if value:
+        return value
+    GUARD_FALLBACKS.inc(guard=guard, field=field)
+    return default
+
 def guard_trip(d: Any) -> Dict[str, Any] | None:
     if not isinstance(d, dict): return None
     out: Dict[str, Any] = {
@@ -117,13 +134,13 @@ def guard_trip(d: Any) -> Dict[str, Any] | None:
             if not isinstance(day, dict): continue
             out["day_by_day"].append({
                 "day": int(day.get("day") or i),
-                "theme": str(day.get("theme") or "").strip() or "Day plan",
-                "morning": str(day.get("morning") or "").strip() or "Free exploration",
-                "afternoon": str(day.get("afternoon") or "").strip() or "Local walk",
-                "evening": str(day.get("evening") or "").strip() or "Relaxed dinner",
-                "indoor_rain_plan": _ensure_list_str(day.get("indoor_rain_plan"), 3) or ["Local museum", "Covered market"],
-                "dining_ideas": _ensure_list_str(day.get("dining_ideas"), 3) or ["neighborhood café", "casual bistro"],
-                "local_tips": _ensure_list_str(day.get("local_tips"), 3) or ["Book popular sites in advance"]
+                "theme": _fb("trip", "theme", str(day.get("theme") or "").strip(), "Day plan"),
+                "morning": _fb("trip", "morning", str(day.get("morning") or "").strip(), "Free exploration"),
+                "afternoon": _fb("trip", "afternoon", str(day.get("afternoon") or "").strip(), "Local walk"),
+                "evening": _fb("trip", "evening", str(day.get("evening") or "").strip(), "Relaxed dinner"),
+                "indoor_rain_plan": _fb("trip", "indoor_rain_plan", _ensure_list_str(day.get("indoor_rain_plan"), 3), ["Local museum", "Covered market"]),
+                "dining_ideas": _fb("trip", "dining_ideas", _ensure_list_str(day.get("dining_ideas"), 3), ["neighborhood café", "casual bistro"]),
+                "local_tips": _fb("trip", "local_tips", _ensure_list_str(day.get("local_tips"), 3), ["Book popular sites in advance"])
             })
     elif "suggested_itinerary" in d and isinstance(d["suggested_itinerary"], list):
         # fallback transform: 1 line per itinerary item
@@ -149,6 +166,7 @@ def guard_trip(d: Any) -> Dict[str, Any] | None:
     # clamp sizes
     if not out["day_by_day"]:
         # minimal sensible default for 3 days
+        GUARD_FALLBACKS.inc(guard="trip", field="day_by_day")
         for i in range(1, min(out["days"], 3) + 1):
             out["day_by_day"].append({
                 "day": i,
@@ -167,47 +185,48 @@ def guard_trip(d: Any) -> Dict[str, Any] | None:
 def guard_culture(d: Any) -> Dict[str, Any] | None:
     if not isinstance(d, dict): return None
     return {
-        "overview": str(d.get("overview") or "").strip() or "Be polite and greet locals; respect queues and quiet spaces.",
-        "do_and_dont": _ensure_list_str(d.get("do_and_dont"), 8) or [
+        "overview": _fb("culture", "overview", str(d.get("overview") or "").strip(),
+                        "Be polite and greet locals; respect queues and quiet spaces."),
+        "do_and_dont": _fb("culture", "do_and_dont", _ensure_list_str(d.get("do_and_dont"), 8), [
             "Do: greet with 'Hello' before asking for help",
             "Don't: speak loudly in small venues"
-        ],
-        "key_phrases": _ensure_list_str(d.get("key_phrases"), 8) or [
+        ]),
+        "key_phrases": _fb("culture", "key_phrases", _ensure_list_str(d.get("key_phrases"), 8), [
             "Hello: Hello",
             "Thanks: Thank you",
             "Please: Please",
             "Excuse me: Excuse me",
             "Goodbye: Goodbye"
-        ],
-        "safety_basics": _ensure_list_str(d.get("safety_basics"), 6) or [
+        ]),
+        "safety_basics": _fb("culture", "safety_basics", _ensure_list_str(d.get("safety_basics"), 6), [
             "Watch your belongings in crowded areas",
             "Use licensed taxis or known ride-hailing"
-        ],
+        ]),
     }
 
 def guard_food(d: Any) -> Dict[str, Any] | None:
     if not isinstance(d, dict): return None
     return {
-        "theme": str(d.get("theme") or "").strip() or "Local, budget-friendly picks near central areas",
-        "suggestions": _ensure_list_str(d.get("suggestions"), 5) or [
+        "theme": _fb("food", "theme", str(d.get("theme") or "").strip(), "Local, budget-friendly picks near central areas"),
+        "suggestions": _fb("food", "suggestions", _ensure_list_str(d.get("suggestions"), 5), [
             "1) Cozy neighborhood bistro fare",
             "2) Market hall tastings",
             "3) Bakery lunch: quiche/sandwich"
-        ],
-        "dish_ideas": _ensure_list_str(d.get("dish_ideas"), 6) or [
+        ]),
+        "dish_ideas": _fb("food", "dish_ideas", _ensure_list_str(d.get("dish_ideas"), 6), [
             "Hearty regional stew", "Fresh pastry", "Grilled fish or chicken"
-        ]
+        ])
     }
 
 def guard_weather(d: Any) -> Dict[str, Any] | None:
     if not isinstance(d, dict): return None
     return {
         "season": str(d.get("season") or "unknown"),
-        "typical_conditions": _ensure_list_str(d.get("typical_conditions"), 5) or ["variable conditions"],
-        "day_adjustments": _ensure_list_str(d.get("day_adjustments"), 8) or [
+        "typical_conditions": _fb("weather", "typical_conditions", _ensure_list_str(d.get("typical_conditions"), 5), ["variable conditions"]),
+        "day_adjustments": _fb("weather", "day_adjustments", _ensure_list_str(d.get("day_adjustments"), 8), [
             "Carry compact umbrella for showers",
             "Prefer indoor sights if heavy rain"
-        ]
+        ])
     }
 
 def guard_packsmart(d: Any) -> Dict[str, Any] | None:
@@ -227,82 +246,106 @@ def guard_packsmart(d: Any) -> Dict[str, Any] | None:
 
 # ---------------- crews ----------------
 
-def build_travel_crew(overrides: Optional[Dict[str, str]] = None) -> Crew:
-    overrides = overrides or {}
-    planner = Agent(
-        role="TripPlanner",
-        goal="Produce strict JSON trip plan only; avoid packing/food/culture keys.",
-        backstory="You are disciplined; you never add extra keys.",
-        llm=llm_for("TripPlanner", overrides.get("TripPlanner")),
-        verbose=False, allow_delegation=False,
-    )
-    culture = Agent(
-        role="CultureGuide",
-        goal="Compact etiquette + phrases JSON.",
-        backstory="Accurate, brief, village-and-city friendly.",
-        llm=llm_for("CultureGuide", overrides.get("CultureGuide")),
-        verbose=False, allow_delegation=False,
-    )
-    foodie = Agent(
-        role="FoodieFriend",
-        goal="Styles/areas only; no fake names; JSON.",
-        backstory="Budget-aware foodie.",
-        llm=llm_for("FoodieFriend", overrides.get("FoodieFriend")),
-        verbose=False, allow_delegation=False,
-    )
-    weather = Agent(
-        role="WeatherAdvisor",
-        goal="Seasonal assumptions + day adjustments; JSON.",
-        backstory="No web calls; generic but practical.",
-        llm=llm_for("WeatherAdvisor", overrides.get("WeatherAdvisor")),
-        verbose=False, allow_delegation=False,
-    )
-    packsmart = Agent(
-        role="PackSmart",
-        goal="Compact packing list JSON only.",
-        backstory="Practical & minimal.",
-        llm=llm_for("PackSmart", overrides.get("PackSmart")),
-        verbose=False, allow_delegation=False,
-    )
+class AgentSpec(NamedTuple):
+    role: str
+    goal: str
+    backstory: str
+    prompt: str   # name in the prompt registry
+    label: str    # key in the response
 
-    tasks = [
-        Task(description=_read_prompt("app/prompts/trip_planner.md"), agent=planner, expected_output="JSON"),
-        Task(description=_read_prompt("app/prompts/culture.md"), agent=culture, expected_output="JSON"),
-        Task(description=_read_prompt("app/prompts/food.md"), agent=foodie, expected_output="JSON"),
-        Task(description=_read_prompt("app/prompts/weather.md"), agent=weather, expected_output="JSON"),
-        Task(description=_read_prompt("app/prompts/packsmart.md"), agent=packsmart, expected_output="JSON"),
-    ]
-    return Crew(agents=[planner, culture, foodie, weather, packsmart], tasks=tasks, process=Process.sequential, verbose=False)
+    @property
+    def system_message(self) -> str:
+        return f"You are {self.role}. {self.backstory}\nYour personal goal is: {self.goal}"
 
-def build_project_crew(overrides: Optional[Dict[str, str]] = None) -> Crew:
+_UNREAD = AgentSpec("UnreadSummarizer", "Unread summary + actions JSON.", "Keeps teams aligned.", "summary", "unread_summary")
+
+PACKS: Dict[str, List[AgentSpec]] = {
+    "travel": [
+        AgentSpec("TripPlanner", "Produce strict JSON trip plan only; avoid packing/food/culture keys.",
+                  "You are disciplined; you never add extra keys.", "trip_planner", "trip_plan"),
+        AgentSpec("CultureGuide", "Compact etiquette + phrases JSON.",
+                  "Accurate, brief, village-and-city friendly.", "culture", "culture"),
+        AgentSpec("FoodieFriend", "Styles/areas only; no fake names; JSON.", "Budget-aware foodie.", "food", "food"),
+        AgentSpec("WeatherAdvisor", "Seasonal assumptions + day adjustments; JSON.",
+                  "No web calls; generic but practical.", "weather", "weather"),
+        AgentSpec("PackSmart", "Compact packing list JSON only.", "Practical & minimal.", "packsmart", "packsmart"),
+    ],
+    "project": [
+        AgentSpec("TaskOrganizer", "Extract tasks/assignees/dates JSON.", "Project minded.", "tasks", "tasks"),
+        AgentSpec("ExpenseTracker", "Expenses/budget split JSON.", "Clear categories.", "expenses", "expenses"),
+        _UNREAD,
+    ],
+    "social": [
+        AgentSpec("MoodDetector", "Tone + signals JSON.", "Kind and neutral.", "mood", "mood"),
+        AgentSpec("ConversationAnalyzer", "Participation stats JSON.", "Fair and helpful.", "convo_analytics", "convo_analytics"),
+        _UNREAD,
+    ],
+}
+
+# One call for the whole travel pack (?mode=fused); sections it misses fall back to their own agents
+_TRAVEL_FUSED = AgentSpec("TravelConcierge", "All five travel sections as one strict JSON object.",
+                          "Plans trips end to end; never adds extra keys.", "travel_fused", "travel")
+
+PACK_LABELS: Dict[str, List[str]] = {ctx: [a.label for a in specs] for ctx, specs in PACKS.items()}
+LABEL_PROMPTS: Dict[str, str] = {a.label: a.prompt for specs in PACKS.values() for a in specs}
+PACK_ROLES: Dict[str, List[str]] = {ctx: [a.role for a in specs] for ctx, specs in PACKS.items()}
+
+def pack_names(ctx: str) -> List[str]:
+    return ctx[len(MULTI_PREFIX):].split("+") if ctx.startswith(MULTI_PREFIX) else [ctx]
+
+def pack_specs(ctx: str) -> List[AgentSpec]:
+    # A composite context runs each role once (UnreadSummarizer serves project and social alike)
+    if ctx in PACKS:
+        return PACKS[ctx]
+    specs: List[AgentSpec] = []
+    for name in pack_names(ctx):
+        specs.extend(a for a in PACKS[name] if all(a.role != b.role for b in specs))
+    return specs
+
+def pack_labels(ctx: str) -> List[str]:
+    return PACK_LABELS.get(ctx) or [a.label for a in pack_specs(ctx)]
+
+def _build_crew(specs: List[AgentSpec], overrides: Optional[Dict[str, str]] = None) -> Crew:
+    from crewai import Agent, Task, Crew, Process  # heavy; only the sync execution modes need it
     overrides = overrides or {}
-    tasker = Agent(role="TaskOrganizer", goal="Extract tasks/assignees/dates JSON.", backstory="Project minded.",
-                   llm=llm_for("TaskOrganizer", overrides.get("TaskOrganizer")), verbose=False, allow_delegation=False)
-    expenses = Agent(role="ExpenseTracker", goal="Expenses/budget split JSON.", backstory="Clear categories.",
-                     llm=llm_for("ExpenseTracker", overrides.get("ExpenseTracker")), verbose=False, allow_delegation=False)
-    unread = Agent(role="UnreadSummarizer", goal="Unread summary + actions JSON.", backstory="Keeps teams aligned.",
-                   llm=llm_for("UnreadSummarizer", overrides.get("UnreadSummarizer")), verbose=False, allow_delegation=False)
-    tasks = [
-        Task(description=_read_prompt("app/prompts/tasks.md"), agent=tasker, expected_output="JSON"),
-        Task(description=_read_prompt("app/prompts/expenses.md"), agent=expenses, expected_output="JSON"),
-        Task(description=_read_prompt("app/prompts/summary.md"), agent=unread, expected_output="JSON"),
+    agents = [
+        Agent(role=a.role, goal=a.goal, backstory=a.backstory,
+              llm=llm_for(a.role, overrides.get(a.role), max_output_tokens(a.prompt)),
+              verbose=False, allow_delegation=False)
+        for a in specs
     ]
-    return Crew(agents=[tasker, expenses, unread], tasks=tasks, process=Process.sequential, verbose=False)
+    tasks = [Task(description=prompt(a.prompt), agent=agent, expected_output="JSON") for a, agent in zip(specs, agents)]
+    return Crew(agents=agents, tasks=tasks, process=Process.sequential, verbose=False)
 
-def build_social_crew(overrides: Optional[Dict[str, str]] = None) -> Crew:
+# One validated crew per (agents, resolved providers). A request gets shallow copies with fresh
+# per-run state: Agent/Task/Crew construction is ~15ms for the travel pack, the copies ~0.1ms.
+# Copies never share mutable run state (task outputs, tool results); each execute_task builds
+# its own agent executor.
+@lru_cache(maxsize=64)
+def _crew_template(specs: Tuple[AgentSpec, ...], providers: Tuple[str, ...]) -> Crew:
+    return _build_crew(list(specs), {a.role: p for a, p in zip(specs, providers)})
+
+def _crew_for(specs: List[AgentSpec], overrides: Optional[Dict[str, str]] = None) -> Crew:
     overrides = overrides or {}
-    mood = Agent(role="MoodDetector", goal="Tone + signals JSON.", backstory="Kind and neutral.",
-                 llm=llm_for("MoodDetector", overrides.get("MoodDetector")), verbose=False, allow_delegation=False)
-    analytics = Agent(role="ConversationAnalyzer", goal="Participation stats JSON.", backstory="Fair and helpful.",
-                      llm=llm_for("ConversationAnalyzer", overrides.get("ConversationAnalyzer")), verbose=False, allow_delegation=False)
-    unread = Agent(role="UnreadSummarizer", goal="Unread summary + actions JSON.", backstory="Keeps teams aligned.",
-                   llm=llm_for("UnreadSummarizer", overrides.get("UnreadSummarizer")), verbose=False, allow_delegation=False)
+    template = _crew_template(tuple(specs), tuple(resolve_provider(a.role, overrides.get(a.role)) for a in specs))
+    agents = [ag.model_copy(update={"tools_results": []}) for ag in template.agents]
     tasks = [
-        Task(description=_read_prompt("app/prompts/mood.md"), agent=mood, expected_output="JSON"),
-        Task(description=_read_prompt("app/prompts/convo_analytics.md"), agent=analytics, expected_output="JSON"),
-        Task(description=_read_prompt("app/prompts/summary.md"), agent=unread, expected_output="JSON"),
+        t.model_copy(update={
+            "agent": ag, "description": prompt(a.prompt),  # re-read: prompts may hot-reload
+            "output": None, "processed_by_agents": set(), "used_tools": 0, "tools_errors": 0, "delegations": 0,
+        })
+        for a, t, ag in zip(specs, template.tasks, agents)
     ]
-    return Crew(agents=[mood, analytics, unread], tasks=tasks, process=Process.sequential, verbose=False)
+    return template.model_copy(update={"agents": agents, "tasks": tasks, "usage_metrics": None})
+
+def build_travel_crew(overrides: Optional[Dict[str, str]] = None) -> Crew:
+    return _build_crew(PACKS["travel"], overrides)
+
+def build_project_crew(overrides: Optional[Dict[str, str]] = None) -> Crew:
+    return _build_crew(PACKS["project"], overrides)
+
+def build_social_crew(overrides: Optional[Dict[str, str]] = None) -> Crew:
+    return _build_crew(PACKS["social"], overrides)
 
 # ---------------- orchestrate ----------------
 
@@ -311,71 +354,746 @@ def build_crew_for_context(ctx: ContextType, overrides: Optional[Dict[str,str]]
     if ctx == "social":  return build_social_crew(overrides)
     return build_travel_crew(overrides)
 
-def run_orchestrator(
+# Guards for travel pack to avoid wrong content (e.g., packing_list in TripPlanner)
+TRAVEL_GUARDS = {
+    "trip_plan": guard_trip,
+    "culture": guard_culture,
+    "food": guard_food,
+    "weather": guard_weather,
+    "packsmart": guard_packsmart,
+}
+
+def _step_raw(step: Any) -> Any:
+    if step is None or isinstance(step, str):
+        return step
+    if isinstance(step, dict):
+        return step.get("raw") or step.get("output") or json.dumps(step)
+    return getattr(step, "raw", None) or getattr(step, "output", None) or str(step)
+
+def _guarded(ctx: ContextType, label: str, parsed: Any) -> Any:
+    if label in TRAVEL_GUARDS and "travel" in pack_names(ctx):
+        with span("guard", label):
+            return TRAVEL_GUARDS[label](parsed) or parsed
+    return parsed
+
+def finalize_section(ctx: ContextType, label: str, raw: Any) -> Dict[str, Any]:
+    # Answers matching the schema come back cleaned and capped; the guard then only fills
+    # defaults. Anything else keeps the lenient guard path.
+    with span("parse", label):
+        parsed = parse_jsonish(raw)
+    if raw is not None and not isinstance(parsed, (dict, list)):
+        PARSE_FAILURES.inc(label=label)
+    with span("validate", label):
+        parsed, _ = check_output(LABEL_PROMPTS.get(label, ""), parsed)
+    return {"raw": raw, "json": _guarded(ctx, label, parsed)}
+
+def _raw_section(raw: Any, label: str, given: Any) -> Optional[str]:
+    # The model's own text for one section of a fused answer; re-serialized from what it sent when
+    # the text cannot be located verbatim (repaired quotes, a dict instead of text)
+    if not isinstance(given, dict):
+        return None
+    if isinstance(raw, str):
+        for m in re.finditer(r'"%s"\s*:\s*(?=\{)' % re.escape(label), raw):
+            found = JsonExtractor().feed(raw[m.end():])
+            try:
+                if found is not None and json.loads(found) == given:
+                    return found
+            except ValueError:
+                pass
+    return json.dumps(given, ensure_ascii=False)
+
+def split_fused(raw: Any) -> Dict[str, Dict[str, Any]]:
+    # Travel sections of a fused answer that came back as objects, each through its usual guard.
+    # "raw" keeps what the model wrote, not the validated dump with its filled-in defaults.
+    with span("parse", _TRAVEL_FUSED.label):
+        given = parse_jsonish(raw)
+    with span("validate", _TRAVEL_FUSED.label):
+        parsed, _ = check_output(_TRAVEL_FUSED.prompt, given)
+    if not isinstance(parsed, dict):
+        if raw is not None:
+            PARSE_FAILURES.inc(label=_TRAVEL_FUSED.label)
+        return {}
+    out: Dict[str, Dict[str, Any]] = {}
+    for label in PACK_LABELS["travel"]:
+        part = parsed.get(label)
+        if isinstance(part, dict) and part:
+            section_raw = _raw_section(raw, label, given.get(label) if isinstance(given, dict) else None)
+            out[label] = {"raw": section_raw, "json": _guarded("travel", label, part), "fused": True}
+    return out
+
+def partial_section(ctx: ContextType, label: str, state: Optional[UnreadState] = None) -> Dict[str, Any]:
+    # The deadline passed before this agent answered: guard defaults (or the last stored digest)
+    # stand in, flagged so the client can show them as provisional
+    guard = TRAVEL_GUARDS.get(label) if "travel" in pack_names(ctx) else None
+    if guard is not None:
+        data: Any = guard({})
+    elif label == _UNREAD.label and state is not None and state.digest is not None:
+        data = state.digest.as_output()
+    else:
+        data = {}
+    return {"raw": None, "json": data, "partial": True}
+
+def effective_providers(ctx: ContextType, overrides: Optional[Dict[str, str]] = None) -> Dict[str, str]:
+    overrides = overrides or {}
+    return {a.role: model_name(resolve_provider(a.role, overrides.get(a.role))) for a in pack_specs(ctx)}
+
+def _norm_text(s: Any) -> str:
+    return " ".join(str(s or "").split())
+
+def cache_key(
     messages: List[dict],
-    locale: str = "en",
-    destination_hint: Optional[str] = None,
-    context: Optional[ContextType] = None,
+    locale: str,
+    destination_hint: Optional[str],
+    ctx: ContextType,
     provider_overrides: Optional[Dict[str, str]] = None,
-) -> Dict[str, Any]:
-    convo = _concat_messages(messages)
-    ctx = context or classify_context(messages)
-    crew = build_crew_for_context(ctx, provider_overrides)
+    conversation_id: Optional[str] = None,
+    fused: bool = False,
+) -> str:
+    # fused and per-agent results are shaped differently (fused report, flags): never mixed
+    head = {
+        "l": _norm_text(locale).lower(),
+        "d": _norm_text(destination_hint).lower(),
+        "c": ctx,
+        "p": effective_providers(ctx, provider_overrides),
+        "cid": conversation_id,
+        "m": "fused" if fused else "agents",
+    }
+    # Messages are fed to the hash one by one instead of serializing the whole chat first. Read
+    # flags (unread summary, digest) and timestamps (response gaps) change the result too.
+    h = hashlib.sha256(json.dumps(head, sort_keys=True, ensure_ascii=False).encode("utf-8"))
+    for m in messages:
+        ts = m.get("timestamp")
+        h.update(json.dumps(
+            [_norm_text(m.get("sender", "user")), _norm_text(m.get("text", "")), None if ts is None else str(ts), m.get("read")],
+            ensure_ascii=False,
+        ).encode("utf-8"))
+    return h.hexdigest()
 
-    context_blob = (
-        "\n\n---\nINPUT CONTEXT\n"
-        f"Conversation:\n{convo}\n\n"
-        f"Locale: {locale}\n"
-        f"Destination hint: {destination_hint or 'N/A'}\n"
-        "---\n"
-    )
-    # Append shared context to each task prompt (no CrewAI .context usage)
-    for t in crew.tasks:
-        if isinstance(t.description, str):
-            t.description = t.description.rstrip() + context_blob
+def is_complete(result: Dict[str, Any]) -> bool:
+    # Only results where every agent answered are worth caching
+    sections = result_sections(result)
+    return all((sections.get(label) or {}).get("raw") is not None for label in pack_labels(result["context"]))
+
+def assemble(ctx: ContextType, sections: Dict[str, Any], compaction: Dict[str, Any]) -> Dict[str, Any]:
+    # Sections in pack order; a composite context nests them per pack, shared ones in each
+    final: Dict[str, Any] = {"context": ctx}
+    if ctx in PACKS:
+        final.update((label, sections[label]) for label in PACK_LABELS[ctx] if label in sections)
+    else:
+        final["packs"] = pack_names(ctx)
+        for name in final["packs"]:
+            final[name] = {label: sections[label] for label in PACK_LABELS[name] if label in sections}
+    final["compaction"] = compaction
+    return final
+
+def result_sections(result: Dict[str, Any]) -> Dict[str, Any]:
+    # {label: section} of an assembled result, whatever its shape
+    ctx = result["context"]
+    if ctx in PACKS:
+        return {label: result[label] for label in PACK_LABELS[ctx] if label in result}
+    out: Dict[str, Any] = {}
+    for name in pack_names(ctx):
+        out.update(result.get(name) or {})
+    return out
+
+# ---------------- execution ----------------
+
+ExecutionMode = Literal["sequential", "concurrent", "async"]
 
-    result = crew.kickoff()
+_POOL: Optional[ThreadPoolExecutor] = None
+_POOL_LOCK = threading.Lock()
 
+def _agent_pool() -> ThreadPoolExecutor:
+    # One bounded pool shared by all requests so a burst cannot spawn unbounded threads
+    global _POOL
+    with _POOL_LOCK:
+        if _POOL is None:
+            _POOL = ThreadPoolExecutor(max_workers=max(1, get_settings().agent_max_workers), thread_name_prefix="agent")
+        return _POOL
+
+def _run_sequential(crew: Crew) -> List[Any]:
+    with span("crew_kickoff"):
+        result = crew.kickoff()
     # Resolve outputs across CrewAI versions
     steps = []
     try:
         steps = getattr(getattr(crew, "last_crew_run", None), "tasks_outputs", None) or []
     except Exception:
         steps = []
+    if not steps:
+        steps = getattr(result, "tasks_output", None) or []
     if not steps:
         steps = result if isinstance(result, list) else [result]
+    return steps
+
+_LATE = object()  # step placeholder for agents still running when the request deadline passed
+
+def _deadline_at(deadline_s: Optional[float], deadline_at: Optional[float]) -> Optional[float]:
+    # Absolute time.monotonic() deadline. Callers that timed the request's arrival pass deadline_at,
+    # so queueing before the orchestration starts is spent from the same budget
+    if deadline_at is not None:
+        return deadline_at
+    return time.monotonic() + deadline_s if deadline_s is not None else None
+
+def _run_concurrent(crew: Crew, timeout: float, deadline_at: Optional[float] = None) -> List[Any]:
+    # Tasks share the same input blob and never use .context, so they are independent
+    def execute(t: Any) -> Any:
+        with span("agent", getattr(t.agent, "role", "?")):
+            return t.execute_sync(agent=t.agent)
+
+    # copy_context: spans recorded in pool threads still reach this request's timings
+    futures = [_agent_pool().submit(contextvars.copy_context().run, execute, t) for t in crew.tasks]
+    timeout_at = time.monotonic() + timeout
+    cutoff = min(timeout_at, deadline_at) if deadline_at is not None else timeout_at
+    steps: List[Any] = []
+    for t, fut in zip(crew.tasks, futures):
+        role = getattr(t.agent, "role", "?")
+        try:
+            steps.append(fut.result(timeout=max(0.0, cutoff - time.monotonic())))
+        except FutureTimeout:
+            fut.cancel()  # a started CrewAI task cannot be interrupted; its thread finishes unobserved
+            if deadline_at is not None and deadline_at < timeout_at:
+                steps.append(_LATE)
+                continue
+            log.warning("agent %s timed out after %.1fs", role, timeout)
+            steps.append(None)
+        except Exception as e:
+            log.warning("agent %s failed: %s", role, e)
+            steps.append(None)
+    return steps
+
+def _context_blob(
+    messages: List[dict],
+    locale: str,
+    destination_hint: Optional[str],
+    previous_digest: Optional[Dict[str, Any]] = None,
+    computed: Optional[Dict[str, Any]] = None,
+) -> str:
+    convo = _concat_messages(messages)
+    prior = ""
+    if previous_digest:
+        prior = f"Previous digest (merge the new messages into it):\n{json.dumps(previous_digest, ensure_ascii=False)}\n\n"
+    if computed:
+        prior += f"Computed from the full conversation (exact):\n{json.dumps(computed, ensure_ascii=False)}\n\n"
+    return (
+        "\n\n---\nINPUT CONTEXT\n"
+        f"{prior}"
+        f"Conversation:\n{convo}\n\n"
+        f"Locale: {locale}\n"
+        f"Destination hint: {destination_hint or 'N/A'}\n"
+        "---\n"
+    )
+
+# ---------------- incremental unread summary ----------------
+
+def _unread_state(ctx: ContextType, conversation_id: Optional[str], messages: List[dict]) -> Optional[UnreadState]:
+    if not conversation_id or _UNREAD not in pack_specs(ctx):
+        return None
+    return get_digests().prepare(conversation_id, messages)
+
+def _digest_section(state: Optional[UnreadState]) -> Optional[Dict[str, Any]]:
+    # Nothing unread or new since the last run: the stored digest is the answer, no LLM call
+    if state is None or state.unread or state.digest is None:
+        return None
+    out = state.digest.as_output()
+    return {"raw": json.dumps(out, ensure_ascii=False), "json": out}
+
+def _active_specs(ctx: ContextType, state: Optional[UnreadState], local: Optional[Dict[str, Any]] = None) -> List[AgentSpec]:
+    skip_unread = _digest_section(state) is not None
+    narrative = get_settings().local_analytics == "narrative"
+    specs = []
+    for a in pack_specs(ctx):
+        if skip_unread and a is _UNREAD:
+            continue
+        if local and a.role in local:
+            if not narrative:
+                continue  # fully computed locally, no LLM call
+            a = a._replace(prompt=_NARRATIVE_PROMPTS[a.role])
+        specs.append(a)
+    return specs
+
+def _agent_blobs(
+    specs: List[AgentSpec],
+    messages: List[dict],
+    locale: str,
+    destination_hint: Optional[str],
+    state: Optional[UnreadState] = None,
+    stats: Optional[Dict[str, Any]] = None,
+    local: Optional[Dict[str, Any]] = None,
+) -> Dict[str, str]:
+    # Each role gets only the slice of the chat it needs, within its token budget
+    compact = get_settings().compaction_enabled
+    compactor = Compactor(messages) if compact else None
+    blobs: Dict[str, str] = {}
+    for a in specs:
+        source, prior = messages, None
+        if state is not None and a is _UNREAD:
+            source, prior = state.unread, (state.digest.as_output() if state.digest else None)
+        if not compact:
+            sent = source
+        elif source is messages:
+            sent = compactor.for_role(a.role)  # type: ignore[union-attr]
+        else:
+            sent = Compactor(source).for_role(a.role)
+        blobs[a.role] = _context_blob(sent, locale, destination_hint, prior, (local or {}).get(a.role))
+        if stats is not None:
+            stats[a.role] = {
+                **compaction_stats(source, sent),
+                "prompt_tokens": estimate_tokens(a.system_message + prompt(a.prompt) + blobs[a.role]),
+            }
+    return blobs
+
+def _finish_unread(state: Optional[UnreadState], messages: List[dict], section: Dict[str, Any], from_digest: bool) -> Dict[str, Any]:
+    if state is None:
+        return section
+    if not from_digest:
+        get_digests().record(state, messages, section.get("json"))
+    section["incremental"] = {
+        "conversation_id": state.conversation_id,
+        "messages_sent": 0 if from_digest else len(state.unread),
+        "from_digest": from_digest,
+    }
+    return section
+
+# ---------------- local analytics ----------------
+
+# Prompts asking only for the narrative field when LOCAL_ANALYTICS=narrative
+_NARRATIVE_PROMPTS = {"ConversationAnalyzer": "convo_insight", "ExpenseTracker": "expense_notes"}
+
+def _local_results(ctx: ContextType, messages: List[dict], locale: Optional[str] = None) -> Dict[str, Dict[str, Any]]:
+    # Counts, gaps and sums are computed here instead of asking an LLM to do arithmetic
+    if get_settings().local_analytics not in {"local", "narrative"}:
+        return {}
+    return {a.role: LOCAL_ENGINES[a.role](messages, locale) for a in pack_specs(ctx) if a.role in LOCAL_ENGINES}
+
+def _local_section(role: str, computed: Dict[str, Any], raw: Any = None, narrated: bool = False) -> Dict[str, Any]:
+    if not narrated:
+        return {"raw": json.dumps(computed, ensure_ascii=False), "json": computed, "local": True}
+    # raw stays None when the narrative call failed, so the result is not cached as complete
+    return {"raw": raw, "json": merge_narrative(role, computed, parse_jsonish(raw)), "local": True}
 
-    if ctx == "travel":
-        labels = ["trip_plan", "culture", "food", "weather", "packsmart"]
-    elif ctx == "project":
-        labels = ["tasks", "expenses", "unread_summary"]
+def _local_pending(ctx: ContextType, local: Dict[str, Dict[str, Any]]) -> List[AgentSpec]:
+    # Local sections that are already final (no narrative call planned)
+    if get_settings().local_analytics == "narrative":
+        return []
+    return [a for a in pack_specs(ctx) if a.role in local]
+
+# ---------------- sync orchestrate ----------------
+
+def _prepare_crew(
+    messages: List[dict],
+    locale: str,
+    destination_hint: Optional[str],
+    ctx: ContextType,
+    provider_overrides: Optional[Dict[str, str]],
+    state: Optional[UnreadState] = None,
+    stats: Optional[Dict[str, Any]] = None,
+    local: Optional[Dict[str, Any]] = None,
+) -> tuple[List[AgentSpec], Crew]:
+    with span("crew_build"):
+        specs = _active_specs(ctx, state, local)
+        crew = _crew_for(specs, provider_overrides)
+        blobs = _agent_blobs(specs, messages, locale, destination_hint, state, stats, local)
+        # Append per-agent context to each task prompt (no CrewAI .context usage)
+        for a, t in zip(specs, crew.tasks):
+            if isinstance(t.description, str):
+                t.description = t.description + blobs[a.role]
+    return specs, crew
+
+def _repair_sync(a: AgentSpec, raw: Any, crew: Crew) -> Any:
+    # Same single repair round-trip as the async path, on the agent's own CrewAI client
+    error = _output_error(a.prompt, raw)
+    if error is None:
+        return raw
+    llm = next((ag.llm for ag in crew.agents if ag.role == a.role), None)
+    if llm is None:
+        return raw
+    try:
+        with span("repair", a.role):
+            fixed = llm.call(repair_messages(a.system_message, a.prompt, str(raw), error))
+    except Exception as e:
+        log.warning("agent %s repair failed: %s", a.role, e)
+        SCHEMA_REPAIRS.inc(prompt=a.prompt, outcome="error")
+        return raw
+    return _repaired(a.prompt, raw, fixed)
+
+def run_orchestrator(
+    messages: List[dict],
+    locale: str = "en",
+    destination_hint: Optional[str] = None,
+    context: Optional[ContextType] = None,
+    provider_overrides: Optional[Dict[str, str]] = None,
+    execution: Optional[ExecutionMode] = None,
+    conversation_id: Optional[str] = None,
+    deadline_s: Optional[float] = None,
+    deadline_at: Optional[float] = None,
+) -> Dict[str, Any]:
+    # The deadline applies to concurrent execution; a sequential kickoff cannot return part-way
+    deadline_at = _deadline_at(deadline_s, deadline_at)
+    settings = get_settings()
+    ctx = context or classify_context(messages, locale, conversation_id)
+    state = _unread_state(ctx, conversation_id, messages)
+    stats: Dict[str, Any] = {}
+    local = _local_results(ctx, messages, locale)
+    specs, crew = _prepare_crew(messages, locale, destination_hint, ctx, provider_overrides, state, stats, local)
+
+    mode = execution or settings.execution_mode
+    if mode == "sequential":
+        steps = _run_sequential(crew)
     else:
-        labels = ["mood", "convo_analytics", "unread_summary"]
+        steps = _run_concurrent(crew, settings.agent_timeout_s, deadline_at)
 
-    final: Dict[str, Any] = {"context": ctx}
-    for label, step in zip(labels, steps):
+    sections = {}
+    for a, step in zip(specs, steps):
+        if step is _LATE:
+            sections[a.label] = partial_section(ctx, a.label, state)
+            continue
+        raw = _step_raw(step)
+        if raw is not None and a.role not in local:
+            raw = _repair_sync(a, raw, crew)
+        if a.role in local:
+            sections[a.label] = _local_section(a.role, local[a.role], raw, True)
+        else:
+            sections[a.label] = finalize_section(ctx, a.label, raw)
+    if len(steps) < len(specs):
+        # The kickoff stopped early (crew error): the agents without an output stand in as partial
+        log.warning("crew returned %d of %d task outputs", len(steps), len(specs))
+        for a in specs[len(steps):]:
+            sections[a.label] = partial_section(ctx, a.label, state)
+    for a in _local_pending(ctx, local):
+        sections[a.label] = _local_section(a.role, local[a.role])
+    if state is not None:
+        label = _UNREAD.label
+        cached = _digest_section(state)
+        if cached is not None or not sections[label].get("partial"):  # a partial one has nothing to record
+            sections[label] = _finish_unread(state, messages, cached or sections[label], cached is not None)
+
+    return assemble(ctx, sections, stats)
+
+# ---------------- async orchestrate ----------------
+
+# asyncio primitives bind to the loop that first waits on them, so they are kept per event loop
+# (tests, benchmarks and worker processes may run several loops in one process)
+_LOOP_SEMAPHORES: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, asyncio.Semaphore]]" = weakref.WeakKeyDictionary()
+
+def _loop_semaphores() -> Dict[str, asyncio.Semaphore]:
+    return _LOOP_SEMAPHORES.setdefault(asyncio.get_running_loop(), {})
+
+def _inflight() -> asyncio.Semaphore:
+    sems = _loop_semaphores()
+    sem = sems.get("inflight")
+    if sem is None:
+        sem = sems["inflight"] = asyncio.Semaphore(max(1, get_settings().max_inflight))
+    return sem
+
+def _provider_slot(provider: str) -> asyncio.Semaphore:
+    # Caps concurrent outbound calls per provider across all requests (incl. batch items)
+    sems = _loop_semaphores()
+    sem = sems.get(provider)
+    if sem is None:
+        limit = parse_int_map(get_settings().provider_max_concurrency).get(provider, 16)
+        sem = sems[provider] = asyncio.Semaphore(max(1, limit))
+    return sem
+
+class AgentCall(NamedTuple):
+    spec: AgentSpec
+    provider: str
+    llm: Any
+    messages: List[Dict[str, str]]
+    pinned: bool = False  # caller forced the provider: no failover/hedging
+
+def plan_calls(
+    ctx: ContextType,
+    messages: List[dict],
+    locale: str = "en",
+    destination_hint: Optional[str] = None,
+    provider_overrides: Optional[Dict[str, str]] = None,
+    state: Optional[UnreadState] = None,
+    stats: Optional[Dict[str, Any]] = None,
+    local: Optional[Dict[str, Any]] = None,
+    labels: Optional[List[str]] = None,
+) -> List[AgentCall]:
+    # Async path skips CrewAI object construction: static specs + pooled clients + per-role blobs
+    overrides = provider_overrides or {}
+    with span("plan"):
+        specs = [a for a in _active_specs(ctx, state, local) if labels is None or a.label in labels]
+        blobs = _agent_blobs(specs, messages, locale, destination_hint, state, stats, local)
+    return [_agent_call(a, blobs[a.role], overrides.get(a.role)) for a in specs]
+
+def plan_fused(
+    messages: List[dict],
+    locale: str = "en",
+    destination_hint: Optional[str] = None,
+    provider_overrides: Optional[Dict[str, str]] = None,
+    stats: Optional[Dict[str, Any]] = None,
+) -> AgentCall:
+    # The conversation is sent once instead of five times; TripPlanner's provider override applies
+    with span("plan"):
+        blobs = _agent_blobs([_TRAVEL_FUSED], messages, locale, destination_hint, stats=stats)
+    return _agent_call(_TRAVEL_FUSED, blobs[_TRAVEL_FUSED.role], (provider_overrides or {}).get("TripPlanner"))
+
+def _agent_call(a: AgentSpec, blob: str, forced: Optional[str]) -> AgentCall:
+    provider = resolve_provider(a.role, forced)
+    return AgentCall(a, provider, get_llm(provider), [  # type: ignore[arg-type]
+        {"role": "system", "content": a.system_message},
+        {"role": "user", "content": prompt(a.prompt) + blob},
+    ], pinned=forced in {"gemini", "groq"})
+
+def _response_format(name: str, model: str) -> Optional[Dict[str, Any]]:
+    # The output schema for providers that enforce it; the others get the prompt's JSON rules only
+    if get_settings().structured_output == "off" or not supports_structured_output(model):
+        return None
+    try:
+        schema = json_schema(name)
+    except KeyError:
+        return None
+    return {"type": "json_schema", "json_schema": {"name": name, "schema": schema}}
+
+async def _attempt(call: AgentCall, provider: str) -> str:
+    llm = call.llm if provider == call.provider else get_llm(provider)  # type: ignore[arg-type]
+    model = str(getattr(llm, "model", provider))
+    max_tokens = max_output_tokens(call.spec.prompt)
+    response_format = _response_format(call.spec.prompt, model)
+
+    async def send() -> str:
+        async with _provider_slot(provider):
+            return await acomplete(llm, call.messages, stop_at_json=get_settings().llm_stream_json,
+                                   max_tokens=max_tokens, response_format=response_format)
+
+    # RPM/TPM buckets + 429-aware retries with a retry budget, shared per provider/model
+    limiter = limiter_for(provider, model)
+    return await limiter.run(send, request_tokens(call.messages, max_tokens or getattr(llm, "max_tokens", None)))
+
+def _output_error(name: str, raw: Any) -> Optional[str]:
+    if not get_settings().output_repair:
+        return None
+    return check_output(name, parse_jsonish(raw))[1]
+
+def _repaired(name: str, raw: Any, fixed: Any) -> Any:
+    # The repaired answer replaces the original only if it validates
+    ok = fixed is not None and check_output(name, parse_jsonish(fixed))[1] is None
+    SCHEMA_REPAIRS.inc(prompt=name, outcome="fixed" if ok else "failed")
+    return fixed if ok else raw
+
+async def _arun_call(call: AgentCall, timeout: float) -> Optional[str]:
+    role = call.spec.role
+    try:
+        with span("agent", role):
+            raw = await get_router().call(call.provider, lambda p: _attempt(call, p), pinned=call.pinned, timeout=timeout)
+    except asyncio.TimeoutError:
+        log.warning("agent %s timed out after %.1fs", role, timeout)
+        return None
+    except Exception as e:
+        log.warning("agent %s failed: %s", role, e)
+        return None
+    return await _arepair(call, raw, timeout)
+
+async def _arepair(call: AgentCall, raw: str, timeout: float) -> str:
+    # One repair round-trip carrying only the answer and its validation errors, never a loop
+    name = call.spec.prompt
+    error = _output_error(name, raw)
+    if error is None:
+        return raw
+    fix = call._replace(messages=repair_messages(call.spec.system_message, name, raw, error))
+    try:
+        with span("repair", call.spec.role):
+            fixed = await asyncio.wait_for(_attempt(fix, call.provider), timeout)
+    except Exception as e:
+        log.warning("agent %s repair failed: %r", call.spec.role, e)
+        SCHEMA_REPAIRS.inc(prompt=name, outcome="error")
+        return raw
+    return _repaired(name, raw, fixed)
+
+def _agent_section(
+    ctx: ContextType,
+    spec: AgentSpec,
+    raw: Optional[str],
+    local: Dict[str, Dict[str, Any]],
+    state: Optional[UnreadState],
+    messages: List[dict],
+) -> Dict[str, Any]:
+    if spec.role in local:
+        section = _local_section(spec.role, local[spec.role], raw, True)
+    else:
+        section = finalize_section(ctx, spec.label, raw)
+    if spec.label == _UNREAD.label:
+        section = _finish_unread(state, messages, section, False)
+    return section
+
+# Agents left running past a deadline; the loop only keeps weak references to tasks
+_LATE_TASKS: "set[asyncio.Task[Any]]" = set()
+
+async def _finish_late(
+    ctx: ContextType,
+    late: Dict["asyncio.Future[Any]", AgentSpec],
+    sections: Dict[str, Any],
+    compaction: Dict[str, Any],
+    local: Dict[str, Dict[str, Any]],
+    state: Optional[UnreadState],
+    messages: List[dict],
+    on_late: Callable[[Dict[str, Any]], None],
+    report: Optional[Dict[str, Any]] = None,
+) -> None:
+    for fut, spec in late.items():
+        try:
+            _, raw = await fut
+        except Exception:
+            raw = None
+        sections[spec.label] = _agent_section(ctx, spec, raw, local, state, messages)
+    try:
+        result = assemble(ctx, sections, compaction)
+        if report is not None:
+            result["fused"] = report
+        on_late(result)
+    except Exception as e:
+        log.warning("late result handler failed: %s", e)
+
+async def _finish_fused_late(
+    ctx: ContextType,
+    fused_call: "asyncio.Future[Optional[str]]",
+    fallback: Callable[[List[str]], List[AgentCall]],
+    timeout: float,
+    sections: Dict[str, Any],
+    compaction: Dict[str, Any],
+    local: Dict[str, Dict[str, Any]],
+    state: Optional[UnreadState],
+    messages: List[dict],
+    on_late: Callable[[Dict[str, Any]], None],
+) -> None:
+    # The fused call outlived the deadline: split its answer, run agents for what it missed, and
+    # hand on_late the same result a call without a deadline would have produced
+    try:
+        raw = await fused_call
+    except Exception:
         raw = None
-        if isinstance(step, str):
-            raw = step
-        elif isinstance(step, dict):
-            raw = step.get("raw") or step.get("output") or json.dumps(step)
+    sections.update(split_fused(raw))
+    report = {"fallback": [l for l in PACK_LABELS[ctx] if l not in sections]}
+    late = {asyncio.ensure_future(_labelled(c, timeout)): c.spec for c in (fallback(report["fallback"]) if report["fallback"] else [])}
+    await _finish_late(ctx, late, sections, compaction, local, state, messages, on_late, report)
+
+def _hand_off(coro: Any) -> None:
+    task = asyncio.ensure_future(coro)
+    _LATE_TASKS.add(task)
+    task.add_done_callback(_LATE_TASKS.discard)
+
+async def _labelled(call: AgentCall, timeout: float) -> tuple[AgentSpec, Optional[str]]:
+    return call.spec, await _arun_call(call, timeout)
+
+async def astream_orchestrator(
+    messages: List[dict],
+    locale: str = "en",
+    destination_hint: Optional[str] = None,
+    context: Optional[ContextType] = None,
+    provider_overrides: Optional[Dict[str, str]] = None,
+    conversation_id: Optional[str] = None,
+    deadline_s: Optional[float] = None,
+    on_late: Optional[Callable[[Dict[str, Any]], None]] = None,
+    fused: bool = False,
+    deadline_at: Optional[float] = None,
+) -> AsyncIterator[Dict[str, Any]]:
+    # Yields {"context": ...} first, then one {label, raw, json} event per agent as it finishes.
+    # Past the deadline (deadline_s from now, or deadline_at on the monotonic clock) the unfinished
+    # agents are yielded as partial sections; with on_late they keep running and on_late receives
+    # the complete result, otherwise they are cancelled.
+    # fused (travel only): one call for all sections, then per-agent calls for what it missed.
+    settings = get_settings()
+    stop_at = _deadline_at(deadline_s, deadline_at)  # taken before the wait for an in-flight slot
+    async with _inflight():
+        ctx = context or classify_context(messages, locale, conversation_id)
+        state = _unread_state(ctx, conversation_id, messages)
+        stats: Dict[str, Any] = {}
+        local = _local_results(ctx, messages, locale)
+        fused = fused and ctx == "travel"
+        if fused:
+            calls = [plan_fused(messages, locale, destination_hint, provider_overrides, stats)]
+            report: Dict[str, Any] = {"fallback": []}
+            yield {"context": ctx, "compaction": stats, "fused": report}
         else:
-            raw = getattr(step, "raw", None) or getattr(step, "output", None) or str(step)
-        parsed = parse_jsonish(raw)
+            calls = plan_calls(ctx, messages, locale, destination_hint, provider_overrides, state, stats, local)
+            yield {"context": ctx, "compaction": stats}
+
+        sections: Dict[str, Any] = {}
+        cached = _digest_section(state)
+        if cached is not None:
+            sections[_UNREAD.label] = _finish_unread(state, messages, cached, True)
+            yield {"label": _UNREAD.label, **sections[_UNREAD.label]}
+        for a in _local_pending(ctx, local):
+            sections[a.label] = _local_section(a.role, local[a.role])
+            yield {"label": a.label, **sections[a.label]}
+
+        if fused:
+            fused_call: Optional["asyncio.Future[Optional[str]]"] = asyncio.ensure_future(_arun_call(calls[0], settings.agent_timeout_s))
+            try:
+                timeout = None if stop_at is None else max(0.0, stop_at - time.monotonic())
+                done, _ = await asyncio.wait({fused_call}, timeout=timeout)  # type: ignore[arg-type]
+                if not done:
+                    log.info("deadline reached; fused travel answer partial")
+                    for label in PACK_LABELS[ctx]:
+                        yield {"label": label, **partial_section(ctx, label)}
+                    if on_late is not None:
+                        fallback = lambda labels: plan_calls(ctx, messages, locale, destination_hint, provider_overrides, state, stats, local, labels)
+                        _hand_off(_finish_fused_late(ctx, fused_call, fallback, settings.agent_timeout_s, dict(sections), stats, local, state, messages, on_late))  # type: ignore[arg-type]
+                        fused_call = None
+                    return
+                raw = fused_call.result()  # type: ignore[union-attr]
+            finally:
+                if fused_call is not None:
+                    fused_call.cancel()  # no-op once done
+            for label, section in split_fused(raw).items():
+                sections[label] = section
+                yield {"label": label, **section}
+            report["fallback"] = [l for l in PACK_LABELS[ctx] if l not in sections]
+            if report["fallback"]:
+                log.info("fused travel answer missing %s; running their agents", report["fallback"])
+            calls = plan_calls(ctx, messages, locale, destination_hint, provider_overrides, state, stats, local, report["fallback"]) if report["fallback"] else []
+
+        pending = {asyncio.ensure_future(_labelled(c, settings.agent_timeout_s)): c.spec for c in calls}
+        try:
+            while pending:
+                timeout = None if stop_at is None else max(0.0, stop_at - time.monotonic())
+                done, _ = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    break  # deadline
+                for fut in done:
+                    del pending[fut]
+                    spec, raw = fut.result()
+                    sections[spec.label] = _agent_section(ctx, spec, raw, local, state, messages)
+                    yield {"label": spec.label, **sections[spec.label]}
+            if pending:
+                log.info("deadline reached; %d agent(s) partial", len(pending))
+                for spec in pending.values():
+                    yield {"label": spec.label, **partial_section(ctx, spec.label, state)}
+                if on_late is not None:
+                    late, pending = pending, {}
+                    _hand_off(_finish_late(ctx, late, dict(sections), stats, local, state, messages, on_late))
+        finally:
+            # Consumer went away (client disconnect) or the deadline passed without on_late ->
+            # stop paying for the remaining agents
+            for p in pending:
+                p.cancel()
+
+async def arun_orchestrator(
+    messages: List[dict],
+    locale: str = "en",
+    destination_hint: Optional[str] = None,
+    context: Optional[ContextType] = None,
+    provider_overrides: Optional[Dict[str, str]] = None,
+    conversation_id: Optional[str] = None,
+    deadline_s: Optional[float] = None,
+    on_late: Optional[Callable[[Dict[str, Any]], None]] = None,
+    fused: bool = False,
+    deadline_at: Optional[float] = None,
+) -> Dict[str, Any]:
+    ctx: Optional[str] = None
+    head: Dict[str, Any] = {}
+    sections: Dict[str, Any] = {}
+    async for ev in astream_orchestrator(messages, locale, destination_hint, context, provider_overrides, conversation_id, deadline_s, on_late, fused, deadline_at):
+        if "label" in ev:
+            sections[ev.pop("label")] = ev
+        else:
+            ctx, head = ev["context"], ev
 
-        # Apply guards for travel pack to avoid wrong content (e.g., packing_list in TripPlanner)
-        if ctx == "travel":
-            if label == "trip_plan":
-                parsed = guard_trip(parsed) or parsed
-            elif label == "culture":
-                parsed = guard_culture(parsed) or parsed
-            elif label == "food":
-                parsed = guard_food(parsed) or parsed
-            elif label == "weather":
-                parsed = guard_weather(parsed) or parsed
-            elif label == "packsmart":
-                parsed = guard_packsmart(parsed) or parsed
-
-        final[label] = {"raw": raw, "json": parsed}
-
-    return final
\ No newline at end of file
+    final = assemble(ctx, sections, head.get("compaction", {}))  # type: ignore[arg-type]
+    if "fused" in head:
+        final["fused"] = head["fused"]
+    return final
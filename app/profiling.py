@@ -0,0 +1,69 @@
+from __future__ import annotations
+from collections import Counter
+from typing import Any, Dict, List, Optional
+import os, sys, threading, time
+
+# Sampling profiler for ?profile=1: a daemon thread snapshots every thread's stack at a fixed
+# interval. On the async path other requests share the event loop, so their frames can show up.
+
+# Leaf frames of threads that are parked, not working
+_IDLE = {"wait", "select", "poll", "epoll", "_worker", "get", "sleep", "accept", "run_forever", "_run_once"}
+
+
+def _frame_label(code: Any) -> str:
+    return f"{os.path.basename(code.co_filename)}:{code.co_name}"
+
+
+class SamplingProfiler:
+    def __init__(self, interval_s: float = 0.005, max_depth: int = 40):
+        self.interval_s = max(0.001, interval_s)
+        self.max_depth = max_depth
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._started = 0.0
+        self._elapsed = 0.0
+
+    def __enter__(self) -> "SamplingProfiler":
+        self._started = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self._elapsed = time.perf_counter() - self._started
+
+    def _run(self) -> None:
+        me = threading.get_ident()
+        while not self._stop.wait(self.interval_s):
+            for ident, frame in sys._current_frames().items():
+                if ident == me or frame.f_code.co_name in _IDLE:
+                    continue
+                stack: List[str] = []
+                f = frame
+                while f is not None and len(stack) < self.max_depth:
+                    stack.append(_frame_label(f.f_code))
+                    f = f.f_back
+                self.stacks[";".join(reversed(stack))] += 1
+            self.samples += 1
+
+    def as_output(self, top: int = 20) -> Dict[str, Any]:
+        leaf: Counter = Counter()
+        inclusive: Counter = Counter()
+        for stack, n in self.stacks.items():
+            frames = stack.split(";")
+            leaf[frames[-1]] += n
+            for f in set(frames):
+                inclusive[f] += n
+        return {
+            "interval_ms": round(self.interval_s * 1000, 2),
+            "duration_ms": round(self._elapsed * 1000, 2),
+            "ticks": self.samples,
+            "self": [{"frame": f, "samples": n} for f, n in leaf.most_common(top)],
+            "inclusive": [{"frame": f, "samples": n} for f, n in inclusive.most_common(top)],
+            "stacks": [{"stack": s, "samples": n} for s, n in self.stacks.most_common(top)],  # collapsed, flamegraph-ready
+        }
@@ -0,0 +1,81 @@
+from __future__ import annotations
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, Tuple
+import os, threading, time
+
+from .config import get_settings
+
+PROMPT_DIR = Path(__file__).resolve().parent / "prompts"
+
+PROMPT_NAMES = (
+    "trip_planner", "culture", "food", "weather", "packsmart",
+    "tasks", "expenses", "summary", "mood", "convo_analytics",
+    "convo_insight", "expense_notes", "travel_fused",
+)
+
+
+class PromptError(RuntimeError):
+    pass
+
+
+# Prompts are read and validated once, then served from memory. With hot_reload
+# on, a file's mtime is re-checked at most every `check_interval_s` seconds.
+class PromptRegistry:
+    def __init__(self, directory: Path = PROMPT_DIR, hot_reload: bool = False, check_interval_s: float = 1.0):
+        self.directory = Path(directory)
+        self.hot_reload = hot_reload
+        self.check_interval_s = check_interval_s
+        self._prompts: Dict[str, Tuple[float, str]] = {}
+        self._checked_at: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self.load_all()
+
+    def _path(self, name: str) -> Path:
+        return self.directory / f"{name}.md"
+
+    def _load(self, name: str) -> None:
+        path = self._path(name)
+        try:
+            mtime = os.stat(path).st_mtime
+            text = path.read_text(encoding="utf-8")
+        except OSError as e:
+            raise PromptError(f"prompt {name!r} not readable at {path}: {e}") from e
+        # Static part of the task description; the per-request context blob is appended to it
+        text = text.rstrip()
+        if not text:
+            raise PromptError(f"prompt {name!r} is empty")
+        if "JSON" not in text:
+            raise PromptError(f"prompt {name!r} does not ask for JSON output")
+        self._prompts[name] = (mtime, text)
+        self._checked_at[name] = time.monotonic()
+
+    def load_all(self) -> None:
+        with self._lock:
+            for name in PROMPT_NAMES:
+                self._load(name)
+
+    def get(self, name: str) -> str:
+        entry = self._prompts.get(name)
+        if entry is None:
+            raise PromptError(f"unknown prompt {name!r}")
+        if self.hot_reload and time.monotonic() - self._checked_at.get(name, 0.0) >= self.check_interval_s:
+            with self._lock:
+                self._checked_at[name] = time.monotonic()
+                try:
+                    if os.stat(self._path(name)).st_mtime != entry[0]:
+                        self._load(name)
+                except (OSError, PromptError):
+                    pass  # keep serving the last good version
+            entry = self._prompts[name]
+        return entry[1]
+
+
+@lru_cache
+def get_prompts() -> PromptRegistry:
+    s = get_settings()
+    return PromptRegistry(hot_reload=s.prompt_hot_reload)
+
+
+def prompt(name: str) -> str:
+    return get_prompts().get(name)
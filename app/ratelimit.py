@@ -0,0 +1,281 @@
+from __future__ import annotations
+from email.utils import parsedate_to_datetime
+from functools import lru_cache
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple, TypeVar
+import asyncio, os, random, sqlite3, threading, time
+
+from .compaction import estimate_tokens
+from .config import get_settings
+
+T = TypeVar("T")
+
+
+class RateLimited(RuntimeError):
+    pass
+
+
+# ---------------- buckets ----------------
+# Reservation-style token buckets: a caller takes its tokens immediately (the level may go
+# negative) and sleeps until the bucket would have refilled. Because reservations are made
+# under one lock in arrival order, waiters are served FIFO, for threads and tasks alike.
+
+def _reserve(level: float, updated: float, capacity: float, rate: float, amount: float, now: float) -> Tuple[float, float]:
+    level = min(capacity, level + (now - updated) * rate) - min(amount, capacity)
+    return level, (max(0.0, -level / rate) if rate > 0 else 0.0)
+
+
+class MemoryBuckets:
+    blocking = False  # microseconds under a thread lock: fine to call from the event loop
+
+    def __init__(self):
+        self._levels: Dict[str, Tuple[float, float]] = {}
+        self._lock = threading.Lock()
+
+    def reserve(self, key: str, capacity: float, rate: float, amount: float) -> float:
+        now = time.time()
+        with self._lock:
+            level, updated = self._levels.get(key, (capacity, now))
+            level, wait = _reserve(level, updated, capacity, rate, amount, now)
+            self._levels[key] = (level, now)
+            return wait
+
+    def take(self, key: str, capacity: float, rate: float, amount: float) -> float:
+        # All or nothing, for inbound quotas: takes `amount` if the bucket holds it (returns 0),
+        # else takes nothing and returns the seconds until it would
+        now = time.time()
+        with self._lock:
+            level, updated = self._levels.get(key, (capacity, now))
+            level = min(capacity, level + (now - updated) * rate)
+            ok = level >= amount
+            self._levels[key] = (level - amount if ok else level, now)
+            if ok:
+                return 0.0
+            return (amount - level) / rate if rate > 0 else float("inf")
+
+    def drain(self, key: str, capacity: float, rate: float, seconds: float) -> None:
+        # Provider said "come back in N seconds": make sure the bucket is at least N seconds in
+        # debt, without forgiving reservations already handed out
+        now = time.time()
+        with self._lock:
+            level, updated = self._levels.get(key, (capacity, now))
+            level = min(capacity, level + (now - updated) * rate)
+            self._levels[key] = (min(level, -rate * seconds), now)
+
+
+class SqliteBuckets:
+    # Same math in a local SQLite file so several worker processes share one quota. Every call
+    # takes the file's write lock (up to the 30s busy timeout under contention), so async callers
+    # run it in a worker thread.
+    blocking = True
+
+    def __init__(self, path: str):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("CREATE TABLE IF NOT EXISTS buckets (key TEXT PRIMARY KEY, level REAL NOT NULL, updated REAL NOT NULL)")
+        self._lock = threading.Lock()
+
+    def reserve(self, key: str, capacity: float, rate: float, amount: float) -> float:
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                now = time.time()
+                row = self._db.execute("SELECT level, updated FROM buckets WHERE key = ?", (key,)).fetchone()
+                level, wait = _reserve(row[0] if row else capacity, row[1] if row else now, capacity, rate, amount, now)
+                self._db.execute("INSERT OR REPLACE INTO buckets (key, level, updated) VALUES (?, ?, ?)", (key, level, now))
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+            return wait
+
+    def drain(self, key: str, capacity: float, rate: float, seconds: float) -> None:
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                now = time.time()
+                row = self._db.execute("SELECT level, updated FROM buckets WHERE key = ?", (key,)).fetchone()
+                level = min(capacity, row[0] + (now - row[1]) * rate) if row else capacity
+                self._db.execute("INSERT OR REPLACE INTO buckets (key, level, updated) VALUES (?, ?, ?)",
+                                 (key, min(level, -rate * seconds), now))
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+
+
+# ---------------- limiter ----------------
+
+class ProviderLimiter:
+    def __init__(self, key: str, rpm: int, tpm: int, store: Any, retry_ratio: float = 0.2, max_retries: int = 3,
+                 backoff_base_s: float = 0.5, backoff_cap_s: float = 20.0, burst_s: float = 10.0):
+        self.key = key
+        self.rpm, self.tpm = rpm, tpm
+        # Bucket depth in seconds of quota: how big a burst may go out before pacing kicks in
+        self.burst_s = burst_s
+        self.store = store
+        self.max_retries = max_retries
+        self.backoff_base_s, self.backoff_cap_s = backoff_base_s, backoff_cap_s
+        # Retry budget: every request earns `retry_ratio` retries (capped), every retry spends one,
+        # so under a sustained 429 storm retries stay a bounded fraction of traffic
+        self.retry_ratio = retry_ratio
+        self._retry_tokens = 10.0
+        self._lock = threading.Lock()
+        self.counters: Dict[str, float] = {"requests": 0, "throttled_s": 0.0, "rate_limited": 0, "retries": 0, "retry_budget_exhausted": 0}
+
+    def _depth(self, per_minute: int) -> float:
+        return max(1.0, per_minute * self.burst_s / 60.0)
+
+    def _wait_for(self, tokens: int) -> float:
+        wait = 0.0
+        if self.rpm > 0:
+            wait = max(wait, self.store.reserve(f"{self.key}:rpm", self._depth(self.rpm), self.rpm / 60.0, 1))
+        if self.tpm > 0 and tokens > 0:
+            wait = max(wait, self.store.reserve(f"{self.key}:tpm", self._depth(self.tpm), self.tpm / 60.0, tokens))
+        with self._lock:
+            self.counters["requests"] += 1
+            self.counters["throttled_s"] += wait
+            self._retry_tokens = min(10.0, self._retry_tokens + self.retry_ratio)
+        return wait
+
+    def _penalize(self, retry_after: Optional[float]) -> None:
+        with self._lock:
+            self.counters["rate_limited"] += 1
+        if retry_after and self.rpm > 0:
+            self.store.drain(f"{self.key}:rpm", self._depth(self.rpm), self.rpm / 60.0, retry_after)
+
+    def _may_retry(self, attempt: int) -> bool:
+        with self._lock:
+            if attempt >= self.max_retries or self._retry_tokens < 1.0:
+                self.counters["retry_budget_exhausted"] += 1
+                return False
+            self._retry_tokens -= 1.0
+            self.counters["retries"] += 1
+            return True
+
+    def _backoff(self, attempt: int, retry_after: Optional[float]) -> float:
+        # Full jitter, but never earlier than the provider asked for
+        return max(retry_after or 0.0, random.uniform(0, min(self.backoff_cap_s, self.backoff_base_s * 2 ** attempt)))
+
+    async def _offload(self, fn: Callable[..., T], *args: Any) -> T:
+        # Keeps a blocking store (SQLite file lock) off the event loop
+        if getattr(self.store, "blocking", False):
+            return await asyncio.to_thread(fn, *args)
+        return fn(*args)
+
+    async def run(self, fn: Callable[[], Awaitable[T]], tokens: int = 0) -> T:
+        attempt = 0
+        while True:
+            wait = await self._offload(self._wait_for, tokens)
+            if wait > 0:
+                await asyncio.sleep(wait)
+            try:
+                return await fn()
+            except Exception as e:
+                retryable, retry_after = classify_error(e)
+                if not retryable:
+                    raise
+                await self._offload(self._penalize, retry_after)
+                if not self._may_retry(attempt):
+                    raise
+                await asyncio.sleep(self._backoff(attempt, retry_after))
+                attempt += 1
+
+    def run_sync(self, fn: Callable[[], T], tokens: int = 0) -> T:
+        attempt = 0
+        while True:
+            wait = self._wait_for(tokens)
+            if wait > 0:
+                time.sleep(wait)
+            try:
+                return fn()
+            except Exception as e:
+                retryable, retry_after = classify_error(e)
+                if not retryable:
+                    raise
+                self._penalize(retry_after)
+                if not self._may_retry(attempt):
+                    raise
+                time.sleep(self._backoff(attempt, retry_after))
+                attempt += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"rpm": self.rpm, "tpm": self.tpm, **{k: round(v, 3) for k, v in self.counters.items()}}
+
+
+def _retry_after(e: Exception) -> Optional[float]:
+    v = getattr(e, "retry_after", None)
+    if v is None:
+        headers = getattr(getattr(e, "response", None), "headers", None) or {}
+        try:
+            v = headers.get("retry-after") or headers.get("Retry-After")
+        except AttributeError:
+            v = None
+    if v is None:
+        return None
+    try:
+        return max(0.0, float(v))
+    except (TypeError, ValueError):
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(str(v)).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def classify_error(e: Exception) -> Tuple[bool, Optional[float]]:
+    # (retryable, retry_after_s): 429s and transient 5xx are retried, everything else is not
+    status = getattr(e, "status_code", None) or getattr(getattr(e, "response", None), "status_code", None)
+    if status == 429 or isinstance(e, RateLimited) or type(e).__name__ == "RateLimitError":
+        return True, _retry_after(e)
+    if isinstance(status, int) and status in (500, 502, 503, 504):
+        return True, _retry_after(e)
+    return False, None
+
+
+def request_tokens(messages: Any, max_output_tokens: Optional[int] = None) -> int:
+    # TPM buckets are charged up front: prompt estimate plus the output we allow
+    text = "".join(str(m.get("content", "")) for m in messages) if isinstance(messages, list) else str(messages)
+    return estimate_tokens(text) + (max_output_tokens or 512)
+
+
+# ---------------- registry ----------------
+
+def _parse_limits(spec: str) -> Dict[str, Tuple[int, int]]:
+    # "groq=30/6000,gemini/gemini-2.5-flash=1000/1000000" -> {key: (rpm, tpm)}; 0 = unlimited
+    out: Dict[str, Tuple[int, int]] = {}
+    for part in (spec or "").split(","):
+        key, _, lim = part.strip().rpartition("=")
+        rpm, _, tpm = lim.partition("/")
+        if key and rpm.strip().isdigit():
+            out[key.strip()] = (int(rpm), int(tpm) if tpm.strip().isdigit() else 0)
+    return out
+
+
+_LIMITERS: Dict[str, ProviderLimiter] = {}
+_LIMITERS_LOCK = threading.Lock()
+
+
+@lru_cache
+def _store() -> Any:
+    path = get_settings().ratelimit_sqlite_path
+    return SqliteBuckets(path) if path else MemoryBuckets()
+
+
+def limiter_for(provider: str, model: str) -> ProviderLimiter:
+    key = f"{provider}:{model}"
+    with _LIMITERS_LOCK:
+        lim = _LIMITERS.get(key)
+        if lim is None:
+            s = get_settings()
+            limits = _parse_limits(s.rate_limits)
+            rpm, tpm = limits.get(model) or limits.get(provider) or (0, 0)
+            lim = _LIMITERS[key] = ProviderLimiter(key, rpm, tpm, _store(), s.retry_budget_ratio, s.retry_max_attempts,
+                                                  burst_s=s.ratelimit_burst_s)
+        return lim
+
+
+def limiter_snapshot() -> Dict[str, Any]:
+    with _LIMITERS_LOCK:
+        return {k: v.snapshot() for k, v in _LIMITERS.items()}
@@ -0,0 +1,225 @@
+from __future__ import annotations
+from collections import deque
+from functools import lru_cache
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Sequence, Tuple
+import asyncio, logging, time
+
+from .config import get_settings
+from .ratelimit import classify_error
+
+log = logging.getLogger(__name__)
+
+Attempt = Callable[[str], Awaitable[str]]
+
+# Client-library errors that mean the provider could not be reached or did not answer in time
+_TRANSPORT_ERRORS = {"APIConnectionError", "APITimeoutError", "Timeout", "ConnectError", "ConnectTimeout", "ReadTimeout"}
+
+
+def provider_fault(e: BaseException) -> bool:
+    # Timeouts, 429s, 5xx and connection errors are the provider's trouble: they count against its
+    # health and are worth another provider. Any other error (a 400 from our own prompt, auth)
+    # would fail the same way elsewhere, so it propagates.
+    if isinstance(e, (asyncio.TimeoutError, TimeoutError, ConnectionError)) or type(e).__name__ in _TRANSPORT_ERRORS:
+        return True
+    return isinstance(e, Exception) and classify_error(e)[0]
+
+
+class CircuitOpen(RuntimeError):
+    # The provider is half-open and its single probe is still in flight; counts as a provider fault
+    status_code = 503
+
+
+class ProviderHealth:
+    # Rolling latency/error window plus a circuit breaker (closed -> open -> half_open -> closed)
+    def __init__(self, window: int, error_threshold: float, min_samples: int, cooldown_s: float, clock: Callable[[], float]):
+        self.samples: Deque[Tuple[float, bool]] = deque(maxlen=max(1, window))
+        self.error_threshold = error_threshold
+        self.min_samples = min_samples
+        self.cooldown_s = cooldown_s
+        self.clock = clock
+        self.state = "closed"
+        self.opened_at = 0.0
+        self.probing = False  # half_open: the one trial call is in flight
+
+    def _cooled_down(self) -> None:
+        if self.state == "open" and self.clock() - self.opened_at >= self.cooldown_s:
+            self.state = "half_open"
+
+    def allow(self) -> bool:
+        self._cooled_down()
+        return self.state == "closed" or (self.state == "half_open" and not self.probing)
+
+    def begin(self) -> bool:
+        # Half-open lets exactly one call through until it succeeds or fails; other states do not
+        # gate here (an open breaker is skipped by order(), or failed open on purpose)
+        self._cooled_down()
+        if self.state != "half_open":
+            return True
+        if self.probing:
+            return False
+        self.probing = True
+        return True
+
+    def end_probe(self) -> None:
+        # The probe ended without a verdict (cancelled, or an error that is not the provider's)
+        self.probing = False
+
+    def record(self, latency: float, ok: bool) -> None:
+        self.samples.append((latency, ok))
+        self.probing = False
+        if self.state == "half_open":
+            self._set("closed" if ok else "open")
+        elif self.state == "closed" and len(self.samples) >= self.min_samples and self.error_rate() >= self.error_threshold:
+            self._set("open")
+
+    def _set(self, state: str) -> None:
+        if state == "open":
+            self.opened_at = self.clock()
+        elif state == "closed":
+            self.samples.clear()
+        self.state = state
+
+    def error_rate(self) -> float:
+        if not self.samples:
+            return 0.0
+        return sum(1 for _, ok in self.samples if not ok) / len(self.samples)
+
+    def latency_quantile(self, q: float) -> Optional[float]:
+        lat = sorted(l for l, ok in self.samples if ok)
+        if not lat:
+            return None
+        return lat[min(len(lat) - 1, int(q * len(lat)))]
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "samples": len(self.samples),
+            "error_rate": round(self.error_rate(), 3),
+            "p50_s": self.latency_quantile(0.5),
+            "p95_s": self.latency_quantile(0.95),
+        }
+
+
+class ProviderRouter:
+    def __init__(
+        self,
+        providers: Sequence[str] = ("gemini", "groq"),
+        window: int = 100,
+        error_threshold: float = 0.5,
+        min_samples: int = 10,
+        cooldown_s: float = 30.0,
+        hedge: bool = False,
+        hedge_default_s: float = 8.0,
+        hedge_min_samples: int = 20,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.providers = list(providers)
+        self.health = {p: ProviderHealth(window, error_threshold, min_samples, cooldown_s, clock) for p in self.providers}
+        self.hedge = hedge
+        self.hedge_default_s = hedge_default_s
+        self.hedge_min_samples = hedge_min_samples
+        self.clock = clock
+        self.counters: Dict[str, int] = {"failovers": 0, "hedges": 0, "hedge_wins": 0}
+
+    def order(self, primary: str) -> List[str]:
+        # Preferred provider first if its breaker allows it, then the other healthy ones.
+        # If every breaker is open, fail open on the primary rather than refusing outright.
+        healthy = [p for p in [primary] + [p for p in self.providers if p != primary] if p not in self.health or self.health[p].allow()]
+        return healthy or [primary]
+
+    def hedge_delay(self, provider: str) -> float:
+        h = self.health.get(provider)
+        if h is None or sum(1 for _, ok in h.samples if ok) < self.hedge_min_samples:
+            return self.hedge_default_s
+        return h.latency_quantile(0.95) or self.hedge_default_s
+
+    async def _timed(self, provider: str, attempt: Attempt, timeout: Optional[float] = None, gated: bool = True) -> str:
+        # The per-attempt timeout lives here so a hanging provider is recorded as a failure.
+        # gated=False (pinned calls) skips the half-open single-probe gate.
+        h = self.health.get(provider)
+        probe = False
+        if h is not None and gated:
+            if not h.begin():
+                raise CircuitOpen(f"{provider}: circuit half-open, probe in flight")
+            probe = h.state == "half_open"
+        t = self.clock()
+        try:
+            out = await asyncio.wait_for(attempt(provider), timeout)
+        except asyncio.CancelledError:
+            if probe:
+                h.end_probe()  # type: ignore[union-attr]
+            raise  # a cancelled hedge loser says nothing about provider health
+        except Exception as e:
+            if h is not None and provider_fault(e):
+                h.record(self.clock() - t, False)
+            elif probe:
+                h.end_probe()  # type: ignore[union-attr]
+            raise
+        if h is not None:
+            h.record(self.clock() - t, True)
+        return out
+
+    async def call(self, primary: str, attempt: Attempt, pinned: bool = False, timeout: Optional[float] = None) -> str:
+        # timeout applies to each attempt (asyncio.TimeoutError once nothing is left to try)
+        order = [primary] if pinned else self.order(primary)
+        if order[0] != primary:
+            self.counters["failovers"] += 1
+        if len(order) < 2:
+            return await self._timed(order[0], attempt, timeout, gated=not pinned)
+        first, second = order[0], order[1]
+        if not self.hedge:
+            try:
+                return await self._timed(first, attempt, timeout)
+            except Exception as e:
+                if not provider_fault(e):
+                    raise
+                log.warning("provider %s failed (%r); failing over to %s", first, e, second)
+                self.counters["failovers"] += 1
+                return await self._timed(second, attempt, timeout)
+
+        t1 = asyncio.ensure_future(self._timed(first, attempt, timeout))
+        done, _ = await asyncio.wait({t1}, timeout=self.hedge_delay(first))
+        if t1 in done:
+            failed = t1.exception()
+            if failed is None:
+                return t1.result()
+            if not provider_fault(failed):
+                raise failed
+            self.counters["failovers"] += 1
+            return await self._timed(second, attempt, timeout)
+
+        # Primary is slower than its p95: race the same prompt on the secondary
+        self.counters["hedges"] += 1
+        t2 = asyncio.ensure_future(self._timed(second, attempt, timeout))
+        pending = {t1, t2}
+        error: Optional[BaseException] = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for t in done:
+                    if t.exception() is None:
+                        if t is t2:
+                            self.counters["hedge_wins"] += 1
+                        return t.result()
+                    error = t.exception()
+            raise error  # type: ignore[misc]
+        finally:
+            for t in pending:
+                t.cancel()
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {"providers": {p: h.snapshot() for p, h in self.health.items()}, **self.counters}
+
+
+@lru_cache
+def get_router() -> ProviderRouter:
+    s = get_settings()
+    return ProviderRouter(
+        window=s.router_window,
+        error_threshold=s.router_error_threshold,
+        min_samples=s.router_min_samples,
+        cooldown_s=s.router_cooldown_s,
+        hedge=s.hedge_enabled,
+        hedge_default_s=s.hedge_default_s,
+        hedge_min_samples=s.hedge_min_samples,
+    )
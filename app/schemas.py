@@ -0,0 +1,94 @@
+from __future__ import annotations
+from functools import lru_cache
+from typing import Any, Dict, Optional, Tuple
+
+from pydantic import TypeAdapter, ValidationError
+
+from .config import get_settings, parse_int_map
+from .models import (
+    ConversationStats, CultureInfo, ExpenseReport, FoodSuggestions, MoodReport, PackingList, TaskList,
+    TravelPack, TripPlan, UnreadSummary, WeatherAdvice,
+)
+
+# Output contract per agent prompt: compiled validators, the JSON Schema for providers with
+# structured output, and output-token caps sized to what the guards keep anyway.
+
+OUTPUT_MODELS: Dict[str, Any] = {
+    "trip_planner": TripPlan,
+    "culture": CultureInfo,
+    "food": FoodSuggestions,
+    "weather": WeatherAdvice,
+    "packsmart": PackingList,
+    "tasks": TaskList,
+    "expenses": ExpenseReport,
+    "summary": UnreadSummary,
+    "mood": MoodReport,
+    "convo_analytics": ConversationStats,
+    "travel_fused": TravelPack,
+}
+
+# ~4 chars/token: 5 days x ~150 tokens for the trip, 8/8/6 culture lines, 15 packing items, ...
+# plus headroom for JSON punctuation. Override with MAX_OUTPUT_TOKENS="prompt=N,...".
+MAX_OUTPUT_TOKENS: Dict[str, int] = {
+    "trip_planner": 1200,
+    "culture": 600,
+    "food": 350,
+    "weather": 350,
+    "packsmart": 250,
+    "tasks": 800,
+    "expenses": 800,
+    "summary": 500,
+    "mood": 250,
+    "convo_analytics": 500,
+    "travel_fused": 2800,
+}
+
+
+@lru_cache(maxsize=None)
+def adapter(name: str) -> TypeAdapter:
+    return TypeAdapter(OUTPUT_MODELS[name])
+
+
+@lru_cache(maxsize=None)
+def json_schema(name: str) -> Dict[str, Any]:
+    return adapter(name).json_schema()
+
+
+def max_output_tokens(name: str) -> Optional[int]:
+    override = parse_int_map(get_settings().max_output_tokens).get(name)
+    return override or MAX_OUTPUT_TOKENS.get(name)
+
+
+def check_output(name: str, parsed: Any) -> Tuple[Any, Optional[str]]:
+    # (validated dict, None) or (the parse as given, compact error for the repair prompt)
+    if name not in OUTPUT_MODELS:
+        return parsed, None
+    if not isinstance(parsed, dict):
+        return parsed, "the answer is not a JSON object"
+    try:
+        return adapter(name).validate_python(parsed).model_dump(), None
+    except ValidationError as e:
+        return parsed, validation_summary(e)
+
+
+def validation_summary(e: ValidationError, limit: int = 8) -> str:
+    lines = []
+    for err in e.errors()[:limit]:
+        loc = ".".join(str(p) for p in err["loc"]) or "(root)"
+        lines.append(f"- {loc}: {err['msg']}")
+    if e.error_count() > limit:
+        lines.append(f"- ... {e.error_count() - limit} more")
+    return "\n".join(lines)
+
+
+def repair_messages(system: str, name: str, raw: str, error: str) -> list:
+    # The cheap round-trip: no conversation, no task prompt, just the answer and what is wrong
+    keys = ", ".join(json_schema(name).get("properties", {}))
+    return [
+        {"role": "system", "content": system},
+        {"role": "assistant", "content": raw[:6000]},
+        {"role": "user", "content": (
+            f"Your JSON failed validation:\n{error}\n"
+            f"Return only the corrected JSON object (top-level keys: {keys}). No prose, no markdown."
+        )},
+    ]
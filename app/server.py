@@ -0,0 +1,126 @@
+from __future__ import annotations
+from typing import Callable, Dict, List, Optional
+import argparse, logging, os, signal, socket, sys, time
+
+import uvicorn
+
+from .config import get_settings
+
+# Production entry point (run.py stays the dev server with reload):
+#   python -m app.server [--workers N] [--host H] [--port P]
+# The master binds the socket, imports the app and heavy modules once, then forks the workers, so
+# they start with warm imports shared copy-on-write. Per-process state (clients, caches, limiter
+# buckets) is built in each worker's lifespan; use RATELIMIT_SQLITE_PATH/CACHE_SQLITE_PATH to
+# share it across workers.
+
+log = logging.getLogger("app.server")
+
+RESPAWN_BACKOFF_S = 1.0  # a worker that dies within this long of starting is respawned after it
+
+
+def default_workers() -> int:
+    n = get_settings().web_concurrency
+    return n if n > 0 else min(os.cpu_count() or 1, 8)
+
+
+def _bind(host: str, port: int) -> socket.socket:
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+def _serve(sock: socket.socket, log_level: str) -> None:
+    from .main import app
+    config = uvicorn.Config(app, lifespan="on", log_level=log_level, access_log=False)
+    uvicorn.Server(config).run(sockets=[sock])
+
+
+def _spawn(target: Callable[[], None]) -> int:
+    pid = os.fork()
+    if pid == 0:
+        # The child installs its own SIGINT/SIGTERM handling (uvicorn does once its loop runs)
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+        code = 0
+        try:
+            target()
+        except BaseException:
+            log.exception("worker %d crashed", os.getpid())
+            code = 1
+        finally:
+            os._exit(code)
+    return pid
+
+
+def supervise(workers: int, target: Callable[[], None]) -> None:
+    # Forks `workers` children running target(), forwards SIGTERM/SIGINT to them and respawns
+    # any that exit until asked to stop
+    children: Dict[int, float] = {}
+    stopping = False
+
+    def stop(signum: int, frame: Optional[object]) -> None:
+        nonlocal stopping
+        stopping = True
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    for _ in range(workers):
+        children[_spawn(target)] = time.monotonic()
+
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        started = children.pop(pid, None)
+        if started is None or stopping:
+            continue
+        log.warning("worker %d exited with status %d; respawning", pid, os.waitstatus_to_exitcode(status))
+        if time.monotonic() - started < RESPAWN_BACKOFF_S:
+            time.sleep(RESPAWN_BACKOFF_S)
+        if not stopping:
+            children[_spawn(target)] = time.monotonic()
+
+
+def run(workers: int, host: str, port: int, log_level: str = "info") -> None:
+    if not hasattr(os, "fork"):
+        # No fork (Windows): uvicorn's spawn-based supervisor, without the shared preload
+        uvicorn.run("app.main:app", host=host, port=port, workers=workers, log_level=log_level)
+        return
+
+    sock = _bind(host, port)
+    from .main import app  # noqa: F401
+    from .warmup import STATE, preload
+    preload()
+    log.info("preloaded in %.0fms; starting %d workers on %s:%d", sum(STATE["steps"].values()), workers, host, port)
+
+    if workers == 1:
+        _serve(sock, log_level)
+        return
+    supervise(workers, lambda: _serve(sock, log_level))
+    sock.close()
+
+
+def main(argv: List[str]) -> None:
+    s = get_settings()
+    ap = argparse.ArgumentParser(prog="python -m app.server")
+    ap.add_argument("--workers", type=int, default=default_workers(), help="default: WEB_CONCURRENCY or one per CPU (max 8)")
+    ap.add_argument("--host", default=s.host)
+    ap.add_argument("--port", type=int, default=s.port)
+    ap.add_argument("--log-level", default="info")
+    args = ap.parse_args(argv)
+    logging.basicConfig(level=args.log_level.upper(), format="%(asctime)s %(process)d %(levelname)s %(name)s: %(message)s")
+    run(max(1, args.workers), args.host, args.port, args.log_level)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
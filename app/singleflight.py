@@ -0,0 +1,64 @@
+from __future__ import annotations
+from functools import lru_cache
+from typing import Any, Awaitable, Callable, Dict
+import asyncio, weakref
+
+# Coalesces identical in-flight async work: the first caller for a key starts one task and later
+# callers await that same task. Unlike the result cache this only covers calls that overlap in
+# time, so it also helps with cache=bypass and with results that are not cacheable.
+
+
+class _Flight:
+    __slots__ = ("task", "waiters")
+
+    def __init__(self, task: "asyncio.Future[Any]"):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    def __init__(self):
+        # Tasks belong to one event loop; keep flights per running loop
+        self._flights: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, _Flight]]" = weakref.WeakKeyDictionary()
+        self.counters: Dict[str, int] = {"executions": 0, "coalesced": 0, "detached": 0, "abandoned": 0}
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        # Callers share the returned object; copy before mutating it
+        flights = self._flights.setdefault(asyncio.get_running_loop(), {})
+        flight = flights.get(key)
+        if flight is None:
+            flight = flights[key] = _Flight(asyncio.ensure_future(fn()))
+            flight.task.add_done_callback(lambda _t, f=flight: self._forget(flights, key, f))
+            self.counters["executions"] += 1
+        else:
+            self.counters["coalesced"] += 1
+
+        flight.waiters += 1
+        try:
+            return await asyncio.shield(flight.task)
+        except asyncio.CancelledError:
+            # This caller went away (client disconnect, timeout); the shared run is only cancelled
+            # once nobody is waiting for it anymore
+            if not flight.task.done():
+                self.counters["detached"] += 1
+                if flight.waiters == 1:
+                    self.counters["abandoned"] += 1
+                    self._forget(flights, key, flight)  # a new caller must not join a dying task
+                    flight.task.cancel()
+            raise
+        finally:
+            flight.waiters -= 1
+
+    @staticmethod
+    def _forget(flights: Dict[str, _Flight], key: str, flight: _Flight) -> None:
+        if flights.get(key) is flight:
+            del flights[key]
+
+    def stats(self) -> Dict[str, int]:
+        inflight = sum(len(f) for f in list(self._flights.values()))
+        return {**self.counters, "inflight": inflight}
+
+
+@lru_cache
+def get_flights() -> SingleFlight:
+    return SingleFlight()
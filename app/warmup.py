@@ -0,0 +1,84 @@
+from __future__ import annotations
+from typing import Any, Dict, List
+import logging, threading, time
+
+from .config import get_settings
+
+log = logging.getLogger(__name__)
+
+# Startup work split in two:
+#   preload()  - imports and pure in-memory state; safe to run in the launcher before forking, so
+#                workers share the pages copy-on-write
+#   warm_up()  - per-process state (clients, sqlite handles, limiter buckets); runs in the lifespan
+#                of every worker, after the fork
+
+STATE: Dict[str, Any] = {"warm": False, "steps": {}, "errors": []}
+_lock = threading.Lock()
+
+
+def _step(name: str, fn: Any) -> None:
+    if name in STATE["steps"]:
+        return  # already ran in the launcher before the fork
+    start = time.perf_counter()
+    try:
+        fn()
+    except Exception as e:
+        # A missing API key or a bad sqlite path should surface on first use, not block startup
+        log.warning("warm-up step %s failed: %s", name, e)
+        STATE["errors"].append(f"{name}: {e}")
+    STATE["steps"][name] = round((time.perf_counter() - start) * 1000, 2)
+
+
+def _import_heavy() -> None:
+    import crewai, litellm  # noqa: F401  (seconds of import time; keep it off the first request)
+    litellm.suppress_debug_info = True
+    from .llms import limited_llm_class
+    limited_llm_class()
+
+
+def _prompts() -> None:
+    from .prompt_registry import get_prompts
+    get_prompts()
+
+
+def _classifier() -> None:
+    from .classifier import get_classifier
+    get_classifier().classify([{"sender": "warmup", "text": "trip plan"}])
+
+
+def preload() -> None:
+    _step("settings", get_settings)
+    _step("prompts", _prompts)
+    _step("classifier", _classifier)
+    _step("import", _import_heavy)
+
+
+def _clients() -> None:
+    from .llms import get_llm
+    for provider in ("gemini", "groq"):
+        get_llm(provider)  # type: ignore[arg-type]
+
+
+def _state() -> None:
+    from .cache import get_cache
+    from .conversations import get_digests
+    from .router import get_router
+    get_cache(), get_digests(), get_router()
+
+
+def warm_up() -> Dict[str, Any]:
+    with _lock:
+        if STATE["warm"]:
+            return STATE
+        preload()
+        _step("clients", _clients)
+        _step("state", _state)
+        STATE["total_ms"] = round(sum(STATE["steps"].values()), 2)  # includes steps run before the fork
+        STATE["warm"] = True
+        log.info("warm-up done in %.0fms", STATE["total_ms"])
+        return STATE
+
+
+def status() -> Dict[str, Any]:
+    errors: List[str] = list(STATE["errors"])
+    return {"warm": STATE["warm"], "warmup_ms": STATE.get("total_ms"), "warmup_errors": errors}
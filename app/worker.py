@@ -0,0 +1,40 @@
+from __future__ import annotations
+from typing import List
+import argparse, logging, os, signal, sys, threading
+
+from .config import get_settings
+from .jobs import work
+from .server import supervise
+
+# Job workers: python -m app.worker [--workers N]
+# Each process claims jobs from JOB_SQLITE_PATH and runs them; SIGTERM lets the current job finish.
+
+log = logging.getLogger("app.worker")
+
+
+def _child() -> None:
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())
+    signal.signal(signal.SIGINT, lambda *_: stop.set())
+    from .warmup import warm_up
+    warm_up()
+    log.info("worker %d polling %s", os.getpid(), get_settings().job_sqlite_path)
+    work(stop)
+
+
+def main(argv: List[str]) -> None:
+    ap = argparse.ArgumentParser(prog="python -m app.worker")
+    ap.add_argument("--workers", type=int, default=get_settings().job_workers)
+    ap.add_argument("--log-level", default="info")
+    args = ap.parse_args(argv)
+    logging.basicConfig(level=args.log_level.upper(), format="%(asctime)s %(process)d %(levelname)s %(name)s: %(message)s")
+    from .warmup import preload
+    preload()  # shared copy-on-write by the forked workers; the queue connection is opened per worker
+    if args.workers <= 1 or not hasattr(os, "fork"):
+        _child()
+    else:
+        supervise(args.workers, _child)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,74 @@
+# Context classification on long chats: the previous three-regex classify_context vs. the
+# lexicon classifier, cold (whole history) and incremental (only newly appended messages).
+#   python -m bench.classify [messages]
+from __future__ import annotations
+import json, random, re, sys, time
+
+from app.classifier import ContextClassifier, LEXICONS
+
+# ---- previous implementation, kept verbatim as the baseline ----
+TRAVEL_HINTS  = re.compile(r"\b(trip|travel|itinerary|hotel|flight|train|visa|beach|resort|tour|hike|mountain|village|island|weekend|louvre|montmartre|paris|rome|chamonix|itinerar)\b", re.I)
+PROJECT_HINTS = re.compile(r"\b(task|todo|deadline|deliverable|budget|cost|split|share|pay|invoice|assign|status|milestone|sprint|ticket|story)\b", re.I)
+SOCIAL_HINTS  = re.compile(r"\b(feel|angry|tension|vibe|tone|argue|confused|happy|sad|frustrated|toxic|mood|engagement|distant|reset)\b", re.I)
+
+def classify_regex(messages):
+    text = " ".join(m.get("text", "") for m in messages)
+    scores = {
+        "travel": len(TRAVEL_HINTS.findall(text)),
+        "project": len(PROJECT_HINTS.findall(text)),
+        "social": len(SOCIAL_HINTS.findall(text)),
+    }
+    return max(scores, key=scores.get) if any(scores.values()) else "travel"
+
+
+_FILLER = "ok sure sounds good let me check what time works for everyone lol yeah maybe later".split()
+_TOPICAL = ["hotel", "flight", "deadline", "invoice", "mood", "tension", "itinerary", "sprint", "road trip", "budget"]
+
+def _chat(n: int, seed: int = 7):
+    rnd = random.Random(seed)
+    out = []
+    for i in range(n):
+        words = rnd.choices(_FILLER, k=rnd.randint(4, 14))
+        if rnd.random() < 0.3:
+            words.insert(rnd.randrange(len(words)), rnd.choice(_TOPICAL))
+        out.append({"sender": f"u{i % 5}", "text": " ".join(words), "timestamp": 1_700_000_000 + i})
+    return out
+
+
+def _time(fn, repeat: int = 3) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t)
+    return round(best * 1000, 2)
+
+
+def main(n: int = 100_000, append: int = 20) -> None:
+    messages = _chat(n + append)
+    history, full = messages[:n], messages
+    clf = ContextClassifier(LEXICONS)
+
+    def incremental():
+        clf.clear()
+        clf.classify(history, "en", "bench")
+        t = time.perf_counter()
+        clf.classify(full, "en", "bench")
+        return time.perf_counter() - t
+
+    inc_ms = round(min(incremental() for _ in range(3)) * 1000, 3)
+    res = clf.classify(full, "en")
+    print(json.dumps({
+        "messages": n + append,
+        "regex_baseline_ms": _time(lambda: classify_regex(full)),
+        "single_pass_ms": _time(lambda: clf.classify(full, "en")),
+        "incremental_ms": inc_ms,
+        "appended": append,
+        "label": res.label,
+        "scores": res.scores,
+        "baseline_label": classify_regex(full),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
@@ -0,0 +1,139 @@
+# Cold start: import time of app.main, time until /health answers, and first vs second request
+# latency with the lifespan warm-up on and off. Servers run in subprocesses with a fake LLM.
+#   python -m bench.cold_start [--runs 3] [--latency 0.05]
+from __future__ import annotations
+import argparse, json, os, socket, statistics, subprocess, sys, time
+from typing import Any, Dict, List
+
+import httpx
+
+MESSAGES = [
+    {"sender": "ana", "text": "Trip to Lisbon next weekend? 3 days, budget hotel.", "timestamp": "2024-05-01T10:00:00Z"},
+    {"sender": "ben", "text": "Yes! Train or flight? I can pay 120€ for the flight.", "timestamp": "2024-05-01T10:02:00Z"},
+]
+IMPORT_SNIPPET = (
+    "import sys, time; t = time.perf_counter(); import app.main; "
+    "print(time.perf_counter() - t, 'crewai' in sys.modules)"
+)
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _median(xs: List[float]) -> float:
+    return round(statistics.median(xs), 2)
+
+# ---------------- import ----------------
+
+def import_time(runs: int) -> Dict[str, Any]:
+    samples, eager = [], False
+    for _ in range(runs):
+        out = subprocess.run([sys.executable, "-c", IMPORT_SNIPPET], capture_output=True, text=True, check=True).stdout.split()
+        samples.append(float(out[0]) * 1000)
+        eager = eager or out[1] == "True"
+    return {"app_main_ms": _median(samples), "imports_crewai": eager}
+
+# ---------------- server start and first requests ----------------
+
+def _start(cmd: List[str], env: Dict[str, str], port: int) -> Dict[str, Any]:
+    t = time.perf_counter()
+    proc = subprocess.Popen(cmd, env={**os.environ, **env}, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    url = f"http://127.0.0.1:{port}"
+    with httpx.Client(base_url=url, timeout=120) as client:
+        while True:
+            if proc.poll() is not None:
+                raise RuntimeError(f"server exited with {proc.returncode}: {cmd}")
+            try:
+                health = client.get("/health").json()
+                break
+            except httpx.TransportError:
+                time.sleep(0.01)
+        ready_ms = (time.perf_counter() - t) * 1000
+        requests = []
+        for _ in range(2):
+            r0 = time.perf_counter()
+            client.post("/api/v1/orchestrate", params={"cache": "bypass"}, json={"messages": MESSAGES}).raise_for_status()
+            requests.append(round((time.perf_counter() - r0) * 1000, 2))
+    proc.terminate()
+    proc.wait(timeout=30)
+    return {"ready_ms": ready_ms, "warm_at_ready": health.get("warm"), "first_ms": requests[0], "second_ms": requests[1]}
+
+
+def server(runs: int, warmup: str, latency_s: float) -> Dict[str, Any]:
+    rows = []
+    for _ in range(runs):
+        port = _free_port()
+        cmd = [sys.executable, "-m", "bench.cold_start", "--serve", str(port), "--latency", str(latency_s)]
+        rows.append(_start(cmd, {"WARMUP": warmup}, port))
+    return {
+        "warmup": warmup,
+        "ready_ms": _median([r["ready_ms"] for r in rows]),
+        "warm_at_ready": all(r["warm_at_ready"] for r in rows),
+        "first_request_ms": _median([r["first_ms"] for r in rows]),
+        "second_request_ms": _median([r["second_ms"] for r in rows]),
+    }
+
+
+def launcher(workers: int) -> Dict[str, Any]:
+    # Real entry point; /health only, so no fake is needed
+    port = _free_port()
+    cmd = [sys.executable, "-m", "app.server", "--workers", str(workers), "--port", str(port), "--log-level", "warning"]
+    t = time.perf_counter()
+    proc = subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        with httpx.Client(base_url=f"http://127.0.0.1:{port}", timeout=120) as client:
+            while True:
+                if proc.poll() is not None:
+                    raise RuntimeError(f"launcher exited with {proc.returncode}")
+                try:
+                    warm = client.get("/health").json().get("warm")
+                    break
+                except httpx.TransportError:
+                    time.sleep(0.01)
+        return {"workers": workers, "ready_ms": round((time.perf_counter() - t) * 1000, 2), "warm_at_ready": warm}
+    finally:
+        proc.terminate()
+        proc.wait(timeout=30)
+
+
+def serve(port: int, latency_s: float) -> None:
+    # Child process: the real app with get_llm swapped for a fake that is only built (and crewai
+    # only imported) on first use, as a real client would be without warm-up
+    import uvicorn
+    from app import orchestrator
+    from app.main import app
+    fakes: List[Any] = []
+
+    def lazy_fake(*a: Any, **k: Any) -> Any:
+        if not fakes:
+            from bench.fake_llm import FakeLLM
+            fakes.append(FakeLLM(latency_s))
+        return fakes[0]
+
+    orchestrator.get_llm = lazy_fake  # type: ignore[assignment]
+    uvicorn.run(app, host="127.0.0.1", port=port, log_level="warning")
+
+
+def main(argv: List[str]) -> None:
+    ap = argparse.ArgumentParser(prog="python -m bench.cold_start")
+    ap.add_argument("--runs", type=int, default=3)
+    ap.add_argument("--latency", type=float, default=0.05, help="fake LLM latency (s)")
+    ap.add_argument("--workers", type=int, default=2, help="workers for the app.server launcher run")
+    ap.add_argument("--serve", type=int, help=argparse.SUPPRESS)
+    args = ap.parse_args(argv)
+    if args.serve:
+        serve(args.serve, args.latency)
+        return
+    results = {
+        "import": import_time(args.runs),
+        "server": [server(args.runs, mode, args.latency) for mode in ("off", "blocking")],
+        "launcher": launcher(args.workers),
+    }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
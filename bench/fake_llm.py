@@ -0,0 +1,87 @@
+# Deterministic stand-in for crewai.LLM: fixed latency, canned JSON per agent role, no network.
+#   from bench.fake_llm import install; install(latency_s=0.05)
+from __future__ import annotations
+import asyncio, json, threading, time
+from typing import Any, Dict, List, Optional
+
+import litellm
+from crewai import LLM
+
+litellm.suppress_debug_info = True  # the fake model name is unknown to litellm; keep stdout JSON-only
+
+CANNED: Dict[str, Dict[str, Any]] = {
+    "TripPlanner": {
+        "destination": "Lisbon", "days": 3,
+        "day_by_day": [
+            {"day": 1, "theme": "Old town", "morning": "Alfama walk", "afternoon": "Castle", "evening": "Fado dinner",
+             "indoor_rain_plan": ["Tile museum"], "dining_ideas": ["tascas"], "local_tips": ["Wear grippy shoes"]},
+            {"day": 2, "theme": "Belem", "morning": "Monastery", "afternoon": "Riverside", "evening": "Bairro Alto",
+             "indoor_rain_plan": ["MAAT"], "dining_ideas": ["pastry shop"], "local_tips": ["Buy a Viva card"]},
+        ],
+        "weather_assumptions": {"season": "spring", "typical_conditions": ["mild"], "packing_highlights": ["light jacket"]},
+    },
+    "CultureGuide": {"overview": "Relaxed and polite.", "do_and_dont": ["Do greet shop staff"], "key_phrases": ["Obrigado: thanks"],
+                     "safety_basics": ["Mind pickpockets on tram 28"]},
+    "FoodieFriend": {"theme": "Tascas and markets", "suggestions": ["1) Market hall", "2) Grilled fish"], "dish_ideas": ["bacalhau"]},
+    "WeatherAdvisor": {"season": "spring", "typical_conditions": ["mild", "showers"], "day_adjustments": ["Museums if rain"]},
+    "PackSmart": {"packing_list": ["Light jacket", "Walking shoes", "Adapter"]},
+    "TaskOrganizer": {"tasks": [{"task": "Book hotel", "assignee": "ana", "due_hint": "Friday"}]},
+    "ExpenseTracker": {"total_estimated": 200, "currency": "EUR", "items": [], "notes": ["Split evenly"]},
+    "UnreadSummarizer": {"summary": "Trip planning in progress.", "action_items": ["@ana book hotel"]},
+    "MoodDetector": {"tone": "positive", "signals": ["exclamation marks"], "recommendation": "Keep it up."},
+    "ConversationAnalyzer": {"messages_per_user": {"ana": 2}, "most_active_user": "ana", "insight": "Balanced."},
+}
+# ?mode=fused: the five travel sections in one object
+CANNED["TravelConcierge"] = {
+    label: CANNED[role] for label, role in (
+        ("trip_plan", "TripPlanner"), ("culture", "CultureGuide"), ("food", "FoodieFriend"),
+        ("weather", "WeatherAdvisor"), ("packsmart", "PackSmart"),
+    )
+}
+
+
+def _role_of(messages: Any) -> Optional[str]:
+    text = messages if isinstance(messages, str) else " ".join(
+        str(m.get("content", "")) for m in messages[:2] if isinstance(m, dict))
+    for role in CANNED:
+        if f"You are {role}" in text:
+            return role
+    return None
+
+
+class FakeLLM(LLM):
+    def __init__(self, latency_s: float = 0.0, model: str = "fake/model", **kw: Any):
+        super().__init__(model=model, **kw)
+        self.latency_s = latency_s
+        self.calls = 0
+        self.llm_time_s = 0.0
+        self._lock = threading.Lock()
+
+    def reply(self, messages: Any) -> str:
+        return json.dumps(CANNED.get(_role_of(messages) or "", {"ok": True}))
+
+    def _count(self) -> None:
+        with self._lock:
+            self.calls += 1
+            self.llm_time_s += self.latency_s
+
+    def call(self, messages: Any, *args: Any, **kwargs: Any) -> str:
+        # CrewAI's executor expects the ReAct "Final Answer:" framing
+        if self.latency_s:
+            time.sleep(self.latency_s)
+        self._count()
+        return f"Thought: I now can give a great answer\nFinal Answer: {self.reply(messages)}"
+
+    async def acall(self, messages: List[Dict[str, str]], **kwargs: Any) -> str:
+        if self.latency_s:
+            await asyncio.sleep(self.latency_s)
+        self._count()
+        return self.reply(messages)
+
+
+def install(latency_s: float = 0.0) -> FakeLLM:
+    # One shared fake for every provider/model; returns it so callers can read the counters
+    from app import orchestrator
+    fake = FakeLLM(latency_s)
+    orchestrator.get_llm = lambda *a, **k: fake  # type: ignore[assignment]
+    return fake
@@ -0,0 +1,82 @@
+# Travel pack, one agent per section vs one fused call (?mode=fused): input tokens, LLM calls and
+# latency. The fake LLM's latency grows with output size, like a real model's decode time.
+#   python -m bench.fused [--n 20] [--base 0.3] [--per-token 0.004]
+from __future__ import annotations
+import argparse, asyncio, json, statistics, sys, time
+from typing import Any, Dict, List
+
+from app import orchestrator as o
+from app.compaction import estimate_tokens
+from app.config import get_settings
+from bench.fake_llm import FakeLLM
+
+MESSAGES = [
+    {"sender": "ana", "text": "Trip to Lisbon next weekend? 3 days, budget hotel.", "timestamp": "2024-05-01T10:00:00Z"},
+    {"sender": "ben", "text": "Yes! Train or flight? I can pay 120€ for the flight.", "timestamp": "2024-05-01T10:02:00Z"},
+    {"sender": "cy", "text": "Flight is cheaper, I'll check the hotel. Vegetarian food please, and museums if it rains.", "timestamp": "2024-05-01T10:09:00Z"},
+    {"sender": "ana", "text": "Spring weather should be mild, pack a light jacket.", "timestamp": "2024-05-01T10:12:00Z"},
+] * 10
+
+
+class MeteredLLM(FakeLLM):
+    # Latency = base + per_token * completion tokens; records what was sent and returned
+    def __init__(self, base_s: float, per_token_s: float, broken_fused: bool = False):
+        super().__init__(0.0)
+        self.base_s, self.per_token_s, self.broken_fused = base_s, per_token_s, broken_fused
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+
+    def reply(self, messages: Any) -> str:
+        if self.broken_fused and "You are TravelConcierge" in str(messages[0].get("content", "")):
+            return "Sure! Here is your trip: Day 1 ..."
+        return super().reply(messages)
+
+    async def acall(self, messages: List[Dict[str, str]], **kwargs: Any) -> str:
+        out = self.reply(messages)
+        self.calls += 1
+        self.prompt_tokens += estimate_tokens("".join(m["content"] for m in messages))
+        self.completion_tokens += estimate_tokens(out)
+        await asyncio.sleep(self.base_s + self.per_token_s * estimate_tokens(out))
+        return out
+
+
+def run(n: int, base_s: float, per_token_s: float, fused: bool, broken_fused: bool = False) -> Dict[str, Any]:
+    fake = MeteredLLM(base_s, per_token_s, broken_fused)
+    o.get_llm = lambda *a, **k: fake  # type: ignore[assignment]
+
+    async def go() -> List[float]:
+        samples = []
+        for _ in range(n):
+            t = time.perf_counter()
+            res = await o.arun_orchestrator(MESSAGES, context="travel", fused=fused)
+            samples.append((time.perf_counter() - t) * 1000)
+            assert all(label in res for label in o.PACK_LABELS["travel"])
+        return samples
+
+    samples = sorted(asyncio.run(go()))
+    return {
+        "llm_calls_per_request": fake.calls / n,
+        "prompt_tokens_per_request": fake.prompt_tokens // n,
+        "completion_tokens_per_request": fake.completion_tokens // n,
+        "p50_ms": round(statistics.median(samples), 1),
+        "p95_ms": round(samples[min(n - 1, int(0.95 * n))], 1),
+    }
+
+
+def main(argv: List[str]) -> None:
+    ap = argparse.ArgumentParser(prog="python -m bench.fused")
+    ap.add_argument("--n", type=int, default=20)
+    ap.add_argument("--base", type=float, default=0.3, help="fake time to first token (s)")
+    ap.add_argument("--per-token", type=float, default=0.004, help="fake decode time per output token (s)")
+    args = ap.parse_args(argv)
+    get_settings().cache_enabled = False
+    results = {
+        "agents": run(args.n, args.base, args.per_token, fused=False),
+        "fused": run(args.n, args.base, args.per_token, fused=True),
+        "fused_fallback": run(args.n, args.base, args.per_token, fused=True, broken_fused=True),
+    }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
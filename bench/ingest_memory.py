@@ -0,0 +1,127 @@
+# Peak memory per request against message count, from the request body to the per-role compacted
+# conversations (classification, compaction for every travel role, cache key; no LLM calls):
+#   legacy  previous path, kept as the baseline: JSON body -> dict copies -> one joined string
+#   json    JSON body -> compact Message objects
+#   ndjson  streamed NDJSON upload (64 KiB chunks) -> compact Message objects
+#   python -m bench.ingest_memory [--sizes 1000,10000,100000]
+from __future__ import annotations
+import argparse, asyncio, gc, hashlib, json, random, sys, time, tracemalloc
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List
+
+from app.classifier import get_classifier, score_text
+from app.compaction import Compactor, POLICIES, _WORD, select
+from app.main import _kwargs_for, _orchestrator_kwargs
+from app.messages import read_ndjson
+from app.orchestrator import PACK_ROLES, cache_key
+
+_SENDERS = ["ana", "ben", "cy", "dee", "eli"]
+_LINES = [
+    "Trip to Lisbon next weekend? 3 days, budget hotel.",
+    "Flight is cheaper, I'll check the hotel tonight",
+    "Vegetarian food please, and museums if it rains",
+    "I paid 120€ for the tickets, we split later",
+    "ok", "sounds good to me!", "can you book the airbnb by friday?",
+]
+
+
+def _rows(n: int, seed: int = 7) -> Iterator[Dict[str, Any]]:
+    rnd = random.Random(seed)
+    for i in range(n):
+        yield {"sender": rnd.choice(_SENDERS), "text": f"{rnd.choice(_LINES)} #{i}", "timestamp": f"2024-05-01T10:{i % 60:02d}:00Z", "read": i < n - 50}
+
+
+# ---- previous implementation, kept as the baseline ----
+
+def _legacy_clean(messages: List[dict]) -> List[dict]:
+    seen, out = set(), []
+    for m in messages:
+        text = str(m.get("text") or "").strip()
+        if len(_WORD.findall(text)) < 2:
+            continue
+        key = (m.get("sender", "user"), " ".join(text.lower().split()))
+        if key in seen:
+            continue
+        seen.add(key)
+        out.append({**m, "text": text})
+    return out
+
+
+def _legacy_collapse(messages: List[dict]) -> List[dict]:
+    out: List[dict] = []
+    for m in messages:
+        if out and out[-1].get("sender", "user") == m.get("sender", "user"):
+            out[-1] = {**out[-1], "text": f"{out[-1]['text']} / {m['text']}"}
+        else:
+            out.append(dict(m))
+    return out
+
+
+def legacy(n: int) -> Any:
+    body = json.dumps({"messages": list(_rows(n))}).encode()
+    msgs = json.loads(body)["messages"]
+    messages = [{"sender": m.get("sender", "user"), "text": m.get("text", ""), "timestamp": m.get("timestamp"), "read": m.get("read")} for m in msgs]
+    score_text(get_classifier().lexicon("en"), " _ ".join(m.get("text", "") for m in messages))
+    cleaned = _legacy_clean(messages)
+    collapsed = _legacy_collapse(cleaned)
+    sent = [select(collapsed if POLICIES[r].collapse else cleaned, POLICIES[r], POLICIES[r].budget) for r in PACK_ROLES["travel"]]
+    payload = {"m": [[m["sender"], m["text"]] for m in messages], "c": "travel"}
+    hashlib.sha256(json.dumps(payload, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+    return messages, sent
+
+
+def _compact(kwargs: Dict[str, Any]) -> Any:
+    compactor = Compactor(kwargs["messages"])
+    sent = [compactor.for_role(r) for r in PACK_ROLES["travel"]]
+    cache_key(kwargs["messages"], kwargs["locale"], kwargs["destination_hint"], "travel", None, None)
+    return kwargs["messages"], sent
+
+
+def json_body(n: int) -> Any:
+    body = json.dumps({"messages": list(_rows(n))}).encode()
+    return _compact(_orchestrator_kwargs(json.loads(body), "auto", {}))
+
+
+def ndjson(n: int) -> Any:
+    async def chunks() -> AsyncIterator[bytes]:
+        buf = bytearray()
+        for row in _rows(n):
+            buf += json.dumps(row).encode() + b"\n"
+            if len(buf) >= 65536:
+                yield bytes(buf)
+                buf.clear()
+        yield bytes(buf)
+
+    messages = asyncio.run(read_ndjson(chunks()))
+    return _compact(_kwargs_for(messages, "en", None, None, "auto", {}))
+
+
+def measure(fn: Callable[[int], Any], n: int) -> Dict[str, Any]:
+    gc.collect()
+    tracemalloc.start()
+    t = time.perf_counter()
+    kept = fn(n)
+    ms = (time.perf_counter() - t) * 1000
+    current, peak = tracemalloc.get_traced_memory()  # current: what the request still holds
+    tracemalloc.stop()
+    del kept
+    return {
+        "peak_mb": round(peak / 2**20, 2),
+        "peak_bytes_per_message": peak // n,
+        "held_mb": round(current / 2**20, 2),
+        "ms": round(ms, 1),
+    }
+
+
+def main(argv: List[str]) -> None:
+    ap = argparse.ArgumentParser(prog="python -m bench.ingest_memory")
+    ap.add_argument("--sizes", default="1000,10000,100000")
+    args = ap.parse_args(argv)
+    get_classifier().lexicon("en")  # compiled once per process, not per request
+    results = {}
+    for n in (int(x) for x in args.sizes.split(",")):
+        results[n] = {name: measure(fn, n) for name, fn in (("legacy", legacy), ("json", json_body), ("ndjson", ndjson))}
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,65 @@
+# A chat that mixes trip planning with splitting costs: one request per pack it scores for vs one
+# context=multi request (shared agents run once, the packs' agents run side by side). LLM calls,
+# input tokens and latency.
+#   python -m bench.multi [--n 20] [--base 0.3] [--per-token 0.004]
+from __future__ import annotations
+import argparse, asyncio, json, statistics, sys, time
+from typing import Any, Dict, List
+
+from app import orchestrator as o
+from app.config import get_settings
+from bench.fused import MeteredLLM
+
+MESSAGES = [
+    {"sender": "ana", "text": "Trip to Lisbon next weekend? 3 days, budget hotel, flight on friday.", "timestamp": "2024-05-01T10:00:00Z"},
+    {"sender": "ben", "text": "I paid 120€ for the tickets, we split the budget later.", "timestamp": "2024-05-01T10:02:00Z"},
+    {"sender": "cy", "text": "Can you book the hotel by friday? I'll send the invoice and track expenses.", "timestamp": "2024-05-01T10:09:00Z"},
+    {"sender": "ana", "text": "Deadline for the deposit is monday, who owes what?", "timestamp": "2024-05-01T10:12:00Z"},
+] * 10
+
+
+def run(n: int, base_s: float, per_token_s: float, contexts: List[str]) -> Dict[str, Any]:
+    # Every context in `contexts` is one request; their latencies add up for the caller
+    fake = MeteredLLM(base_s, per_token_s)
+    o.get_llm = lambda *a, **k: fake  # type: ignore[assignment]
+
+    async def go() -> List[float]:
+        samples = []
+        for _ in range(n):
+            t = time.perf_counter()
+            for ctx in contexts:
+                res = await o.arun_orchestrator(MESSAGES, context=ctx)
+                assert o.is_complete(res)
+            samples.append((time.perf_counter() - t) * 1000)
+        return samples
+
+    samples = sorted(asyncio.run(go()))
+    return {
+        "requests": len(contexts),
+        "llm_calls": fake.calls / n,
+        "prompt_tokens": fake.prompt_tokens // n,
+        "completion_tokens": fake.completion_tokens // n,
+        "p50_ms": round(statistics.median(samples), 1),
+        "p95_ms": round(samples[min(n - 1, int(0.95 * n))], 1),
+    }
+
+
+def main(argv: List[str]) -> None:
+    ap = argparse.ArgumentParser(prog="python -m bench.multi")
+    ap.add_argument("--n", type=int, default=20)
+    ap.add_argument("--base", type=float, default=0.3, help="fake time to first token (s)")
+    ap.add_argument("--per-token", type=float, default=0.004, help="fake decode time per output token (s)")
+    args = ap.parse_args(argv)
+    get_settings().cache_enabled = False
+    results = {}
+    # What the classifier picks for this chat, and all three packs (UnreadSummarizer shared)
+    for multi in (o.classify_packs(MESSAGES), o.MULTI_PREFIX + "+".join(o.PACKS)):
+        results[multi] = {
+            "separate": run(args.n, args.base, args.per_token, o.pack_names(multi)),
+            "multi": run(args.n, args.base, args.per_token, [multi]),
+        }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
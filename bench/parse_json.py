@@ -0,0 +1,57 @@
+# parse_jsonish vs. the previous regex-based implementation on a corpus of agent outputs.
+#   python -m bench.parse_json [iterations]
+from __future__ import annotations
+import json, re, sys, time
+from pathlib import Path
+
+from app.orchestrator import parse_jsonish
+
+CORPUS = Path(__file__).resolve().parent / "corpus" / "llm_outputs.jsonl"
+
+# ---- previous implementation, kept verbatim as the baseline ----
+_MD_OPEN = re.compile(r"^\s*```[a-zA-Z0-9_-]*", re.M)
+_MD_CLOSE = re.compile(r"```\s*$", re.M)
+
+def _strip_md_fences(s):
+    s = s.strip()
+    s = _MD_OPEN.sub("", s)
+    s = _MD_CLOSE.sub("", s)
+    return s.strip()
+
+def parse_jsonish_regex(raw):
+    if not isinstance(raw, str):
+        return raw
+    cleaned = _strip_md_fences(raw)
+    try:
+        return json.loads(cleaned)
+    except Exception:
+        pass
+    m = re.search(r"\{.*\}", cleaned, re.S)
+    if m:
+        try:
+            return json.loads(m.group(0))
+        except Exception:
+            return cleaned
+    return cleaned
+
+
+def _bench(fn, corpus, n):
+    t = time.perf_counter()
+    for _ in range(n):
+        for s in corpus:
+            fn(s)
+    per_call_us = (time.perf_counter() - t) / (n * len(corpus)) * 1e6
+    parsed = sum(isinstance(fn(s), (dict, list)) for s in corpus)
+    return {"us_per_call": round(per_call_us, 2), "parsed": parsed, "total": len(corpus)}
+
+
+def main(n: int = 500) -> None:
+    corpus = [json.loads(line)["output"] for line in CORPUS.read_text(encoding="utf-8").splitlines() if line.strip()]
+    print(json.dumps({
+        "regex_baseline": _bench(parse_jsonish_regex, corpus, n),
+        "single_pass": _bench(parse_jsonish, corpus, n),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 500)
@@ -0,0 +1,58 @@
+# Per-request object construction overhead (no LLM traffic).
+#   python -m bench.request_overhead [iterations]
+from __future__ import annotations
+import json, statistics, sys, time
+
+from app import llms, orchestrator as o
+
+MESSAGES = [
+    {"sender": "ana", "text": "Trip to Lisbon next weekend? 3 days, budget hotel."},
+    {"sender": "ben", "text": "Yes! Train or flight?"},
+    {"sender": "cy", "text": "Flight is cheaper, I'll check the hotel."},
+]
+
+
+def _time(fn, n: int) -> dict:
+    fn()  # warm up imports / prompt registry
+    samples = []
+    for _ in range(n):
+        t = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - t) * 1000)
+    samples.sort()
+    return {"mean_ms": round(statistics.fmean(samples), 3), "p50_ms": round(samples[n // 2], 3), "p95_ms": round(samples[int(n * 0.95) - 1], 3)}
+
+
+def crew_fresh_clients():
+    # Baseline behaviour: new crewai.LLM per role plus new Agent/Task/Crew objects
+    llms.clear_llm_pool()
+    o._build_crew(o.PACKS["travel"])
+
+
+def crew_pooled_clients():
+    # Pooled clients, still new Agent/Task/Crew objects (the previous sync path)
+    o._build_crew(o.PACKS["travel"])
+
+
+def crew_template():
+    # Current sync path: shallow copies of a cached crew template, plus the per-role blobs
+    o._prepare_crew(MESSAGES, "en", None, "travel", None)
+
+
+def async_plan():
+    o.plan_calls("travel", MESSAGES)
+
+
+def main(n: int = 200) -> None:
+    results = {
+        "iterations": n,
+        "crew_fresh_clients": _time(crew_fresh_clients, n),
+        "crew_pooled_clients": _time(crew_pooled_clients, n),
+        "crew_template": _time(crew_template, n),
+        "async_plan_pooled": _time(async_plan, n),
+    }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 200)
@@ -0,0 +1,96 @@
+# Provider router behaviour against fake providers that inject latency, hangs and errors.
+#   python -m bench.router_failover
+from __future__ import annotations
+import asyncio, json, random, time
+
+from app.router import ProviderRouter
+
+
+class ProviderError(RuntimeError):
+    def __init__(self, status_code: int):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+
+
+def fake_provider(latency_s, error_rate: float = 0.0, rng: random.Random = random.Random(7), status: int = 503):
+    async def call(provider: str) -> str:
+        await asyncio.sleep(latency_s(rng) if callable(latency_s) else latency_s)
+        if rng.random() < error_rate:
+            raise ProviderError(status)
+        return f'{{"provider": "{provider}"}}'
+    return call
+
+
+def _attempt(providers):
+    async def attempt(provider: str) -> str:
+        return await providers[provider](provider)
+    return attempt
+
+
+def _pct(xs, q):
+    xs = sorted(xs)
+    return round(xs[min(len(xs) - 1, int(q * len(xs)))], 4)
+
+
+async def outage(n: int = 200) -> dict:
+    # gemini fails every call; breaker should open and route to groq
+    router = ProviderRouter(min_samples=5, cooldown_s=60)
+    attempt = _attempt({"gemini": fake_provider(0.001, error_rate=1.0), "groq": fake_provider(0.002)})
+    served = {"gemini": 0, "groq": 0, "failed": 0}
+    for _ in range(n):
+        try:
+            out = await router.call("gemini", attempt)
+            served[json.loads(out)["provider"]] += 1
+        except Exception:
+            served["failed"] += 1
+    return {"served": served, **router.snapshot()}
+
+
+async def hang(n: int = 30, timeout_s: float = 0.05) -> dict:
+    # gemini never answers; the per-attempt timeout counts against it until the breaker opens
+    router = ProviderRouter(min_samples=5, cooldown_s=60)
+    attempt = _attempt({"gemini": fake_provider(3600.0), "groq": fake_provider(0.002)})
+    t = time.perf_counter()
+    for _ in range(n):
+        await router.call("gemini", attempt, timeout=timeout_s)
+    return {"total_s": round(time.perf_counter() - t, 3), **router.snapshot()}
+
+
+async def bad_request(n: int = 20) -> dict:
+    # A 400 is ours to fix: no failover, and the provider's health is left alone
+    router = ProviderRouter(min_samples=5)
+    attempt = _attempt({"gemini": fake_provider(0.001, error_rate=1.0, status=400), "groq": fake_provider(0.002)})
+    errors = 0
+    for _ in range(n):
+        try:
+            await router.call("gemini", attempt)
+        except ProviderError:
+            errors += 1
+    return {"errors": errors, **router.snapshot()}
+
+
+async def slow_tail(n: int = 300, hedge: bool = True) -> dict:
+    # gemini is usually fast but 5% of calls stall for 0.5s; groq is steady
+    tail = lambda rng: 0.5 if rng.random() < 0.05 else rng.uniform(0.01, 0.03)
+    router = ProviderRouter(hedge=hedge, hedge_default_s=0.05, hedge_min_samples=20)
+    attempt = _attempt({"gemini": fake_provider(tail, rng=random.Random(1)), "groq": fake_provider(0.04, rng=random.Random(2))})
+    lat = []
+    for _ in range(n):
+        t = time.perf_counter()
+        await router.call("gemini", attempt)
+        lat.append(time.perf_counter() - t)
+    return {"hedge": hedge, "p50_s": _pct(lat, 0.5), "p95_s": _pct(lat, 0.95), "p99_s": _pct(lat, 0.99), **router.counters}
+
+
+async def main() -> None:
+    print(json.dumps({
+        "outage": await outage(),
+        "hang": await hang(),
+        "bad_request": await bad_request(),
+        "slow_tail_no_hedge": await slow_tail(hedge=False),
+        "slow_tail_hedged": await slow_tail(hedge=True),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
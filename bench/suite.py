@@ -0,0 +1,214 @@
+# Offline benchmark suite: every LLM is replaced by bench.fake_llm, so numbers only reflect our
+# own code. Writes one JSON document; keep them per version and diff with --compare.
+#   python -m bench.suite [--quick] [--out results.json] [--compare previous.json]
+from __future__ import annotations
+import argparse, asyncio, gc, json, platform, statistics, subprocess, sys, time, tracemalloc
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+import httpx
+
+from app import orchestrator as o
+from app.config import get_settings
+from bench.fake_llm import CANNED, install
+
+MESSAGES = [
+    {"sender": "ana", "text": "Trip to Lisbon next weekend? 3 days, budget hotel.", "timestamp": "2024-05-01T10:00:00Z"},
+    {"sender": "ben", "text": "Yes! Train or flight? I can pay 120€ for the flight.", "timestamp": "2024-05-01T10:02:00Z"},
+    {"sender": "cy", "text": "Flight is cheaper, I'll check the hotel.", "timestamp": "2024-05-01T10:09:00Z"},
+]
+CORPUS = Path(__file__).resolve().parent / "corpus" / "llm_outputs.jsonl"
+
+
+def _pct(xs: List[float], q: float) -> float:
+    xs = sorted(xs)
+    return round(xs[min(len(xs) - 1, int(q * len(xs)))], 3)
+
+
+def _summary_ms(samples: List[float]) -> Dict[str, float]:
+    return {"mean_ms": round(statistics.fmean(samples), 3), "p50_ms": _pct(samples, 0.5), "p95_ms": _pct(samples, 0.95)}
+
+# ---------------- orchestration overhead ----------------
+
+def overhead(n: int) -> Dict[str, Any]:
+    # Zero-latency fake: wall time is orchestration cost alone
+    fake = install(0.0)
+    out: Dict[str, Any] = {"iterations": n}
+    for mode in ("sequential", "concurrent"):
+        o.run_orchestrator(MESSAGES, context="travel", execution=mode)  # warm up
+        samples = []
+        for _ in range(n):
+            t = time.perf_counter()
+            o.run_orchestrator(MESSAGES, context="travel", execution=mode)
+            samples.append((time.perf_counter() - t) * 1000)
+        out[f"run_orchestrator_{mode}"] = _summary_ms(samples)
+
+    async def run_async() -> List[float]:
+        await o.arun_orchestrator(MESSAGES, context="travel")
+        samples = []
+        for _ in range(n * 5):
+            t = time.perf_counter()
+            await o.arun_orchestrator(MESSAGES, context="travel")
+            samples.append((time.perf_counter() - t) * 1000)
+        return samples
+
+    out["arun_orchestrator"] = _summary_ms(asyncio.run(run_async()))
+    out["llm_calls"] = fake.calls
+    return out
+
+# ---------------- HTTP throughput ----------------
+
+async def _http_level(client: httpx.AsyncClient, concurrency: int, total: int) -> Dict[str, Any]:
+    body = {"messages": MESSAGES}
+    latencies: List[float] = []
+    errors = 0
+    sem = asyncio.Semaphore(concurrency)
+
+    async def one() -> None:
+        nonlocal errors
+        async with sem:
+            t = time.perf_counter()
+            r = await client.post("/api/v1/orchestrate", params={"cache": "bypass"}, json=body)
+            latencies.append((time.perf_counter() - t) * 1000)
+            if r.status_code != 200:
+                errors += 1
+
+    t = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(total)))
+    wall = time.perf_counter() - t
+    return {
+        "concurrency": concurrency, "requests": total, "errors": errors,
+        "rps": round(total / wall, 1),
+        "p50_ms": _pct(latencies, 0.5), "p95_ms": _pct(latencies, 0.95), "p99_ms": _pct(latencies, 0.99),
+    }
+
+
+def http(levels: List[int], latency_s: float) -> Dict[str, Any]:
+    from app.main import app
+    install(latency_s)
+
+    async def run() -> List[Dict[str, Any]]:
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            await client.post("/api/v1/orchestrate", params={"cache": "bypass"}, json={"messages": MESSAGES})
+            return [await _http_level(client, c, max(50, c * 4)) for c in levels]
+
+    return {"fake_latency_s": latency_s, "execution": get_settings().execution_mode, "levels": asyncio.run(run())}
+
+# ---------------- memory per in-flight request ----------------
+
+def memory(inflight: int) -> Dict[str, Any]:
+    install(0.5)
+
+    async def run() -> Dict[str, Any]:
+        await o.arun_orchestrator(MESSAGES, context="travel")  # warm caches outside the measurement
+        gc.collect()
+        tracemalloc.start()
+        base = tracemalloc.get_traced_memory()[0]
+        tasks = [asyncio.ensure_future(o.arun_orchestrator(MESSAGES, context="travel")) for _ in range(inflight)]
+        await asyncio.sleep(0.25)  # every request is now parked inside its fake LLM calls
+        held = tracemalloc.get_traced_memory()[0] - base
+        await asyncio.gather(*tasks)
+        peak = tracemalloc.get_traced_memory()[1] - base
+        tracemalloc.stop()
+        return {
+            "inflight": inflight,
+            "bytes_per_request": held // inflight,
+            "peak_bytes": peak,
+        }
+
+    return asyncio.run(run())
+
+# ---------------- microbenchmarks ----------------
+
+def _us_per_call(fn: Callable[[], Any], n: int) -> float:
+    fn()
+    t = time.perf_counter()
+    for _ in range(n):
+        fn()
+    return round((time.perf_counter() - t) / n * 1e6, 2)
+
+
+def micro(n: int) -> Dict[str, Any]:
+    corpus = [json.loads(line)["output"] for line in CORPUS.read_text(encoding="utf-8").splitlines() if line.strip()]
+    chat = MESSAGES * 20
+    guards = {
+        "guard_trip": (o.guard_trip, CANNED["TripPlanner"]),
+        "guard_culture": (o.guard_culture, CANNED["CultureGuide"]),
+        "guard_food": (o.guard_food, CANNED["FoodieFriend"]),
+        "guard_weather": (o.guard_weather, CANNED["WeatherAdvisor"]),
+        "guard_packsmart": (o.guard_packsmart, CANNED["PackSmart"]),
+    }
+    out: Dict[str, Any] = {
+        "parse_jsonish_us": round(_us_per_call(lambda: [o.parse_jsonish(s) for s in corpus], n) / len(corpus), 2),
+        "classify_context_60msg_us": _us_per_call(lambda: o.classify_context(chat), n),
+    }
+    for name, (fn, data) in guards.items():
+        out[f"{name}_us"] = _us_per_call(lambda fn=fn, data=data: fn(data), n)
+    return out
+
+# ---------------- driver ----------------
+
+def _meta() -> Dict[str, Any]:
+    try:
+        rev = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=5).stdout.strip()
+    except Exception:
+        rev = ""
+    return {
+        "git_rev": rev or None,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+    }
+
+
+def _leaves(d: Any, prefix: str = "") -> Dict[str, float]:
+    if isinstance(d, dict):
+        out: Dict[str, float] = {}
+        for k, v in d.items():
+            out.update(_leaves(v, f"{prefix}{k}."))
+        return out
+    if isinstance(d, list):
+        out = {}
+        for i, v in enumerate(d):
+            out.update(_leaves(v, f"{prefix}{i}."))
+        return out
+    if isinstance(d, (int, float)) and not isinstance(d, bool):
+        return {prefix[:-1]: float(d)}
+    return {}
+
+
+def compare(current: Dict[str, Any], previous: Dict[str, Any]) -> Dict[str, float]:
+    # current / previous for every numeric leaf present in both runs
+    cur, prev = _leaves(current["results"]), _leaves(previous["results"])
+    return {k: round(cur[k] / prev[k], 3) for k in cur if k in prev and prev[k]}
+
+
+def main(argv: List[str]) -> None:
+    ap = argparse.ArgumentParser(prog="python -m bench.suite")
+    ap.add_argument("--quick", action="store_true", help="fewer iterations, for CI smoke runs")
+    ap.add_argument("--out", help="also write the JSON document to this path")
+    ap.add_argument("--compare", help="previous suite output; adds current/previous ratios")
+    ap.add_argument("--latency", type=float, default=0.05, help="fake LLM latency for the HTTP runs (s)")
+    args = ap.parse_args(argv)
+
+    get_settings().cache_enabled = False
+    n = 5 if args.quick else 30
+    results = {
+        "overhead": overhead(n),
+        "http": http([1, 8, 32] if args.quick else [1, 8, 32, 128], args.latency),
+        "memory": memory(20 if args.quick else 100),
+        "micro": micro(200 if args.quick else 2000),
+    }
+    doc: Dict[str, Any] = {"meta": _meta(), "results": results}
+    if args.compare:
+        doc["compare"] = compare(doc, json.loads(Path(args.compare).read_text(encoding="utf-8")))
+    text = json.dumps(doc, indent=2)
+    if args.out:
+        Path(args.out).write_text(text + "\n", encoding="utf-8")
+    print(text)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
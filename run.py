@@ -1,5 +1,5 @@
 import uvicorn
-from app.main import app
 
+# Dev server with auto-reload; production uses `python -m app.server`
 if __name__ == "__main__":
-    uvicorn.run(app, host="0.0.0.0", port=8000, reload=True)
\ No newline at end of file
+    uvicorn.run("app.main:app", host="0.0.0.0", port=8000, reload=True)
@@ -0,0 +1,165 @@
+import asyncio
+
+import pytest
+
+from app.router import CircuitOpen, ProviderRouter
+
+
+class ProviderError(RuntimeError):
+    def __init__(self, status_code: int):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+
+
+class FakeProviders:
+    # Per-provider latency and injected fault (an HTTP status, or "hang"); records every call
+    def __init__(self, **behaviour):
+        self.behaviour = {p: {"latency": 0.0, "fault": None, **b} for p, b in behaviour.items()}
+        self.calls = []
+
+    async def __call__(self, provider: str) -> str:
+        self.calls.append(provider)
+        b = self.behaviour[provider]
+        if b["fault"] == "hang":
+            await asyncio.sleep(3600)
+        await asyncio.sleep(b["latency"])
+        if b["fault"] is not None:
+            raise ProviderError(b["fault"])
+        return provider
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_failover_on_provider_fault():
+    router = ProviderRouter()
+    fake = FakeProviders(gemini={"fault": 503}, groq={})
+    assert run(router.call("gemini", fake)) == "groq"
+    assert fake.calls == ["gemini", "groq"]
+    assert router.counters["failovers"] == 1
+    assert router.health["gemini"].error_rate() == 1.0
+
+
+def test_client_error_propagates_without_failover():
+    router = ProviderRouter()
+    fake = FakeProviders(gemini={"fault": 400}, groq={})
+    with pytest.raises(ProviderError):
+        run(router.call("gemini", fake))
+    assert fake.calls == ["gemini"]
+    assert len(router.health["gemini"].samples) == 0
+
+
+def test_timeout_counts_against_provider_and_fails_over():
+    router = ProviderRouter()
+    fake = FakeProviders(gemini={"fault": "hang"}, groq={})
+    assert run(router.call("gemini", fake, timeout=0.02)) == "groq"
+    assert router.health["gemini"].snapshot()["samples"] == 1
+    assert router.health["gemini"].error_rate() == 1.0
+
+
+def test_pinned_call_never_fails_over():
+    router = ProviderRouter()
+    fake = FakeProviders(gemini={"fault": 503}, groq={})
+    with pytest.raises(ProviderError):
+        run(router.call("gemini", fake, pinned=True))
+    assert fake.calls == ["gemini"]
+
+
+def test_hedge_races_slow_primary():
+    router = ProviderRouter(hedge=True, hedge_default_s=0.02)
+    fake = FakeProviders(gemini={"latency": 0.5}, groq={"latency": 0.01})
+    assert run(router.call("gemini", fake)) == "groq"
+    assert router.counters["hedges"] == 1
+    assert router.counters["hedge_wins"] == 1
+
+
+def test_no_hedge_when_primary_is_fast():
+    router = ProviderRouter(hedge=True, hedge_default_s=0.2)
+    fake = FakeProviders(gemini={"latency": 0.01}, groq={})
+    assert run(router.call("gemini", fake)) == "gemini"
+    assert router.counters["hedges"] == 0
+
+
+def test_breaker_opens_then_half_open_probe_closes_it():
+    clock = Clock()
+    router = ProviderRouter(min_samples=3, error_threshold=0.5, cooldown_s=30, clock=clock)
+    fake = FakeProviders(gemini={"fault": 503}, groq={})
+    for _ in range(3):
+        run(router.call("gemini", fake))
+    health = router.health["gemini"]
+    assert health.state == "open"
+
+    fake.calls.clear()
+    assert run(router.call("gemini", fake)) == "groq"
+    assert fake.calls == ["groq"]  # open: skipped without a call
+
+    clock.now += 31
+    fake.behaviour["gemini"]["fault"] = None
+    assert run(router.call("gemini", fake)) == "gemini"
+    assert health.state == "closed"
+
+
+def test_failed_probe_reopens_breaker():
+    clock = Clock()
+    router = ProviderRouter(min_samples=2, cooldown_s=30, clock=clock)
+    fake = FakeProviders(gemini={"fault": 503}, groq={})
+    for _ in range(2):
+        run(router.call("gemini", fake))
+    clock.now += 31
+    assert router.health["gemini"].allow()
+    assert router.health["gemini"].state == "half_open"
+    run(router.call("gemini", fake))
+    assert router.health["gemini"].state == "open"
+    assert router.health["gemini"].opened_at == clock.now
+
+
+def test_half_open_lets_exactly_one_probe_through():
+    clock = Clock()
+    router = ProviderRouter(min_samples=2, cooldown_s=30, clock=clock)
+    fake = FakeProviders(gemini={"fault": 503}, groq={})
+    for _ in range(2):
+        run(router.call("gemini", fake))
+    clock.now += 31
+    fake.behaviour["gemini"] = {"latency": 0.05, "fault": None}
+    fake.calls.clear()
+
+    async def burst():
+        return await asyncio.gather(*(router.call("gemini", fake) for _ in range(5)))
+
+    served = run(burst())
+    assert served.count("gemini") == 1
+    assert served.count("groq") == 4
+    assert fake.calls.count("gemini") == 1
+    assert router.health["gemini"].state == "closed"
+
+
+def test_cancelled_probe_frees_the_slot():
+    clock = Clock()
+    router = ProviderRouter(min_samples=2, cooldown_s=30, clock=clock)
+    fake = FakeProviders(gemini={"fault": 503}, groq={})
+    for _ in range(2):
+        run(router.call("gemini", fake))
+    clock.now += 31
+    fake.behaviour["gemini"] = {"latency": 0.0, "fault": "hang"}
+    health = router.health["gemini"]
+
+    async def cancel_probe():
+        task = asyncio.ensure_future(router._timed("gemini", fake))
+        await asyncio.sleep(0.01)
+        assert health.probing
+        with pytest.raises(CircuitOpen):
+            await router._timed("gemini", fake)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+    run(cancel_probe())
+    assert health.state == "half_open" and not health.probing